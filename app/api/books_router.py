@@ -0,0 +1,34 @@
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from app.api.schemas import BooksPage
+from app.db.database import get_books_page, iter_books
+
+router = APIRouter()
+
+MAX_PAGE_SIZE = 100
+
+@router.get("/", response_model=BooksPage)
+def list_books(
+    cursor: int = Query(0, ge=0, description="book_id cuối cùng của trang trước"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    category: Optional[str] = None,
+    in_stock: bool = False,
+    stream: bool = Query(False, description="Trả về toàn bộ kết quả dạng NDJSON (mỗi dòng một sách)"),
+):
+    """
+    Danh sách sách phân trang theo keyset trên book_id.
+    Với stream=true, các sách được gửi dần theo từng lô nên client nhận dòng đầu
+    ngay mà không phải chờ server đọc hết danh mục.
+    """
+    if stream:
+        lines = (
+            json.dumps(book, ensure_ascii=False) + "\n"
+            for book in iter_books(cursor, category, in_stock)
+        )
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    books, next_cursor = get_books_page(cursor, limit, category, in_stock)
+    return BooksPage(books=books, next_cursor=next_cursor)
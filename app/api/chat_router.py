@@ -1,15 +1,154 @@
-from fastapi import APIRouter
-from app.api.schemas import ChatRequest, ChatResponse
-from app.logic import order_flow, view_books_flow, track_order_flow
+import asyncio
+import contextlib
+import json
+import weakref
+from typing import Optional
+
+from fastapi import APIRouter, Header, Response
+from fastapi.responses import StreamingResponse
+from app import metrics
+from app.api.schemas import ChatBatchRequest, ChatBatchResponse, ChatRequest, ChatResponse
+from app.api.session_store import get_store, new_session_id
+from app.db import catalog_cache
+from app.llm.llm_client import allm_generate, allm_generate_stream
+from app.logic import intent, order_flow, view_books_flow, track_order_flow
 
 router = APIRouter()
-user_sessions = {}
+
+SESSION_HEADER = "X-Session-ID"
+MENU_CHOICES = ("1", "2", "3")
+TRACK_PROMPT = (
+    "🔎 Vui lòng nhập tên người đặt hàng, số điện thoại hoặc mã đơn để tra cứu đơn hàng.\n"
+    "(Hoặc bấm '0' để quay lại menu chính.)"
+)
+
+# Khóa theo session để các request của cùng một người dùng được xử lý tuần tự trong
+# process; giữa các worker thì _run_turn giữ thêm khóa của session store
+_session_locks = weakref.WeakValueDictionary()
+
+def _session_lock(session_id: str) -> asyncio.Lock:
+    lock = _session_locks.get(session_id)
+    if lock is None:
+        lock = _session_locks[session_id] = asyncio.Lock()
+    return lock
 
 @router.post("/", response_model=ChatResponse)
-def chat(request: ChatRequest):
+@metrics.timed("api.chat")
+async def chat(
+    request: ChatRequest,
+    response: Response,
+    x_session_id: Optional[str] = Header(default=None, max_length=128),
+):
+    session_id = request.session_id or x_session_id or new_session_id()
+    user_input = request.user_input.strip()
+
+    async with _session_lock(session_id):
+        # State machine (DB, regex, session store) chạy trong thread; chỉ lời gọi LLM được await
+        reply, prompt = await asyncio.to_thread(_run_turn, session_id, user_input)
+        if prompt is not None:
+            reply = order_flow.format_followup(await allm_generate(prompt))
+
+    response.headers[SESSION_HEADER] = session_id
+    return ChatResponse(reply=reply, session_id=session_id)
+
+@router.post("/stream")
+async def chat_stream(
+    request: ChatRequest,
+    x_session_id: Optional[str] = Header(default=None, max_length=128),
+):
+    """
+    Như /chat/ nhưng trả về server-sent events để client hiện câu trả lời dần dần:
+    nhiều event `delta` ({"text": đoạn mới}) rồi một event `done`
+    ({"reply": câu trả lời đầy đủ, "session_id": ...}). Chỉ câu hỏi lại do LLM sinh
+    mới thật sự được stream; các câu trả lời khác gửi trong một delta duy nhất.
+    """
+    session_id = request.session_id or x_session_id or new_session_id()
     user_input = request.user_input.strip()
-    session = user_sessions.get("default", {"state": "menu"})
 
+    async def events():
+        async with _session_lock(session_id):
+            reply, prompt = await asyncio.to_thread(_run_turn, session_id, user_input)
+            if prompt is None:
+                yield _sse("delta", {"text": reply})
+            else:
+                yield _sse("delta", {"text": order_flow.FOLLOWUP_PREFIX})
+                parts = []
+                async for text in allm_generate_stream(prompt):
+                    parts.append(text)
+                    yield _sse("delta", {"text": text})
+                yield _sse("delta", {"text": order_flow.FOLLOWUP_SUFFIX})
+                reply = order_flow.format_followup("".join(parts))
+        yield _sse("done", {"reply": reply, "session_id": session_id})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={SESSION_HEADER: session_id, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/batch", response_model=ChatBatchResponse)
+@metrics.timed("api.chat_batch")
+async def chat_batch(request: ChatBatchRequest):
+    """
+    Xử lý nhiều tin nhắn (của một hay nhiều session) trong một request.
+    Tin nhắn được chia thành từng đợt: đợt k gồm tin nhắn thứ k của mỗi session,
+    nên thứ tự trong từng session được giữ nguyên. Mỗi đợt chạy phần state machine
+    của mọi session trên cùng một thread (một connection DB, một snapshot danh mục),
+    rồi gọi LLM đồng thời cho các lượt cần sinh câu trả lời.
+    """
+    items = [(m.session_id or new_session_id(), m.user_input.strip()) for m in request.messages]
+    # session_id -> vị trí các tin nhắn của session đó, theo thứ tự gửi
+    positions = {}
+    for i, (session_id, _) in enumerate(items):
+        positions.setdefault(session_id, []).append(i)
+    metrics.inc("chat_batch_messages", len(items))
+
+    replies = [None] * len(items)
+    async with contextlib.AsyncExitStack() as stack:
+        # Khóa theo thứ tự cố định để hai batch chung session không chờ lẫn nhau
+        for session_id in sorted(positions):
+            await stack.enter_async_context(_session_lock(session_id))
+
+        for wave in range(max(len(p) for p in positions.values())):
+            indexes = [p[wave] for p in positions.values() if wave < len(p)]
+            results = await asyncio.to_thread(_run_turns, [items[i] for i in indexes])
+            prompts = [(i, prompt) for i, (_, prompt) in zip(indexes, results) if prompt is not None]
+            generated = await asyncio.gather(*(allm_generate(prompt) for _, prompt in prompts))
+            for i, (reply, _) in zip(indexes, results):
+                replies[i] = reply
+            for (i, _), text in zip(prompts, generated):
+                replies[i] = order_flow.format_followup(text)
+
+    return ChatBatchResponse(replies=[
+        ChatResponse(reply=reply, session_id=session_id)
+        for reply, (session_id, _) in zip(replies, items)
+    ])
+
+def _run_turns(turns):
+    """Chạy một đợt lượt hội thoại trên thread hiện tại, dùng chung một snapshot danh mục."""
+    with catalog_cache.pinned():
+        return [_run_turn(session_id, user_input) for session_id, user_input in turns]
+
+def _run_turn(session_id: str, user_input: str):
+    store = get_store()
+    with store.lock(session_id):
+        with metrics.span("session.load"):
+            session = store.load(session_id)
+        metrics.inc("chat_turns", state=session.get("state", "menu"))
+        reply, prompt = _route(user_input, session)
+        with metrics.span("session.save"):
+            store.save(session_id, session)
+    return reply, prompt
+
+def _route(user_input: str, session: dict):
+    """
+    Chạy một lượt hội thoại trên session.
+    Trả về (reply, prompt): prompt khác None khi câu trả lời cần sinh bằng LLM.
+    """
+    prompt = None
     if "state" not in session:
         session["state"] = "menu"
         
@@ -25,8 +164,7 @@ def chat(request: ChatRequest):
             "- Bấm '2' để Xem các loại sách khả dụng\n"
             "- Bấm '3' để Tra cứu đơn hàng"
         )
-        user_sessions["default"] = session
-        return ChatResponse(reply=reply)
+        return reply, prompt
 
     # Menu chính
     if session["state"] == "menu":
@@ -41,14 +179,15 @@ def chat(request: ChatRequest):
             )
         elif user_input == "2":
             reply, done = view_books_flow.handle(user_input, session)
-            session["state"] = "menu"
         elif user_input == "3":
             session["state"] = "track"
-            reply = (
-                "🔎 Vui lòng nhập tên người đặt hàng để tra cứu đơn hàng.\n"
-                "(Hoặc bấm '0' để quay lại menu chính.)"
-            )
+            # Đã hỏi tên ở đây, lượt sau là tên cần tra cứu
+            session["awaiting_name"] = True
+            reply = TRACK_PROMPT
         else:
+            routed = _route_intent(user_input, session)
+            if routed is not None:
+                return routed
             reply = (
                 "📚 Cảm ơn quý khách đã sử dụng Bookstore Chatbot!\n"
                 "Vui lòng chọn tính năng:\n"
@@ -59,7 +198,17 @@ def chat(request: ChatRequest):
 
     # Đặt sách
     elif session["state"] == "order":
-        reply, done = order_flow.handle(user_input, session)
+        reply, done, prompt = order_flow.prepare(user_input, session)
+        if done:
+            session["state"] = "menu"
+
+    # Xem / tìm kiếm sách
+    elif session["state"] == "browse":
+        if user_input in MENU_CHOICES:
+            # Chọn tính năng khác ngay từ màn hình xem sách
+            session["state"] = "menu"
+            return _route(user_input, session)
+        reply, done = view_books_flow.handle(user_input, session)
         if done:
             session["state"] = "menu"
 
@@ -70,5 +219,46 @@ def chat(request: ChatRequest):
             session["state"] = "menu"
             reply += "\n\n↩️ Quay lại menu chính."
 
-    user_sessions["default"] = session
-    return ChatResponse(reply=reply)
+    return reply, prompt
+
+def _route_intent(user_input: str, session: dict):
+    """
+    Câu tự do ở menu chính: đoán ý định bằng luật (không gọi LLM) và chuyển thẳng
+    vào flow tương ứng với chính câu đó. Trả về None nếu không đoán được.
+    """
+    name = intent.classify(user_input)
+    metrics.inc("intent_routes", intent=name or "none")
+    prompt = None
+
+    if name == intent.ORDER:
+        # Câu đặt hàng đầy đủ được xử lý ngay, không cần bấm '1' rồi nhập lại
+        session["state"] = "order"
+        session["order_info"] = {}
+        reply, done, prompt = order_flow.prepare(user_input, session)
+        if done:
+            session["state"] = "menu"
+
+    elif name == intent.BROWSE:
+        query = intent.browse_query(user_input)
+        if query:
+            session["state"] = "browse"
+        # Không có từ khóa: hiện trang đầu như khi bấm '2'
+        reply, done = view_books_flow.handle(query or "2", session)
+        if done:
+            session["state"] = "menu"
+
+    elif name == intent.TRACK:
+        session["state"] = "track"
+        session["awaiting_name"] = True
+        query = intent.track_query(user_input)
+        if not query:
+            return TRACK_PROMPT, None
+        reply, done = track_order_flow.handle(query, session)
+        if done:
+            session["state"] = "menu"
+            reply += "\n\n↩️ Quay lại menu chính."
+
+    else:
+        return None
+
+    return reply, prompt
@@ -0,0 +1,33 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from app.api.schemas import Order, OrdersPage, OrderSummary
+from app.db.database import count_orders, get_order, get_order_history
+
+router = APIRouter()
+
+MAX_PAGE_SIZE = 100
+
+@router.get("/", response_model=OrdersPage)
+def list_orders(
+    customer_name: Optional[str] = None,
+    phone: Optional[str] = None,
+    status: Optional[str] = None,
+    cursor: int = Query(0, ge=0, description="order_id cuối cùng của trang trước (0 = từ đơn mới nhất)"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+):
+    """Lịch sử đơn hàng, mới nhất trước, phân trang theo keyset trên order_id."""
+    orders, next_cursor = get_order_history(customer_name, phone, status, cursor, limit)
+    return OrdersPage(orders=orders, next_cursor=next_cursor)
+
+@router.get("/summary", response_model=OrderSummary)
+def order_summary(customer_name: Optional[str] = None, phone: Optional[str] = None):
+    """Tổng số đơn và số đơn theo trạng thái (lọc theo tên khách và/hoặc số điện thoại)."""
+    return count_orders(customer_name, phone)
+
+@router.get("/{order_id}", response_model=Order)
+def read_order(order_id: int):
+    order = get_order(order_id)
+    if order is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy đơn hàng")
+    return order
@@ -1,7 +1,59 @@
-from pydantic import BaseModel
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
 
 class ChatRequest(BaseModel):
     user_input: str
+    # Bỏ trống ở lượt đầu: server tạo session mới và trả về trong ChatResponse / header X-Session-ID
+    session_id: Optional[str] = Field(default=None, max_length=128)
 
 class ChatResponse(BaseModel):
     reply: str
+    session_id: Optional[str] = None
+
+# Số tin nhắn tối đa trong một request /chat/batch
+MAX_BATCH_MESSAGES = 200
+
+class ChatBatchRequest(BaseModel):
+    # Tin nhắn cùng session_id được xử lý đúng theo thứ tự trong danh sách;
+    # tin nhắn không có session_id được tạo session mới riêng
+    messages: List[ChatRequest] = Field(min_length=1, max_length=MAX_BATCH_MESSAGES)
+
+class ChatBatchResponse(BaseModel):
+    # Cùng thứ tự với `messages` trong request
+    replies: List[ChatResponse]
+
+class Book(BaseModel):
+    book_id: int
+    title: str
+    author: Optional[str] = None
+    price: Optional[int] = None
+    stock: Optional[int] = None
+    category: Optional[str] = None
+
+class BooksPage(BaseModel):
+    books: List[Book]
+    # Truyền lại làm `cursor` để lấy trang tiếp; None khi đã hết
+    next_cursor: Optional[int] = None
+
+class OrderItem(BaseModel):
+    order_id: int
+    book_id: Optional[int] = None
+    book_title: Optional[str] = None
+    quantity: Optional[int] = None
+    status: Optional[str] = None
+    # "YYYY-MM-DD HH:MM:SS" (UTC); None với đơn tạo trước khi có cột created_at
+    created_at: Optional[str] = None
+
+class Order(OrderItem):
+    customer_name: Optional[str] = None
+    phone: Optional[str] = None
+    address: Optional[str] = None
+
+class OrdersPage(BaseModel):
+    orders: List[OrderItem]
+    # Truyền lại làm `cursor` để lấy trang đơn cũ hơn; None khi đã hết
+    next_cursor: Optional[int] = None
+
+class OrderSummary(BaseModel):
+    total: int
+    by_status: Dict[str, int]
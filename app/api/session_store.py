@@ -0,0 +1,219 @@
+"""
+Lưu trạng thái hội thoại theo session_id.
+
+Backend chọn bằng SESSION_BACKEND:
+  - "memory" (mặc định): dict trong process, có TTL, LRU và giới hạn bộ nhớ;
+  - "sqlite": một file SQLite dùng chung, để nhiều worker uvicorn phía sau
+    load balancer cùng đọc/ghi một trạng thái.
+Cả hai có cùng giao diện `load(session_id)`, `save(session_id, session)`,
+`delete(session_id)`, `lock(session_id)`, `stats()`. Session là dict JSON-serializable.
+
+Một lượt hội thoại (load -> xử lý -> save) chạy trong `with store.lock(session_id)`
+để hai lượt đồng thời của cùng session không ghi đè trạng thái của nhau. Với
+"sqlite" đây là khóa thuê (lease) trong file DB dùng chung nên giữ được cả giữa
+các worker; với "memory" khóa asyncio theo session trong router là đủ.
+"""
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+DEFAULT_TTL = 30 * 60
+DEFAULT_MAX_SESSIONS = 10_000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Khóa session trong SQLite tự hết hạn sau chừng này giây (worker giữ khóa bị chết)
+LOCK_LEASE = 10.0
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _new_session() -> dict:
+    return {"state": "menu"}
+
+
+class MemorySessionStore:
+    def __init__(self, ttl: float = DEFAULT_TTL, max_sessions: int = DEFAULT_MAX_SESSIONS,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        # session_id -> (json dạng bytes UTF-8, expires_at); lưu bytes để _bytes đúng là số byte
+        # (tiếng Việt có dấu 2-3 byte mỗi ký tự) và tránh chia sẻ dict giữa request
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def load(self, session_id: str) -> dict:
+        with self._lock:
+            item = self._data.get(session_id)
+            if item is None:
+                return _new_session()
+            if item[1] <= time.time():
+                self._drop(session_id)
+                return _new_session()
+            self._data.move_to_end(session_id)
+            return json.loads(item[0])
+
+    def save(self, session_id: str, session: dict):
+        raw = json.dumps(session, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            if session_id in self._data:
+                self._drop(session_id)
+            self._data[session_id] = (raw, time.time() + self.ttl)
+            self._bytes += len(raw)
+            self._evict()
+
+    def delete(self, session_id: str):
+        with self._lock:
+            if session_id in self._data:
+                self._drop(session_id)
+
+    def _drop(self, session_id: str):
+        raw, _ = self._data.pop(session_id)
+        self._bytes -= len(raw)
+
+    def _evict(self):
+        now = time.time()
+        # Session cũ nhất nằm đầu OrderedDict: bỏ khi hết hạn hoặc khi vượt giới hạn
+        while self._data:
+            oldest, (raw, expires) = next(iter(self._data.items()))
+            if expires > now and len(self._data) <= self.max_sessions and self._bytes <= self.max_bytes:
+                break
+            self._drop(oldest)
+            self.evictions += 1
+
+    def lock(self, session_id: str):
+        # Một process: các lượt cùng session đã được khóa asyncio trong router xếp hàng
+        return contextlib.nullcontext()
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._data), "bytes": self._bytes, "evictions": self.evictions}
+
+
+class SQLiteSessionStore:
+    # Dọn session hết hạn sau mỗi chừng này lần save
+    PURGE_EVERY = 500
+
+    def __init__(self, path, ttl: float = DEFAULT_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS Sessions (
+                    session_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON Sessions(expires_at)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS SessionLocks (
+                    session_id TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+        self._saves = 0
+
+    def load(self, session_id: str) -> dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM Sessions WHERE session_id = ? AND expires_at > ?",
+                (session_id, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else _new_session()
+
+    def save(self, session_id: str, session: dict):
+        raw = json.dumps(session, ensure_ascii=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO Sessions (session_id, data, expires_at) VALUES (?, ?, ?)",
+                (session_id, raw, time.time() + self.ttl),
+            )
+            self._saves += 1
+            if self._saves % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM Sessions WHERE expires_at <= ?", (time.time(),))
+                self._conn.execute("DELETE FROM SessionLocks WHERE expires_at <= ?", (time.time(),))
+
+    def delete(self, session_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM Sessions WHERE session_id = ?", (session_id,))
+
+    @contextlib.contextmanager
+    def lock(self, session_id: str):
+        """
+        Giữ session cho một lượt, kể cả giữa các process: chờ (thăm dò với backoff)
+        tới khi không ai giữ hoặc khóa của người giữ trước đã quá LOCK_LEASE giây.
+        """
+        owner = uuid.uuid4().hex
+        delay = 0.002
+        while True:
+            now = time.time()
+            with self._lock, self._conn:
+                acquired = self._conn.execute(
+                    "INSERT INTO SessionLocks (session_id, owner, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(session_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                    "WHERE SessionLocks.expires_at <= ?",
+                    (session_id, owner, now + LOCK_LEASE, now),
+                ).rowcount
+            if acquired:
+                break
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        try:
+            yield
+        finally:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "DELETE FROM SessionLocks WHERE session_id = ? AND owner = ?", (session_id, owner)
+                )
+
+    def stats(self) -> dict:
+        with self._lock:
+            count = self._conn.execute(
+                "SELECT COUNT(*) FROM Sessions WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+        return {"sessions": count}
+
+
+def from_env():
+    backend = os.getenv("SESSION_BACKEND", "memory")
+    ttl = float(os.getenv("SESSION_TTL", DEFAULT_TTL))
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_DB_PATH", "app/db/sessions.db"), ttl=ttl)
+    return MemorySessionStore(
+        ttl=ttl,
+        max_sessions=int(os.getenv("SESSION_MAX", DEFAULT_MAX_SESSIONS)),
+        max_bytes=int(float(os.getenv("SESSION_MAX_MB", DEFAULT_MAX_BYTES / 1024 / 1024)) * 1024 * 1024),
+    )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = from_env()
+    return _store
+
+
+def set_store(store):
+    global _store
+    _store = store
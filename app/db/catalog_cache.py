@@ -0,0 +1,127 @@
+"""
+Cache danh mục sách trong bộ nhớ.
+
+Danh mục được nạp một lần từ bảng Books và giữ dưới dạng dict theo tên sách
+đã chuẩn hóa (kèm TitleIndex). Mỗi lần đọc chỉ kiểm tra bộ đếm
+`CatalogMeta.books_version` (do trigger trên Books tăng lên), nên cache tự
+nạp lại khi danh mục thay đổi, kể cả khi thay đổi đến từ process khác.
+Riêng cột stock không làm tăng bộ đếm (đổi liên tục khi đặt hàng) nên sách
+trong cache không có tồn kho: stock chỉ đọc và kiểm tra trong DB (place_order).
+
+Nếu bật snapshot (mặc định, xem app/db/catalog_snapshot.py), danh mục được đọc
+thẳng từ file đã biên dịch sẵn và mmap thay vì nạp cả bảng Books: sách được giải
+mã khi cần, TitleIndex dùng posting list trong file.
+
+Khi xử lý nhiều lượt liên tiếp (ví dụ /chat/batch), `pinned()` giữ một snapshot
+cho thread hiện tại để chỉ kiểm tra bộ đếm một lần cho cả lô.
+"""
+import threading
+from contextlib import contextmanager
+
+from app.db import database
+from app.db.database import get_all_books, get_catalog_version
+from app.logic.utils import normalize_for_match
+
+_lock = threading.Lock()
+# Snapshot hiện tại, được thay nguyên khối khi nạp lại để reader không thấy trạng thái dở dang
+_catalog = {"path": None, "version": None, "books": [], "by_title": {}, "title_index": None, "snapshot": None}
+# Snapshot được ghim cho thread hiện tại (xem pinned())
+_local = threading.local()
+
+
+def _load_snapshot(path: str):
+    from app.db import catalog_snapshot
+
+    if not catalog_snapshot.ENABLED:
+        return None
+    snap = catalog_snapshot.load()
+    if snap is None:
+        return None
+    return {
+        "path": path,
+        # books_version ghi trong snapshot (có thể mới hơn version vừa đọc nếu vừa dựng lại)
+        "version": snap.version,
+        "books": None,
+        "by_title": None,
+        "title_index": snap.title_index,
+        "snapshot": snap,
+    }
+
+
+def _load(path: str, version: int) -> dict:
+    catalog = _load_snapshot(path)
+    if catalog is not None:
+        return catalog
+    books = get_all_books()
+    by_title = {}
+    for b in books:
+        b.pop("stock")
+        # Giữ sách có book_id nhỏ nhất nếu trùng tên sau chuẩn hóa
+        by_title.setdefault(normalize_for_match(b["title"]), b)
+    return {
+        "path": path,
+        "version": version,
+        "books": books,
+        "by_title": by_title,
+        "title_index": None,
+        "snapshot": None,
+    }
+
+
+def _is_stale(catalog: dict, path: str, version: int) -> bool:
+    return catalog["path"] != path or catalog["version"] != version
+
+
+def refresh(force: bool = False) -> dict:
+    """Trả về snapshot danh mục, nạp lại nếu DB đã thay đổi (hoặc khi force=True)."""
+    global _catalog
+    pinned_catalog = getattr(_local, "catalog", None)
+    if pinned_catalog is not None and not force:
+        return pinned_catalog
+    path = str(database.DB_PATH)
+    version = get_catalog_version()
+    if force or _is_stale(_catalog, path, version):
+        with _lock:
+            if force or _is_stale(_catalog, path, version):
+                # Books đổi có thể do writer ngoài app: điền cột chuẩn hóa/FTS còn thiếu trước
+                database.repair_normalized()
+                _catalog = _load(path, version)
+    return _catalog
+
+
+@contextmanager
+def pinned():
+    """Trong khối with, mọi lần đọc trên thread này dùng chung một snapshot, không truy vấn lại books_version."""
+    previous = getattr(_local, "catalog", None)
+    _local.catalog = refresh()
+    try:
+        yield _local.catalog
+    finally:
+        _local.catalog = previous
+
+
+def invalidate():
+    global _catalog
+    with _lock:
+        _catalog = dict(_catalog, version=None)
+
+
+def find_by_title(title: str):
+    if not title:
+        return None
+    catalog = refresh()
+    if catalog["snapshot"] is not None:
+        return catalog["snapshot"].find_by_title(normalize_for_match(title))
+    return catalog["by_title"].get(normalize_for_match(title))
+
+
+def title_index():
+    """TitleIndex của danh mục hiện tại, chỉ dựng lại khi danh mục thay đổi."""
+    from app.logic.title_index import TitleIndex
+
+    catalog = refresh()
+    if catalog["title_index"] is None:
+        with _lock:
+            if catalog["title_index"] is None:
+                catalog["title_index"] = TitleIndex(b["title"] for b in catalog["books"])
+    return catalog["title_index"]
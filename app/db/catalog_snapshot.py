@@ -0,0 +1,338 @@
+"""
+Snapshot nhị phân của danh mục sách, mở bằng mmap.
+
+Mỗi worker trước đây phải đọc cả bảng Books và chuẩn hóa lại mọi tên sách để
+dựng TitleIndex. Snapshot chứa sẵn các thứ đó đã biên dịch: bản ghi sách (id,
+giá, tên/tác giả/thể loại), tên sách đã chuẩn hóa, các posting list
+của TitleIndex và bảng băm tên chuẩn hóa -> sách. Worker chỉ mmap file rồi đọc
+trực tiếp trên vùng nhớ đó (không parse, không dựng dict), và các process cùng
+máy dùng chung page cache của hệ điều hành thay vì mỗi process một bản.
+Tồn kho không nằm trong snapshot (stock đổi không làm tăng books_version), giống
+sách trong catalog_cache.
+
+File nằm cạnh DB (`bookstore.db.catalog`) và ghi kèm `books_version` cùng mã DB
+(`db_token`) trong CatalogMeta: khi Books thay đổi, lần nạp danh mục kế tiếp tự
+dựng lại file (ghi ra file tạm rồi os.replace, reader đang mmap bản cũ không bị
+ảnh hưởng). Snapshot luôn dựng cho database.DB_PATH. Khôi phục DB từ bản sao lưu
+cũ thì xóa file snapshot hoặc dựng lại:
+
+    python -m app.db.catalog_snapshot [--db app/db/bookstore.db]
+
+Tắt bằng CATALOG_SNAPSHOT=0 (cache danh mục quay về nạp Books vào bộ nhớ).
+"""
+import argparse
+import mmap
+import os
+import struct
+import tempfile
+import time
+import zlib
+from array import array
+from pathlib import Path
+from typing import Optional
+
+from app import metrics
+from app.db import database
+from app.logic.title_index import TitleIndex
+from app.logic.utils import normalize_for_match
+
+ENABLED = os.getenv("CATALOG_SNAPSHOT", "1").lower() not in ("0", "false", "no", "off")
+SUFFIX = ".catalog"
+
+MAGIC = b"BKCATSNP"
+FORMAT_VERSION = 2
+# Số đánh dấu thứ tự byte: file ghi bằng array/struct theo thứ tự byte của máy dựng
+BYTE_ORDER_MARK = 0x01020304
+SECTIONS = (
+    "heap", "books", "by_title", "norms", "origs", "short",
+    "postings", "gram_postings", "word_postings", "by_key_gram",
+)
+# magic, format, byte order, books_version, db_token, số sách, rồi (offset, độ dài) từng section
+HEADER = struct.Struct("=8sIIqqI" + "QQ" * len(SECTIONS))
+# book_id, price, rồi (offset, độ dài) trong heap của title, author, category
+BOOK = struct.Struct("=qq6I")
+NULL_INT = -(2 ** 63)
+NULL_REF = 0xFFFFFFFF
+EMPTY_SLOT = 0xFFFFFFFF
+ALIGN = 8
+
+
+def snapshot_path(db_path) -> Path:
+    return Path(str(db_path) + SUFFIX)
+
+
+# --- Dựng snapshot ------------------------------------------------------------
+
+class _Heap:
+    """Vùng byte chứa mọi chuỗi UTF-8; chuỗi trùng nhau chỉ ghi một lần."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self._offsets = {}
+
+    def add(self, s: Optional[str]):
+        if s is None:
+            return NULL_REF, 0
+        raw = s.encode("utf-8")
+        off = self._offsets.get(raw)
+        if off is None:
+            off = self._offsets[raw] = len(self.data)
+            self.data += raw
+        return off, len(raw)
+
+
+def _hash_table(heap: _Heap, items) -> array:
+    """Bảng băm địa chỉ mở (dò tuyến tính), mỗi ô 4 uint: key_off, key_len, val_off, val_len."""
+    items = list(items)
+    capacity = 8
+    while capacity < 2 * len(items):
+        capacity *= 2
+    table = array("I", [EMPTY_SLOT, 0, 0, 0]) * capacity
+    for key, (val_off, val_len) in items:
+        key_off, key_len = heap.add(key)
+        slot = zlib.crc32(key.encode("utf-8")) & (capacity - 1)
+        while table[4 * slot] != EMPTY_SLOT:
+            slot = (slot + 1) & (capacity - 1)
+        table[4 * slot:4 * slot + 4] = array("I", (key_off, key_len, val_off, val_len))
+    return table
+
+
+def _postings_table(heap: _Heap, postings: array, mapping: dict) -> array:
+    items = []
+    for key, ids in mapping.items():
+        items.append((key, (len(postings), len(ids))))
+        postings.extend(ids)
+    return _hash_table(heap, items)
+
+
+def _refs(heap: _Heap, strings) -> array:
+    return array("I", (x for s in strings for x in heap.add(s)))
+
+
+def _int_or_null(value) -> int:
+    return NULL_INT if value is None else value
+
+
+def _compile(books, version: int, token: int) -> bytes:
+    heap = _Heap()
+    records = bytearray()
+    by_title = {}
+    for i, b in enumerate(sorted(books, key=lambda b: b["book_id"])):
+        refs = [x for field in ("title", "author", "category") for x in heap.add(b[field])]
+        records += BOOK.pack(b["book_id"], _int_or_null(b["price"]), *refs)
+        # Giữ sách có book_id nhỏ nhất nếu trùng tên sau chuẩn hóa (như catalog_cache)
+        by_title.setdefault(normalize_for_match(b["title"]), (i, 1))
+
+    parts = TitleIndex(b["title"] for b in books).parts()
+    postings = array("I")
+    sections = {
+        "books": bytes(records),
+        "by_title": _hash_table(heap, by_title.items()),
+        "norms": _refs(heap, parts["norms"]),
+        "origs": _refs(heap, parts["origs"]),
+        "short": array("I", parts["short"]),
+        "gram_postings": _postings_table(heap, postings, parts["gram_postings"]),
+        "word_postings": _postings_table(heap, postings, parts["word_postings"]),
+        "by_key_gram": _postings_table(heap, postings, parts["by_key_gram"]),
+    }
+    sections["postings"] = postings
+    sections["heap"] = bytes(heap.data)
+
+    body = bytearray()
+    layout = []
+    for name in SECTIONS:
+        raw = sections[name]
+        raw = raw.tobytes() if isinstance(raw, array) else raw
+        body += b"\0" * (-(HEADER.size + len(body)) % ALIGN)
+        layout += [HEADER.size + len(body), len(raw)]
+        body += raw
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, BYTE_ORDER_MARK, version, token, len(books), *layout)
+    return header + bytes(body)
+
+
+@metrics.timed("db.catalog_snapshot_build")
+def build() -> Path:
+    """Dựng snapshot cho database.DB_PATH từ bảng Books, ghi đè nguyên tử."""
+    conn = database.get_conn()
+    # Phiên bản và các dòng Books đọc trong cùng một transaction đọc để khớp nhau
+    conn.execute("BEGIN")
+    try:
+        meta = database.get_catalog_meta()
+        books = database.get_all_books()
+    finally:
+        conn.commit()
+    data = _compile(books, meta["books_version"], meta.get("db_token", 0))
+
+    target = snapshot_path(database.DB_PATH)
+    fd, tmp = tempfile.mkstemp(prefix=target.name + ".", suffix=".tmp", dir=target.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return target
+
+
+# --- Đọc snapshot -------------------------------------------------------------
+
+class _Strings:
+    """Dãy chuỗi chỉ đọc: cặp (offset, độ dài) trỏ vào heap, giải mã UTF-8 khi truy cập."""
+
+    def __init__(self, heap: memoryview, refs: memoryview):
+        self._heap = heap
+        self._refs = refs
+
+    def __len__(self) -> int:
+        return len(self._refs) // 2
+
+    def __getitem__(self, i: int) -> str:
+        off = self._refs[2 * i]
+        return str(self._heap[off:off + self._refs[2 * i + 1]], "utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class _WordSets:
+    """Tập từ của từng tên sách, tính từ tên đã chuẩn hóa khi cần."""
+
+    def __init__(self, norms: _Strings):
+        self._norms = norms
+
+    def __len__(self) -> int:
+        return len(self._norms)
+
+    def __getitem__(self, i: int) -> frozenset:
+        return frozenset(self._norms[i].split())
+
+
+class _HashTable:
+    """Bảng băm trong file: key (chuỗi) -> (val_off, val_len)."""
+
+    def __init__(self, heap: memoryview, slots: memoryview):
+        self._heap = heap
+        self._slots = slots
+        self._mask = len(slots) // 4 - 1
+
+    def lookup(self, key: str):
+        raw = key.encode("utf-8")
+        slots, heap = self._slots, self._heap
+        slot = zlib.crc32(raw) & self._mask
+        while True:
+            key_off = slots[4 * slot]
+            if key_off == EMPTY_SLOT:
+                return None
+            key_len = slots[4 * slot + 1]
+            if key_len == len(raw) and heap[key_off:key_off + key_len] == raw:
+                return slots[4 * slot + 2], slots[4 * slot + 3]
+            slot = (slot + 1) & self._mask
+
+
+class _Postings(_HashTable):
+    """Posting list theo key, trả về memoryview uint (không sao chép) như dict.get()."""
+
+    def __init__(self, heap: memoryview, slots: memoryview, postings: memoryview):
+        super().__init__(heap, slots)
+        self._postings = postings
+
+    def get(self, key: str, default=None):
+        found = self.lookup(key)
+        if found is None:
+            return default
+        off, length = found
+        return self._postings[off:off + length]
+
+
+class CatalogSnapshot:
+    """Danh mục đọc thẳng từ file snapshot đã mmap."""
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < HEADER.size:
+            raise ValueError(f"{path}: snapshot hỏng")
+        fields = HEADER.unpack_from(self._mm)
+        magic, fmt, bom, self.version, self.token, self.book_count = fields[:6]
+        if magic != MAGIC or fmt != FORMAT_VERSION or bom != BYTE_ORDER_MARK:
+            raise ValueError(f"{path}: không phải snapshot định dạng {FORMAT_VERSION} của máy này")
+        view = memoryview(self._mm)
+        layout = fields[6:]
+        sec = {
+            name: view[layout[2 * i]:layout[2 * i] + layout[2 * i + 1]]
+            for i, name in enumerate(SECTIONS)
+        }
+        self._heap = sec["heap"]
+        self._books = sec["books"]
+        self._by_title = _HashTable(self._heap, sec["by_title"].cast("I"))
+        postings = sec["postings"].cast("I")
+        norms = _Strings(self._heap, sec["norms"].cast("I"))
+        self.title_index = TitleIndex.from_parts(
+            norms,
+            _Strings(self._heap, sec["origs"].cast("I")),
+            _WordSets(norms),
+            _Postings(self._heap, sec["gram_postings"].cast("I"), postings),
+            _Postings(self._heap, sec["word_postings"].cast("I"), postings),
+            _Postings(self._heap, sec["by_key_gram"].cast("I"), postings),
+            sec["short"].cast("I"),
+        )
+
+    def _str(self, off: int, length: int) -> Optional[str]:
+        return None if off == NULL_REF else str(self._heap[off:off + length], "utf-8")
+
+    def _book(self, i: int) -> dict:
+        book_id, price, *refs = BOOK.unpack_from(self._books, i * BOOK.size)
+        return {
+            "book_id": book_id,
+            "title": self._str(refs[0], refs[1]),
+            "author": self._str(refs[2], refs[3]),
+            "price": None if price == NULL_INT else price,
+            "category": self._str(refs[4], refs[5]),
+        }
+
+    def find_by_title(self, title_norm: str) -> Optional[dict]:
+        found = self._by_title.lookup(title_norm)
+        return self._book(found[0]) if found else None
+
+
+def _open(path: Path) -> Optional[CatalogSnapshot]:
+    try:
+        return CatalogSnapshot(path)
+    except (OSError, ValueError):
+        return None
+
+
+@metrics.timed("db.catalog_snapshot_load")
+def load() -> Optional[CatalogSnapshot]:
+    """
+    Snapshot khớp với Books hiện tại của database.DB_PATH, dựng lại nếu thiếu/cũ. Trả
+    về None nếu không đọc/ghi được file (ví dụ thư mục chỉ đọc): khi đó dùng cách nạp cũ.
+    """
+    meta = database.get_catalog_meta()
+    path = snapshot_path(database.DB_PATH)
+    snap = _open(path)
+    if snap is not None and snap.version == meta["books_version"] and snap.token == meta.get("db_token", 0):
+        return snap
+    try:
+        build()
+    except OSError:
+        return None
+    return _open(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=None, help=f"file SQLite (mặc định {database.DB_PATH})")
+    args = parser.parse_args()
+    if args.db:
+        database.DB_PATH = Path(args.db)
+    start = time.perf_counter()
+    target = build()
+    snap = CatalogSnapshot(target)
+    print(
+        f"✅ {target}: {snap.book_count} sách, {len(snap.title_index)} tên khác nhau, "
+        f"{target.stat().st_size / 1024:.0f} KiB, books_version {snap.version} "
+        f"({time.perf_counter() - start:.2f}s)"
+    )
+    database.close_all_conns()
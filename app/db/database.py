@@ -1,10 +1,145 @@
 import sqlite3
+import threading
+import time
 from pathlib import Path
+from typing import Optional
+
+from app import metrics
+from app.logic.utils import _extract_phone, fold_for_search, normalize_for_match
 
 DB_PATH = Path("app/db/bookstore.db")
 
+# Thời gian chờ khi DB đang bị khóa bởi writer khác (giây)
+BUSY_TIMEOUT = 10.0
+# Số câu lệnh đã prepare được giữ lại trên mỗi connection
+STATEMENT_CACHE_SIZE = 128
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Số lần thử lại place_order khi DB vẫn bị khóa sau BUSY_TIMEOUT
+ORDER_RETRIES = 5
+ORDER_STATUS_NEW = "Đang xử lý"
+
+# Pool connection theo thread: mỗi thread của threadpool FastAPI giữ một connection riêng
+_pool = {}
+_pool_lock = threading.Lock()
+# Các file DB đã chạy init_db() trong process này (connection đầu tiên tới file tự chạy)
+_initialized = set()
+_init_lock = threading.Lock()
+
+SELECT_ALL_BOOKS = "SELECT book_id, title, author, price, stock, category FROM Books"
+SELECT_CATALOG_VERSION = "SELECT value FROM CatalogMeta WHERE key = 'books_version'"
+SELECT_CATALOG_META = "SELECT key, value FROM CatalogMeta"
+INSERT_ORDER = """
+    INSERT INTO Orders (customer_name, customer_name_norm, phone, address, book_id, quantity, status, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    RETURNING order_id, customer_name, phone, address, book_id, quantity, status, created_at
+"""
+# Chỉ trừ kho khi còn đủ: điều kiện và phép trừ nằm trong cùng một câu lệnh
+RESERVE_STOCK = "UPDATE Books SET stock = stock - ? WHERE book_id = ? AND stock >= ? RETURNING stock"
+SELECT_BOOK_STOCK = "SELECT stock FROM Books WHERE book_id = ?"
+SELECT_BOOKS_PAGE = "SELECT book_id, title, author, price, stock, category FROM Books WHERE book_id > ?"
+SEARCH_BOOKS = """
+    SELECT b.book_id, b.title, b.author, b.price, b.stock, b.category
+    FROM BooksFts
+    JOIN Books b ON b.book_id = BooksFts.rowid
+    WHERE BooksFts MATCH ?
+    ORDER BY bm25(BooksFts, 10.0, 3.0, 1.0)
+    LIMIT ?
+"""
+SELECT_ORDER = """
+    SELECT o.order_id, o.customer_name, o.phone, o.address, o.book_id, o.quantity, o.status, o.created_at, b.title
+    FROM Orders o
+    LEFT JOIN Books b ON o.book_id = b.book_id
+    WHERE o.order_id = ?
+"""
+# Chỉ đọc các cột có trong index phủ idx_orders_*_history, không phải đọc bảng Orders
+SELECT_ORDER_HISTORY = """
+    SELECT o.order_id, o.book_id, o.quantity, o.status, o.created_at, b.title
+    FROM Orders o
+    LEFT JOIN Books b ON o.book_id = b.book_id
+"""
+COUNT_ORDERS_BY_STATUS = "SELECT o.status, COUNT(*) FROM Orders o"
+# Dòng có cột *_norm NULL: ghi từ ngoài app (sqlite3 CLI, công cụ quản trị...), cần điền lại
+SELECT_PENDING_BOOKS = "SELECT book_id, title, author, category FROM Books WHERE title_norm IS NULL"
+SELECT_PENDING_ORDERS = "SELECT order_id, customer_name FROM Orders WHERE customer_name_norm IS NULL"
+UPDATE_ORDER_NAME_NORM = "UPDATE Orders SET customer_name_norm = ? WHERE order_id = ?"
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    # Hàm chuẩn hóa dùng trong migration và khi dựng lại FTS (trigger không gọi hàm Python)
+    conn.create_function("normalize_for_match", 1, normalize_for_match, deterministic=True)
+    conn.create_function("fold_for_search", 1, fold_for_search, deterministic=True)
+    return conn
+
+
+def get_conn() -> sqlite3.Connection:
+    """
+    Trả về connection của thread hiện tại (tạo mới nếu chưa có).
+    Connection được dùng lại giữa các request, caller KHÔNG được close().
+    """
+    ident = threading.get_ident()
+    path = str(DB_PATH)
+    entry = _pool.get(ident)
+    if entry is not None and entry[0] == path:
+        return entry[1]
+
+    conn = _connect(path)
+    with _pool_lock:
+        stale = _pool.get(ident)
+        if stale is not None:
+            stale[1].close()
+        # Dọn connection của các thread đã kết thúc
+        alive = {t.ident for t in threading.enumerate()}
+        for dead in [i for i in _pool if i not in alive]:
+            _pool.pop(dead)[1].close()
+        _pool[ident] = (path, conn)
+    if path not in _initialized:
+        _init_schema(path, conn)
+    return conn
+
+
+def close_all_conns():
+    """Đóng toàn bộ connection trong pool (dùng khi shutdown hoặc đổi DB_PATH)."""
+    with _pool_lock:
+        for _, conn in _pool.values():
+            conn.close()
+        _pool.clear()
+
+
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
+    """
+    Tạo bảng và chạy migration cho DB_PATH. Không bắt buộc gọi trước khi dùng:
+    get_conn() tự làm việc này ở connection đầu tiên tới mỗi file DB.
+    """
+    path = str(DB_PATH)
+    conn = get_conn()
+    with _init_lock:
+        _create_schema(conn)
+        _initialized.add(path)
+
+
+def _init_schema(path: str, conn):
+    with _init_lock:
+        if path not in _initialized:
+            _create_schema(conn)
+            _initialized.add(path)
+
+
+def _create_schema(conn):
     cur = conn.cursor()
 
     cur.execute("""
@@ -31,108 +166,521 @@ def init_db():
         )
     """)
 
+    # Bộ đếm phiên bản danh mục: tăng mỗi khi Books thay đổi để cache tự làm mới
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS CatalogMeta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+    """)
+    cur.execute("INSERT OR IGNORE INTO CatalogMeta (key, value) VALUES ('books_version', 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS books_version_{event.lower()}
+            AFTER {event} ON Books
+            BEGIN
+                UPDATE CatalogMeta SET value = value + 1 WHERE key = 'books_version';
+            END
+        """)
+
+    conn.commit()
+    _apply_migrations(conn)
+    repair_normalized(conn)
+
+
+def _migrate_normalized_columns(cur):
+    # Cột "bóng" đã bỏ dấu + chữ thường (giống normalize_for_match) để tra cứu qua index
+    cur.execute("ALTER TABLE Books ADD COLUMN title_norm TEXT")
+    cur.execute("ALTER TABLE Orders ADD COLUMN customer_name_norm TEXT")
+    cur.execute("UPDATE Books SET title_norm = normalize_for_match(title)")
+    cur.execute("UPDATE Orders SET customer_name_norm = normalize_for_match(customer_name)")
+
+    # Ghi từ code ngoài (seed, import...) không điền cột *_norm thì trigger điền thay
+    cur.execute("""
+        CREATE TRIGGER books_title_norm_insert
+        AFTER INSERT ON Books WHEN NEW.title_norm IS NULL
+        BEGIN
+            UPDATE Books SET title_norm = normalize_for_match(NEW.title) WHERE book_id = NEW.book_id;
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER books_title_norm_update
+        AFTER UPDATE OF title ON Books
+        BEGIN
+            UPDATE Books SET title_norm = normalize_for_match(NEW.title) WHERE book_id = NEW.book_id;
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER orders_customer_name_norm_insert
+        AFTER INSERT ON Orders WHEN NEW.customer_name_norm IS NULL
+        BEGIN
+            UPDATE Orders SET customer_name_norm = normalize_for_match(NEW.customer_name)
+            WHERE order_id = NEW.order_id;
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER orders_customer_name_norm_update
+        AFTER UPDATE OF customer_name ON Orders
+        BEGIN
+            UPDATE Orders SET customer_name_norm = normalize_for_match(NEW.customer_name)
+            WHERE order_id = NEW.order_id;
+        END
+    """)
+
+    cur.execute("CREATE INDEX idx_books_title_norm ON Books(title_norm)")
+    cur.execute("CREATE INDEX idx_orders_customer_name_norm ON Orders(customer_name_norm)")
+    cur.execute("CREATE INDEX idx_orders_book_id ON Orders(book_id)")
+    cur.execute("CREATE INDEX idx_orders_phone ON Orders(phone)")
+
+
+def _migrate_books_fts(cur):
+    # Chỉ mục full-text trên tên/tác giả/thể loại đã gập dấu (fold_for_search), rowid = book_id
+    cur.execute("""
+        CREATE VIRTUAL TABLE BooksFts USING fts5(
+            title, author, category,
+            tokenize = 'unicode61 remove_diacritics 0'
+        )
+    """)
+    cur.execute("""
+        INSERT INTO BooksFts (rowid, title, author, category)
+        SELECT book_id, fold_for_search(title), fold_for_search(author), fold_for_search(category)
+        FROM Books
+    """)
+    cur.execute("""
+        CREATE TRIGGER books_fts_insert
+        AFTER INSERT ON Books
+        BEGIN
+            INSERT INTO BooksFts (rowid, title, author, category)
+            VALUES (NEW.book_id, fold_for_search(NEW.title), fold_for_search(NEW.author), fold_for_search(NEW.category));
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER books_fts_update
+        AFTER UPDATE OF title, author, category ON Books
+        BEGIN
+            DELETE FROM BooksFts WHERE rowid = OLD.book_id;
+            INSERT INTO BooksFts (rowid, title, author, category)
+            VALUES (NEW.book_id, fold_for_search(NEW.title), fold_for_search(NEW.author), fold_for_search(NEW.category));
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER books_fts_delete
+        AFTER DELETE ON Books
+        BEGIN
+            DELETE FROM BooksFts WHERE rowid = OLD.book_id;
+        END
+    """)
+
+
+def _migrate_books_category_index(cur):
+    # Phân trang keyset theo book_id trong một thể loại
+    cur.execute("CREATE INDEX idx_books_category ON Books(category, book_id)")
+
+
+def _migrate_stock_keeps_catalog_version(cur):
+    # Trừ kho khi đặt hàng không được làm cache danh mục (và TitleIndex) nạp lại toàn bộ
+    cur.execute("DROP TRIGGER IF EXISTS books_version_update")
+    cur.execute("""
+        CREATE TRIGGER books_version_update
+        AFTER UPDATE OF title, author, price, category ON Books
+        BEGIN
+            UPDATE CatalogMeta SET value = value + 1 WHERE key = 'books_version';
+        END
+    """)
+
+
+def _migrate_books_sku(cur):
+    # Mã sách của nhà cung cấp: khóa để importer upsert (sách cũ/nhập tay có thể không có sku)
+    cur.execute("ALTER TABLE Books ADD COLUMN sku TEXT")
+    cur.execute("CREATE UNIQUE INDEX idx_books_sku ON Books(sku) WHERE sku IS NOT NULL")
+
+
+def _migrate_orders_history(cur):
+    # Thời điểm đặt đơn; đơn có trước migration không rõ thời điểm nên để NULL
+    cur.execute("ALTER TABLE Orders ADD COLUMN created_at TEXT")
+    cur.execute("""
+        CREATE TRIGGER orders_created_at_insert
+        AFTER INSERT ON Orders WHEN NEW.created_at IS NULL
+        BEGIN
+            UPDATE Orders SET created_at = CURRENT_TIMESTAMP WHERE order_id = NEW.order_id;
+        END
+    """)
+    # Index phủ cho lịch sử đơn: lọc theo khách/SĐT/trạng thái, đơn mới nhất (order_id lớn
+    # nhất) trước, phân trang keyset theo order_id và đếm theo trạng thái chỉ đọc index
+    cur.execute("DROP INDEX IF EXISTS idx_orders_customer_name_norm")
+    cur.execute("DROP INDEX IF EXISTS idx_orders_phone")
+    for name, key in (("customer", "customer_name_norm"), ("phone", "phone"), ("status", "status")):
+        cur.execute(f"""
+            CREATE INDEX idx_orders_{name}_history
+            ON Orders({key}, order_id, status, book_id, quantity, created_at)
+        """)
+
+
+def _migrate_catalog_db_token(cur):
+    # Mã ngẫu nhiên của file DB: snapshot danh mục (catalog_snapshot) chỉ dùng lại được
+    # cho đúng DB đã dựng ra nó, không nhầm với DB khác có cùng books_version
+    cur.execute("INSERT OR IGNORE INTO CatalogMeta (key, value) VALUES ('db_token', random())")
+
+
+def _migrate_sql_only_triggers(cur):
+    # Trigger gọi hàm Python (normalize_for_match/fold_for_search) làm mọi writer ngoài app
+    # lỗi "no such function". Từ đây app tự tính cột *_norm và dòng FTS trong câu lệnh ghi;
+    # trigger chỉ còn SQL thuần: ghi từ ngoài làm *_norm thành NULL, repair_normalized() điền lại
+    for name in (
+        "books_title_norm_insert", "books_title_norm_update",
+        "orders_customer_name_norm_insert", "orders_customer_name_norm_update",
+        "books_fts_insert", "books_fts_update",
+    ):
+        cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cur.execute("""
+        CREATE TRIGGER books_norm_stale
+        AFTER UPDATE OF title, author, category ON Books WHEN NEW.title_norm IS OLD.title_norm
+        BEGIN
+            UPDATE Books SET title_norm = NULL WHERE book_id = NEW.book_id;
+            DELETE FROM BooksFts WHERE rowid = NEW.book_id;
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER orders_customer_name_norm_stale
+        AFTER UPDATE OF customer_name ON Orders WHEN NEW.customer_name_norm IS OLD.customer_name_norm
+        BEGIN
+            UPDATE Orders SET customer_name_norm = NULL WHERE order_id = NEW.order_id;
+        END
+    """)
+
+
+# Danh sách migration theo thứ tự version; chỉ được thêm mới, không sửa migration đã phát hành
+MIGRATIONS = (
+    (1, "normalized_search_columns", _migrate_normalized_columns),
+    (2, "books_fts", _migrate_books_fts),
+    (3, "books_category_index", _migrate_books_category_index),
+    (4, "stock_keeps_catalog_version", _migrate_stock_keeps_catalog_version),
+    (5, "books_sku", _migrate_books_sku),
+    (6, "orders_history", _migrate_orders_history),
+    (7, "catalog_db_token", _migrate_catalog_db_token),
+    (8, "sql_only_triggers", _migrate_sql_only_triggers),
+)
+
+
+def _apply_migrations(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS SchemaMigrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
     conn.commit()
-    conn.close()
+    for version, name, migrate in MIGRATIONS:
+        # BEGIN IMMEDIATE để hai process khởi động cùng lúc không chạy trùng một migration
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            applied = conn.execute(
+                "SELECT 1 FROM SchemaMigrations WHERE version = ?", (version,)
+            ).fetchone()
+            if not applied:
+                migrate(conn.cursor())
+                conn.execute(
+                    "INSERT INTO SchemaMigrations (version, name) VALUES (?, ?)", (version, name)
+                )
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+def repair_normalized(conn=None) -> int:
+    """
+    Điền title_norm + dòng BooksFts và customer_name_norm cho các dòng ghi từ ngoài app
+    (cột *_norm còn NULL). Chạy ở connection đầu tiên của process và khi danh mục nạp lại;
+    tra đơn theo tên còn gọi repair_order_names.
+    Trả về số dòng đã điền.
+    """
+    conn = conn or get_conn()
+    books = conn.execute(SELECT_PENDING_BOOKS).fetchall()
+    orders = conn.execute(SELECT_PENDING_ORDERS).fetchall()
+    if not books and not orders:
+        return 0
+    with conn:
+        conn.executemany(
+            "UPDATE Books SET title_norm = ? WHERE book_id = ?",
+            [(normalize_for_match(title), book_id) for book_id, title, _, _ in books],
+        )
+        conn.executemany("DELETE FROM BooksFts WHERE rowid = ?", [(b[0],) for b in books])
+        conn.executemany(
+            "INSERT INTO BooksFts (rowid, title, author, category) VALUES (?, ?, ?, ?)",
+            [(b[0], *map(fold_for_search, b[1:])) for b in books],
+        )
+        conn.executemany(UPDATE_ORDER_NAME_NORM, [(normalize_for_match(name), order_id) for order_id, name in orders])
+    return len(books) + len(orders)
+
 
+def repair_order_names(conn=None) -> int:
+    """
+    Chỉ phần Orders của repair_normalized, gọi trước mỗi lần tra đơn theo tên khách để
+    đơn do writer ngoài app thêm vào tìm thấy được ngay. SELECT đi qua index
+    idx_orders_customer_history nên gần như không tốn gì khi không có dòng nào cần điền.
+    """
+    conn = conn or get_conn()
+    orders = conn.execute(SELECT_PENDING_ORDERS).fetchall()
+    if orders:
+        with conn:
+            conn.executemany(UPDATE_ORDER_NAME_NORM, [(normalize_for_match(name), order_id) for order_id, name in orders])
+    return len(orders)
 
-def get_conn():
-    return sqlite3.connect(DB_PATH)
 
+def get_schema_version() -> int:
+    row = get_conn().execute("SELECT MAX(version) FROM SchemaMigrations").fetchone()
+    return row[0] or 0
 
+
+def _book_row_to_dict(r):
+    return {
+        "book_id": r[0],
+        "title": r[1],
+        "author": r[2],
+        "price": r[3],
+        "stock": r[4],
+        "category": r[5],
+    }
+
+
+@metrics.timed("db.get_all_books")
 def get_all_books():
+    rows = get_conn().execute(SELECT_ALL_BOOKS).fetchall()
+    return [_book_row_to_dict(r) for r in rows]
+
+
+def _books_page_query(category, in_stock):
+    sql = SELECT_BOOKS_PAGE
+    params = []
+    if category:
+        sql += " AND category = ?"
+        params.append(category)
+    if in_stock:
+        sql += " AND stock > 0"
+    return sql + " ORDER BY book_id LIMIT ?", params
+
+
+@metrics.timed("db.get_books_page")
+def get_books_page(after_id: int = 0, limit: int = 20, category: Optional[str] = None, in_stock: bool = False):
+    """
+    Một trang sách theo keyset trên book_id (chỉ lấy sách có book_id > after_id).
+    Trả về (books, next_cursor); next_cursor là None khi đã hết.
+    """
+    sql, params = _books_page_query(category, in_stock)
+    rows = get_conn().execute(sql, (after_id or 0, *params, limit + 1)).fetchall()
+    books = [_book_row_to_dict(r) for r in rows[:limit]]
+    next_cursor = books[-1]["book_id"] if len(rows) > limit else None
+    return books, next_cursor
+
+
+def iter_books(after_id: int = 0, category: Optional[str] = None, in_stock: bool = False, batch_size: int = 500):
+    """
+    Duyệt toàn bộ sách (thỏa bộ lọc) theo từng lô keyset, không giữ cả bảng trong bộ nhớ.
+    Mỗi lô là một truy vấn riêng nên không giữ cursor/transaction đọc giữa các lần yield
+    (generator có thể được tiếp tục ở thread khác, ví dụ trong StreamingResponse).
+    """
+    sql, params = _books_page_query(category, in_stock)
+    while True:
+        rows = get_conn().execute(sql, (after_id, *params, batch_size)).fetchall()
+        for r in rows:
+            yield _book_row_to_dict(r)
+        if len(rows) < batch_size:
+            return
+        after_id = rows[-1][0]
+
+
+def _fts_query(tokens, op: str) -> str:
+    # Mỗi từ được đặt trong ngoặc kép (tránh cú pháp FTS5 trong input), từ cuối tìm theo tiền tố
+    quoted = [f'"{t}"' for t in tokens]
+    quoted[-1] += "*"
+    return f" {op} ".join(quoted)
+
+
+@metrics.timed("db.search_books")
+def search_books(query: str, limit: int = 10):
+    """
+    Tìm sách theo tên/tác giả/thể loại, không phân biệt dấu và hoa thường.
+    Kết quả xếp theo bm25 (tên sách có trọng số cao nhất). Ưu tiên sách chứa
+    đủ mọi từ; nếu không có thì lấy sách chứa ít nhất một từ.
+    """
+    tokens = fold_for_search(query).split()
+    if not tokens or limit <= 0:
+        return []
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM Books")
-    rows = cur.fetchall()
-    conn.close()
-    return [
-        {
-            "book_id": r[0],
-            "title": r[1],
-            "author": r[2],
-            "price": r[3],
-            "stock": r[4],
-            "category": r[5],
-        }
-        for r in rows
-    ]
+    rows = conn.execute(SEARCH_BOOKS, (_fts_query(tokens, "AND"), limit)).fetchall()
+    if not rows and len(tokens) > 1:
+        rows = conn.execute(SEARCH_BOOKS, (_fts_query(tokens, "OR"), limit)).fetchall()
+    return [_book_row_to_dict(r) for r in rows]
+
+
+@metrics.timed("db.get_catalog_version")
+def get_catalog_version() -> int:
+    row = get_conn().execute(SELECT_CATALOG_VERSION).fetchone()
+    return row[0] if row else 0
+
+
+def get_catalog_meta() -> dict:
+    """Các giá trị trong CatalogMeta ({"books_version": ..., "db_token": ...})."""
+    return dict(get_conn().execute(SELECT_CATALOG_META).fetchall())
 
 
 def find_book_by_title(title: str):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM Books WHERE lower(title)=lower(?)", (title,))
-    row = cur.fetchone()
-    conn.close()
-    if not row:
-        return None
+    # Tra cứu qua cache danh mục (import muộn để tránh vòng import)
+    from app.db import catalog_cache
+    return catalog_cache.find_by_title(title)
+
+
+class InsufficientStockError(Exception):
+    """Không đủ sách trong kho cho đơn hàng (available = None nếu sách không tồn tại)."""
+
+    def __init__(self, book_id, requested, available):
+        super().__init__(f"book {book_id}: requested {requested}, available {available}")
+        self.book_id = book_id
+        self.requested = requested
+        self.available = available
+
+
+def _order_row_to_dict(r):
     return {
-        "book_id": row[0],
-        "title": row[1],
-        "author": row[2],
-        "price": row[3],
-        "stock": row[4],
-        "category": row[5],
+        "order_id": r[0],
+        "customer_name": r[1],
+        "phone": r[2],
+        "address": r[3],
+        "book_id": r[4],
+        "quantity": r[5],
+        "status": r[6],
+        "created_at": r[7],
     }
 
 
+@metrics.timed("db.add_order")
 def add_order(name, phone, address, book_id, quantity):
+    """Ghi đơn hàng mà không kiểm tra/trừ kho (dùng place_order cho luồng đặt sách)."""
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO Orders (customer_name, phone, address, book_id, quantity, status)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (name, phone, address, book_id, quantity, "Đang xử lý"),
-    )
-    conn.commit()
+    with conn:
+        # RETURNING trả luôn bản ghi vừa thêm, không cần SELECT lại
+        row = conn.execute(
+            INSERT_ORDER,
+            (name, normalize_for_match(name), phone, address, book_id, quantity, ORDER_STATUS_NEW),
+        ).fetchone()
+    return _order_row_to_dict(row) if row else None
 
-    # Lấy order_id vừa thêm
-    order_id = cur.lastrowid
 
-    # Lấy lại thông tin đơn hàng đầy đủ (để trả về cho order_flow)
-    cur.execute(
-        "SELECT order_id, customer_name, phone, address, book_id, quantity, status FROM Orders WHERE order_id = ?",
-        (order_id,),
-    )
-    row = cur.fetchone()
-    conn.close()
+@metrics.timed("db.place_order")
+def place_order(name, phone, address, book_id, quantity):
+    """
+    Trừ kho và ghi đơn hàng trong cùng một transaction (BEGIN IMMEDIATE).
+    Trả về dict đơn hàng kèm "stock" còn lại; nếu không đủ hàng thì không ghi gì
+    và raise InsufficientStockError.
+    """
+    if quantity is None or quantity <= 0:
+        raise ValueError(f"invalid quantity: {quantity!r}")
+
+    conn = get_conn()
+    for attempt in range(ORDER_RETRIES):
+        try:
+            # Lấy khóa ghi ngay từ đầu: hai đơn cùng lúc không thể cùng đọc rồi cùng trừ kho
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) or attempt == ORDER_RETRIES - 1:
+                raise
+            time.sleep(0.05 * (attempt + 1))
+            continue
+
+        try:
+            reserved = conn.execute(RESERVE_STOCK, (quantity, book_id, quantity)).fetchone()
+            if reserved is None:
+                current = conn.execute(SELECT_BOOK_STOCK, (book_id,)).fetchone()
+                conn.rollback()
+                raise InsufficientStockError(book_id, quantity, current[0] if current else None)
+            row = conn.execute(
+                INSERT_ORDER,
+                (name, normalize_for_match(name), phone, address, book_id, quantity, ORDER_STATUS_NEW),
+            ).fetchone()
+            conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+        order = _order_row_to_dict(row)
+        order["stock"] = reserved[0]
+        return order
+
 
-    if not row:
+@metrics.timed("db.get_order")
+def get_order(order_id: int):
+    """Một đơn hàng theo mã đơn (kèm book_title), hoặc None."""
+    r = get_conn().execute(SELECT_ORDER, (order_id,)).fetchone()
+    if r is None:
         return None
+    order = _order_row_to_dict(r)
+    order["book_title"] = r[8]
+    return order
 
-    return {
-        "order_id": row[0],
-        "customer_name": row[1],
-        "phone": row[2],
-        "address": row[3],
-        "book_id": row[4],
-        "quantity": row[5],
-        "status": row[6],
-    }
 
+def _orders_filter(customer_name, phone, status):
+    where, params = [], []
+    if customer_name:
+        repair_order_names()
+        where.append("o.customer_name_norm = ?")
+        params.append(normalize_for_match(customer_name))
+    if phone:
+        where.append("o.phone = ?")
+        params.append(_extract_phone(phone) or phone.strip())
+    if status:
+        # Đã lọc theo khách/SĐT thì "+" để SQLite không chọn index theo trạng thái (ít chọn lọc hơn)
+        where.append("+o.status = ?" if where else "o.status = ?")
+        params.append(status)
+    return where, params
 
-def get_orders_by_customer(name: str):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT o.order_id, o.quantity, o.status, b.title
-        FROM Orders o
-        JOIN Books b ON o.book_id = b.book_id
-        WHERE lower(o.customer_name)=lower(?)
-        """,
-        (name,),
-    )
-    rows = cur.fetchall()
-    conn.close()
-    return [
+
+@metrics.timed("db.get_order_history")
+def get_order_history(
+    customer_name: Optional[str] = None,
+    phone: Optional[str] = None,
+    status: Optional[str] = None,
+    before_id: int = 0,
+    limit: int = 20,
+):
+    """
+    Một trang đơn hàng, mới nhất trước, theo keyset trên order_id (chỉ lấy đơn có
+    order_id < before_id; 0 = từ đơn mới nhất). Lọc theo tên khách (không phân biệt
+    dấu/hoa thường), số điện thoại và/hoặc trạng thái.
+    Trả về (orders, next_cursor); next_cursor là None khi đã hết.
+    """
+    where, params = _orders_filter(customer_name, phone, status)
+    if before_id:
+        where.append("o.order_id < ?")
+        params.append(before_id)
+    sql = SELECT_ORDER_HISTORY
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY o.order_id DESC LIMIT ?"
+    rows = get_conn().execute(sql, (*params, limit + 1)).fetchall()
+    orders = [
         {
             "order_id": r[0],
-            "quantity": r[1],
-            "status": r[2],
-            "book_title": r[3],
+            "book_id": r[1],
+            "quantity": r[2],
+            "status": r[3],
+            "created_at": r[4],
+            "book_title": r[5],
         }
-        for r in rows
+        for r in rows[:limit]
     ]
+    next_cursor = orders[-1]["order_id"] if len(rows) > limit else None
+    return orders, next_cursor
+
+
+@metrics.timed("db.count_orders")
+def count_orders(customer_name: Optional[str] = None, phone: Optional[str] = None):
+    """Tổng số đơn và số đơn theo từng trạng thái: {"total": 12, "by_status": {"Đang xử lý": 2, ...}}."""
+    where, params = _orders_filter(customer_name, phone, None)
+    sql = COUNT_ORDERS_BY_STATUS
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    by_status = dict(get_conn().execute(sql + " GROUP BY o.status", params).fetchall())
+    return {"total": sum(by_status.values()), "by_status": by_status}
@@ -0,0 +1,223 @@
+"""
+Nhập danh mục sách từ feed của nhà cung cấp (CSV hoặc JSONL).
+
+Feed được đọc theo từng lô (không nạp cả file vào bộ nhớ), mỗi dòng được kiểm
+tra rồi upsert theo `sku` bằng executemany trong một transaction duy nhất.
+Trong lúc nhập, các trigger và index phụ của Books được gỡ ra và dựng lại một
+lần ở cuối (kể cả chỉ mục FTS), bộ đếm books_version chỉ tăng một lần.
+Sau đó dựng luôn snapshot danh mục (app/db/catalog_snapshot.py) để worker
+không phải tự dựng ở request đầu tiên.
+
+Cột: sku (bắt buộc), title (bắt buộc), author, price, stock, category.
+
+    python -m app.db.importer feed.csv
+    python -m app.db.importer feed.jsonl --chunk-size 20000 --db app/db/bookstore.db
+"""
+import argparse
+import csv
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from app.db import catalog_snapshot, database
+from app.logic.utils import normalize_for_match
+
+DEFAULT_CHUNK_SIZE = 10_000
+# Số lỗi kiểm tra dữ liệu giữ lại để in trong báo cáo
+MAX_REPORTED_ERRORS = 20
+
+UPSERT_BOOK = """
+    INSERT INTO Books (sku, title, author, price, stock, category, title_norm)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(sku) WHERE sku IS NOT NULL DO UPDATE SET
+        title = excluded.title,
+        author = excluded.author,
+        price = excluded.price,
+        stock = excluded.stock,
+        category = excluded.category,
+        title_norm = excluded.title_norm
+"""
+# Index/trigger được dựng lại sau khi nhập; idx_books_sku phải giữ lại vì ON CONFLICT cần nó
+SELECT_DEFERRABLE = """
+    SELECT type, name, sql FROM sqlite_master
+    WHERE tbl_name = 'Books' AND type IN ('index', 'trigger') AND sql IS NOT NULL AND name != 'idx_books_sku'
+"""
+SELECT_FTS_DDL = "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'BooksFts'"
+# fold_for_search(title) == title_norm đã gập "đ"; fold_for_search (hàm SQL đăng ký trong
+# get_conn()) có sẵn memo LRU nên tác giả/thể loại lặp lại không phải gập lại
+REBUILD_FTS = """
+    INSERT INTO BooksFts (rowid, title, author, category)
+    SELECT book_id, replace(title_norm, 'đ', 'd'), fold_for_search(author), fold_for_search(category)
+    FROM Books
+"""
+
+
+def read_feed(path, fmt=None):
+    """Sinh từng dòng (line_no, dict) của feed; định dạng đoán theo đuôi file nếu không chỉ định."""
+    path = Path(path)
+    fmt = fmt or ("jsonl" if path.suffix.lower() in (".jsonl", ".ndjson") else "csv")
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if fmt == "csv":
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, row
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_no, e
+
+
+def _to_int(value, field):
+    if value is None or value == "":
+        return 0
+    try:
+        number = int(float(value))
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} không phải số: {value!r}")
+    if number < 0:
+        raise ValueError(f"{field} âm: {number}")
+    return number
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def validate_row(row) -> tuple:
+    """Chuyển một dòng feed thành tham số cho UPSERT_BOOK; raise ValueError nếu dòng không hợp lệ."""
+    if not isinstance(row, dict):
+        raise ValueError(f"dòng không hợp lệ: {row}")
+    sku = _text(row.get("sku"))
+    title = _text(row.get("title"))
+    if not sku:
+        raise ValueError("thiếu sku")
+    if not title:
+        raise ValueError("thiếu title")
+    return (
+        sku,
+        title,
+        _text(row.get("author")),
+        _to_int(row.get("price"), "price"),
+        _to_int(row.get("stock"), "stock"),
+        _text(row.get("category")),
+        normalize_for_match(title),
+    )
+
+
+def _chunks(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_rows(rows, chunk_size: int = DEFAULT_CHUNK_SIZE, log=print) -> dict:
+    """
+    Upsert các dòng (line_no, dict) vào Books trong một transaction.
+    Dòng không hợp lệ bị bỏ qua và được đếm trong báo cáo trả về.
+    """
+    database.init_db()
+    conn = database.get_conn()
+    report = {"rows": 0, "imported": 0, "invalid": 0, "errors": [], "timings": {}}
+    start = time.perf_counter()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Gỡ trigger/index phụ: mỗi dòng chỉ còn chi phí ghi bảng + index sku
+        deferred = conn.execute(SELECT_DEFERRABLE).fetchall()
+        for kind, name, _ in deferred:
+            conn.execute(f'DROP {kind.upper()} "{name}"')
+
+        for chunk in _chunks(rows, chunk_size):
+            params = []
+            for line_no, row in chunk:
+                report["rows"] += 1
+                try:
+                    if isinstance(row, Exception):
+                        raise ValueError(str(row))
+                    params.append(validate_row(row))
+                except ValueError as e:
+                    report["invalid"] += 1
+                    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                        report["errors"].append(f"dòng {line_no}: {e}")
+            conn.executemany(UPSERT_BOOK, params)
+            report["imported"] += len(params)
+            if log:
+                elapsed = time.perf_counter() - start
+                log(f"  {report['rows']:>10} dòng  {report['rows'] / max(elapsed, 1e-9):10.0f} dòng/s")
+        report["timings"]["load"] = time.perf_counter() - start
+
+        # Dựng lại index, chỉ mục FTS và trigger đúng như trước khi nhập
+        phase = time.perf_counter()
+        for kind, _, sql in deferred:
+            if kind == "index":
+                conn.execute(sql)
+        report["timings"]["indexes"] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        # Tạo lại bảng FTS nhanh hơn nhiều so với DELETE từng dòng trong chỉ mục cũ
+        fts_ddl = conn.execute(SELECT_FTS_DDL).fetchone()[0]
+        conn.execute("DROP TABLE BooksFts")
+        conn.execute(fts_ddl)
+        conn.execute(REBUILD_FTS)
+        report["timings"]["fts"] = time.perf_counter() - phase
+
+        for kind, _, sql in deferred:
+            if kind == "trigger":
+                conn.execute(sql)
+        conn.execute("UPDATE CatalogMeta SET value = value + 1 WHERE key = 'books_version'")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    if catalog_snapshot.ENABLED:
+        phase = time.perf_counter()
+        try:
+            catalog_snapshot.build()
+        except OSError as e:
+            # Worker sẽ tự dựng lại (hoặc nạp Books vào bộ nhớ) ở lần đọc danh mục kế tiếp
+            report["errors"].append(f"không ghi được snapshot danh mục: {e}")
+        report["timings"]["snapshot"] = time.perf_counter() - phase
+
+    report["timings"]["total"] = time.perf_counter() - start
+    report["rows_per_s"] = report["rows"] / max(report["timings"]["total"], 1e-9)
+    return report
+
+
+def import_file(path, fmt=None, chunk_size: int = DEFAULT_CHUNK_SIZE, log=print) -> dict:
+    return import_rows(read_feed(path, fmt), chunk_size=chunk_size, log=log)
+
+
+def format_report(report: dict) -> str:
+    t = report["timings"]
+    lines = [
+        f"✅ Đã nhập {report['imported']}/{report['rows']} dòng ({report['invalid']} dòng lỗi bị bỏ qua)",
+        f"⏱️ {t['total']:.1f}s tổng: nạp {t['load']:.1f}s, index {t['indexes']:.1f}s, FTS {t['fts']:.1f}s"
+        + (f", snapshot {t['snapshot']:.1f}s" if "snapshot" in t else "")
+        + f" — {report['rows_per_s']:.0f} dòng/s",
+    ]
+    lines += [f"  - {e}" for e in report["errors"]]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("feed", help="file CSV hoặc JSONL")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default=None, help="mặc định đoán theo đuôi file")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--db", default=None, help=f"file SQLite đích (mặc định {database.DB_PATH})")
+    args = parser.parse_args()
+    if args.db:
+        database.DB_PATH = Path(args.db)
+    print(format_report(import_file(args.feed, args.format, args.chunk_size)))
+    database.close_all_conns()
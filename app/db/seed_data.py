@@ -1,4 +1,7 @@
+import sys
+
 from app.db.database import get_conn, init_db
+from app.db.importer import format_report, import_file, import_rows
 
 def seed_data():
     init_db()
@@ -10,7 +13,6 @@ def seed_data():
     count = cur.fetchone()[0]
     if count > 0:
         print("✅ Database đã có dữ liệu, bỏ qua seed.")
-        conn.close()
         return
 
     books = [
@@ -21,14 +23,17 @@ def seed_data():
         ("Lập Trình Python Cơ Bản", "Nguyễn Văn A", 120000, 8, "Công nghệ thông tin"),
     ]
 
-    cur.executemany(
-        "INSERT INTO Books (title, author, price, stock, category) VALUES (?, ?, ?, ?, ?)",
-        books
-    )
-
-    conn.commit()
-    conn.close()
+    rows = [
+        (i, {"sku": f"SEED-{i:03d}", "title": t, "author": a, "price": p, "stock": s, "category": c})
+        for i, (t, a, p, s, c) in enumerate(books, start=1)
+    ]
+    import_rows(rows, log=None)
     print("🌱 Seed dữ liệu thành công!")
 
 if __name__ == "__main__":
-    seed_data()
+    # python -m app.db.seed_data [feed.csv|feed.jsonl]: nạp danh mục thật thay cho 5 sách mẫu
+    if len(sys.argv) > 1:
+        init_db()
+        print(format_report(import_file(sys.argv[1])))
+    else:
+        seed_data()
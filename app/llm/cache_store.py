@@ -0,0 +1,296 @@
+"""
+Cache câu trả lời LLM.
+
+Mặc định gồm hai tầng: LRU trong process (có TTL) đặt trước một file SQLite duy
+nhất (có TTL và giới hạn dung lượng, xóa bản ghi ít dùng nhất khi vượt). Mọi
+backend có cùng giao diện `get(key)`, `set(key, prompt, response)`, `stats()`.
+
+Chuyển dữ liệu từ cache cũ (mỗi prompt một file JSON trong app/cache/):
+
+    python -m app.llm.cache_store --import-json app/cache
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+DEFAULT_MEMORY_ENTRIES = 1024
+DEFAULT_TTL = 30 * 24 * 3600
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DB_FILENAME = "llm_cache.db"
+# accessed_at (dùng để chọn bản ghi xóa khi vượt dung lượng) được ghi theo lô thay vì
+# một UPDATE mỗi lần hit: sau chừng này giây hoặc chừng này key chờ ghi, và trước khi xóa bớt
+ACCESS_FLUSH_INTERVAL = 30.0
+ACCESS_FLUSH_BATCH = 256
+
+
+class MemoryCache:
+    """LRU trong process, giới hạn số phần tử, mỗi phần tử hết hạn sau `ttl` giây."""
+
+    def __init__(self, max_entries: int = DEFAULT_MEMORY_ENTRIES, ttl: float = DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] <= now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key: str, prompt: str, response: str, ttl: float = None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (response, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteCache:
+    """Cache bền vững trong một file SQLite, có TTL và giới hạn tổng dung lượng."""
+
+    def __init__(self, path, max_bytes: int = DEFAULT_MAX_BYTES, ttl: float = DEFAULT_TTL):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.is_new = not self.path.exists()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    prompt TEXT,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        # key -> thời điểm hit gần nhất, chưa ghi vào accessed_at
+        self._touched = {}
+        self._last_flush = time.time()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key: str):
+        entry = self.get_with_expiry(key)
+        return entry[0] if entry else None
+
+    def get_with_expiry(self, key: str):
+        """(response, thời điểm hết hạn) hoặc None nếu không có / đã hết hạn."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at, size FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response, created_at, size = row
+            if created_at + self.ttl <= now:
+                with self._conn:
+                    self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._touched.pop(key, None)
+                self._total_bytes -= size
+                self.misses += 1
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= ACCESS_FLUSH_BATCH or now - self._last_flush >= ACCESS_FLUSH_INTERVAL:
+                with self._conn:
+                    self._flush_access()
+            self.hits += 1
+            return response, created_at + self.ttl
+
+    def _flush_access(self):
+        # Gọi khi đang giữ self._lock, trong transaction của caller
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE llm_cache SET accessed_at = ? WHERE key = ?",
+                [(at, key) for key, at in self._touched.items()],
+            )
+            self._touched.clear()
+        self._last_flush = time.time()
+
+    def set(self, key: str, prompt: str, response: str, created_at: float = None):
+        now = time.time()
+        size = len(response.encode("utf-8")) + len((prompt or "").encode("utf-8"))
+        with self._lock, self._conn:
+            old = self._conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            self._touched.pop(key, None)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, prompt, response, created_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, prompt, response, created_at or now, now, size),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Xóa bản ghi hết hạn trước, sau đó tới bản ghi ít được dùng gần đây nhất
+        self._flush_access()
+        cur = self._conn.execute("DELETE FROM llm_cache WHERE created_at <= ?", (time.time() - self.ttl,))
+        self.evictions += cur.rowcount
+        target = self.max_bytes * 0.9
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total > target:
+            victims = []
+            for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at"):
+                if total <= target:
+                    break
+                victims.append((key,))
+                total -= size
+            self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+            self.evictions += len(victims)
+        self._total_bytes = total
+
+    def import_json_dir(self, directory) -> int:
+        """
+        Nhập các file <md5>.json của cache cũ; bản ghi đã có được giữ nguyên.
+        Cache cũ không có hạn dùng nên TTL của bản ghi nhập vào tính từ lúc nhập.
+        """
+        now = time.time()
+        rows = []
+        for f in Path(directory).glob("*.json"):
+            try:
+                data = json.loads(f.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            if not data.get("response"):
+                continue
+            prompt = data.get("prompt") or ""
+            size = len(data["response"].encode("utf-8")) + len(prompt.encode("utf-8"))
+            rows.append((f.stem, prompt, data["response"], now, now, size))
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO llm_cache (key, prompt, response, created_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            imported = self._conn.total_changes - before
+            self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        return imported
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return {
+            "entries": entries,
+            "bytes": self._total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class TieredCache:
+    """
+    Tầng nhớ trong process đặt trước tầng bền vững; hit ở tầng sau được đưa lên tầng
+    trước với thời hạn còn lại của bản ghi bền vững (không kéo dài TTL).
+    """
+
+    def __init__(self, memory: MemoryCache, persistent: SQLiteCache):
+        self.memory = memory
+        self.persistent = persistent
+
+    def get(self, key: str):
+        value = self.memory.get(key)
+        if value is None:
+            value = self.get_persistent(key)
+        return value
+
+    def get_persistent(self, key: str):
+        """Chỉ tra tầng bền vững (có I/O), hit được đưa lên tầng nhớ."""
+        entry = self.persistent.get_with_expiry(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        self.memory.set(key, None, value, ttl=expires_at - time.time())
+        return value
+
+    def set(self, key: str, prompt: str, response: str):
+        self.memory.set(key, prompt, response)
+        self.persistent.set(key, prompt, response)
+
+    def stats(self) -> dict:
+        mem, disk = self.memory.stats(), self.persistent.stats()
+        hits = mem["hits"] + disk["hits"]
+        lookups = hits + disk["misses"]
+        return {
+            "memory": mem,
+            "persistent": disk,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
+
+
+class NullCache:
+    def get(self, key: str):
+        return None
+
+    def set(self, key: str, prompt: str, response: str):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+def from_env(cache_dir) -> object:
+    """
+    Tạo backend theo biến môi trường LLM_CACHE_BACKEND (tiered | memory | sqlite | none).
+    Lần đầu tạo file SQLite, các file JSON cũ trong cache_dir được nhập vào.
+    """
+    backend = os.getenv("LLM_CACHE_BACKEND", "tiered")
+    ttl = float(os.getenv("LLM_CACHE_TTL", DEFAULT_TTL))
+    if backend == "none":
+        return NullCache()
+    memory = MemoryCache(int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", DEFAULT_MEMORY_ENTRIES)), ttl)
+    if backend == "memory":
+        return memory
+    persistent = SQLiteCache(
+        Path(cache_dir) / DB_FILENAME,
+        max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 1024 / 1024)) * 1024 * 1024),
+        ttl=ttl,
+    )
+    if persistent.is_new:
+        persistent.import_json_dir(cache_dir)
+    if backend == "sqlite":
+        return persistent
+    return TieredCache(memory, persistent)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--import-json", metavar="DIR", required=True, help="thư mục chứa các file <md5>.json cũ")
+    parser.add_argument("--db", default=None, help=f"file SQLite đích (mặc định DIR/{DB_FILENAME})")
+    args = parser.parse_args()
+    store = SQLiteCache(args.db or Path(args.import_json) / DB_FILENAME)
+    print(f"Đã nhập {store.import_json_dir(args.import_json)} bản ghi vào {store.path}")
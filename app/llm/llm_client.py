@@ -1,62 +1,193 @@
 import os
-import json
 import time
+import random
+import asyncio
 import hashlib
+import concurrent.futures
+import threading
+import weakref
 from pathlib import Path
 from datetime import datetime
-from google import genai
-from google.genai import types
-from dotenv import load_dotenv
+from typing import AsyncIterator, Iterator
+from app import metrics
+from app.llm import cache_store
+from app.llm.log_writer import LogWriter
 
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
+# google.genai mất vài trăm ms để import: chỉ nạp (và tạo client) ở lời gọi Gemini đầu tiên,
+# nên process chỉ phục vụ xem sách / tra cứu đơn không phải trả chi phí này khi khởi động.
+# Các hàm async nạp nó trong thread (xem _aload_genai) để không chặn event loop.
 
 MODEL = "gemini-2.5-flash-lite"
 CACHE_DIR = Path("app/cache")
-LOG_FILE = Path("app/logs/llm_log.txt")
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
-LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+LOG_FILE = Path(os.getenv("LLM_LOG_FILE", "app/logs/llm_log.jsonl"))
 
-client = genai.Client(api_key=API_KEY)
+# Số lời gọi Gemini song song tối đa của allm_generate trong một process
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Timeout cho mỗi lần gọi (giây)
+REQUEST_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))
+# Exponential backoff với full jitter giữa các lần retry
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+FALLBACK_REPLY = "Xin lỗi, hiện tại hệ thống đang bận. Vui lòng thử lại sau 🕐."
+# Log JSON lines: xoay file khi vượt LLM_LOG_MAX_MB, giữ LLM_LOG_BACKUPS file cũ
+LOG_MAX_BYTES = int(float(os.getenv("LLM_LOG_MAX_MB", "10")) * 1024 * 1024)
+LOG_BACKUPS = int(os.getenv("LLM_LOG_BACKUPS", "3"))
+LOG_QUEUE_SIZE = int(os.getenv("LLM_LOG_QUEUE", "10000"))
+
+# genai.Client, tạo khi cần (xem get_client); benchmark có thể gán thẳng một client giả
+client = None
+_client_lock = threading.Lock()
+_genai_loaded = False
+
+# Backend cache (xem app/llm/cache_store.py), tạo khi dùng lần đầu
+_cache = None
+_cache_lock = threading.Lock()
+
+# Writer log chạy nền, tạo khi ghi log lần đầu (và tạo lại nếu LOG_FILE đổi)
+_log_writer = None
+_log_writer_lock = threading.Lock()
+
+# Single-flight: lời gọi Gemini đang chạy theo (hash prompt, temperature).
+# Bản sync dùng chung một dict giữa các thread, bản async có dict riêng cho từng event loop.
+_inflight = {}
+_inflight_lock = threading.Lock()
+_inflight_async = weakref.WeakKeyDictionary()
+# Số lời gọi upstream tiết kiệm được nhờ gộp
+_coalesced = 0
+
+# Semaphore gắn với từng event loop (asyncio.Semaphore không dùng chung được giữa các loop)
+_semaphores = weakref.WeakKeyDictionary()
+
+def get_client():
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from dotenv import load_dotenv
+                from google import genai
+
+                load_dotenv()
+                client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    return client
+
+def _load_genai():
+    global _genai_loaded
+    get_client()
+    from google.genai import types  # noqa: F401
+    _genai_loaded = True
+
+async def _aload_genai():
+    """Nạp google.genai và tạo client trong thread nếu chưa có (lần gọi đầu tốn vài trăm ms)."""
+    # Không dựa vào sys.modules: module đang import dở cũng đã có mặt ở đó
+    if client is None or not _genai_loaded:
+        await asyncio.to_thread(_load_genai)
 
 def _hash_prompt(prompt: str) -> str:
     return hashlib.md5(prompt.encode("utf-8")).hexdigest()
 
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                Path(CACHE_DIR).mkdir(parents=True, exist_ok=True)
+                _cache = cache_store.from_env(CACHE_DIR)
+    return _cache
+
+async def _aget_cache():
+    # Lần đầu mở file SQLite (và nhập cache JSON cũ) trong thread
+    return _cache if _cache is not None else await asyncio.to_thread(get_cache)
+
+def set_cache(cache):
+    """Thay backend cache (None: tạo lại theo biến môi trường ở lần dùng tiếp theo)."""
+    global _cache
+    _cache = cache
+
+def _cache_stats():
+    # Không tạo cache chỉ để lấy số liệu
+    return _cache.stats() if _cache is not None else {}
+
+metrics.register_gauges("llm_cache", _cache_stats)
+
 def _cache_read(prompt: str):
-    cache_file = CACHE_DIR / f"{_hash_prompt(prompt)}.json"
-    if cache_file.exists():
-        try:
-            data = json.loads(cache_file.read_text(encoding="utf-8"))
-            return data.get("response")
-        except Exception:
-            return None
-    return None
-
-def _cache_write(prompt: str, response: str):
-    cache_file = CACHE_DIR / f"{_hash_prompt(prompt)}.json"
-    cache_file.write_text(
-        json.dumps(
-            {
-                "prompt": prompt,
-                "response": response,
-                "timestamp": datetime.now().isoformat()
-            },
-            ensure_ascii=False,
-            indent=2
-        ),
-        encoding="utf-8"
-    )
+    try:
+        cached = get_cache().get(_hash_prompt(prompt))
+    except Exception:
+        return None
+    metrics.inc("llm_cache_lookups", result="hit" if cached else "miss")
+    return cached
 
-def _log(content: str):
-    with LOG_FILE.open("a", encoding="utf-8") as f:
-        f.write(f"[{datetime.now().isoformat()}]\n{content}\n{'-' * 60}\n")
+def _cache_write(prompt: str, response: str, cache=None):
+    try:
+        (cache if cache is not None else get_cache()).set(_hash_prompt(prompt), prompt, response)
+    except Exception as e:
+        _log("cache_error", prompt, error=f"{type(e).__name__}: {e}")
 
-def llm_generate(prompt: str, temperature: float = 0.4, retry: int = 3, use_cache: bool = True) -> str:
-    if use_cache:
-        cached = _cache_read(prompt)
-        if cached:
-            _log(f"[CACHE HIT] {prompt[:200]}...")
-            return cached
+# Bản async: chỉ tầng nhớ trong process chạy trên event loop, tầng SQLite
+# (có thể chờ lock tới 10 giây) chạy trong thread
+
+async def _acache_read(prompt: str):
+    key = _hash_prompt(prompt)
+    try:
+        cache = await _aget_cache()
+        if isinstance(cache, cache_store.TieredCache):
+            cached = cache.memory.get(key)
+            if cached is None:
+                cached = await asyncio.to_thread(cache.get_persistent, key)
+        elif isinstance(cache, cache_store.SQLiteCache):
+            cached = await asyncio.to_thread(cache.get, key)
+        else:
+            cached = cache.get(key)
+    except Exception:
+        return None
+    metrics.inc("llm_cache_lookups", result="hit" if cached else "miss")
+    return cached
+
+async def _acache_write(prompt: str, response: str):
+    try:
+        cache = await _aget_cache()
+    except Exception as e:
+        _log("cache_error", prompt, error=f"{type(e).__name__}: {e}")
+        return
+    if isinstance(cache, cache_store.TieredCache):
+        cache.memory.set(_hash_prompt(prompt), prompt, response)
+        cache = cache.persistent
+    if isinstance(cache, cache_store.SQLiteCache):
+        # Không chờ ghi xong: lỗi đã được _cache_write ghi log
+        asyncio.get_running_loop().run_in_executor(None, _cache_write, prompt, response, cache)
+    else:
+        _cache_write(prompt, response, cache)
+
+def get_log_writer() -> LogWriter:
+    global _log_writer
+    writer = _log_writer
+    if writer is None or writer.path != LOG_FILE:
+        with _log_writer_lock:
+            if _log_writer is None or _log_writer.path != LOG_FILE:
+                if _log_writer is not None:
+                    _log_writer.close()
+                _log_writer = LogWriter(LOG_FILE, LOG_MAX_BYTES, LOG_BACKUPS, LOG_QUEUE_SIZE)
+            writer = _log_writer
+    return writer
+
+metrics.register_gauges("llm_log", lambda: _log_writer.stats() if _log_writer is not None else {})
+
+def _log(event: str, prompt: str, **fields):
+    """Ghi một bản ghi JSON (không chặn: chỉ đưa vào hàng đợi của writer nền)."""
+    record = {
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "event": event,
+        "prompt_hash": _hash_prompt(prompt),
+        "prompt": prompt[:120],
+    }
+    record.update(fields)
+    get_log_writer().write(record)
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+def _build_request(prompt: str, temperature: float):
+    from google.genai import types
 
     contents = [
         types.Content(
@@ -69,27 +200,311 @@ def llm_generate(prompt: str, temperature: float = 0.4, retry: int = 3, use_cach
         temperature=temperature,
         max_output_tokens=2048
     )
+    return contents, config
+
+def _response_text(response) -> str:
+    text = response.candidates[0].content.parts[0].text.strip()
+    if not text:
+        raise ValueError("Empty response")
+    return text
+
+def _backoff_delay(attempt: int) -> float:
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def _get_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    sem = _semaphores.get(loop)
+    if sem is None:
+        sem = _semaphores[loop] = asyncio.Semaphore(MAX_CONCURRENCY)
+    return sem
+
+def _coalesce_key(prompt: str, temperature: float):
+    return (_hash_prompt(prompt), temperature)
+
+def _inflight_stats():
+    return {
+        "coalesced": _coalesced,
+        "inflight": len(_inflight) + sum(len(calls) for calls in list(_inflight_async.values())),
+    }
+
+metrics.register_gauges("llm_singleflight", _inflight_stats)
+
+def _count_coalesced():
+    global _coalesced
+    _coalesced += 1
+    metrics.inc("llm_coalesced_calls")
+
+@metrics.timed("llm.generate")
+def llm_generate(prompt: str, temperature: float = 0.4, retry: int = 3, use_cache: bool = True) -> str:
+    if use_cache:
+        cached = _cache_read(prompt)
+        if cached:
+            _log("cache_hit", prompt, cache="hit")
+            return cached
+    else:
+        return _generate(prompt, temperature, retry, "off")
+
+    # Các thread cùng hỏi một prompt (cùng temperature) chờ chung một lời gọi Gemini
+    key = _coalesce_key(prompt, temperature)
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = concurrent.futures.Future()
+        else:
+            _count_coalesced()
+    if not leader:
+        return future.result()
+
+    try:
+        text = _generate(prompt, temperature, retry, "miss")
+        future.set_result(text)
+        return text
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+def _generate(prompt: str, temperature: float, retry: int, cache_status: str) -> str:
+    contents, config = _build_request(prompt, temperature)
 
     for attempt in range(retry):
+        start = time.perf_counter()
         try:
-            response = client.models.generate_content(
-                model=MODEL,
-                contents=contents,
-                config=config
-            )
-            text = response.candidates[0].content.parts[0].text.strip()
-            if not text:
-                raise ValueError("Empty response")
+            metrics.inc("llm_upstream_calls")
+            with metrics.span("llm.upstream"):
+                response = get_client().models.generate_content(
+                    model=MODEL,
+                    contents=contents,
+                    config=config
+                )
+            text = _response_text(response)
             _cache_write(prompt, text)
-            _log(f"[SUCCESS attempt {attempt+1}] {prompt[:120]}...\n{text[:500]}")
+            _log("success", prompt, attempt=attempt + 1, latency_ms=_elapsed_ms(start), cache=cache_status, response=text[:500])
+            return text
+        except Exception as e:
+            metrics.inc("llm_upstream_errors", error=type(e).__name__)
+            _log("error", prompt, attempt=attempt + 1, latency_ms=_elapsed_ms(start), cache=cache_status, error=f"{type(e).__name__}: {e}")
+            if attempt + 1 < retry:
+                time.sleep(_backoff_delay(attempt))
+
+    metrics.inc("llm_fallbacks")
+    _log("fallback", prompt, attempt=retry, cache=cache_status)
+    return FALLBACK_REPLY
+
+@metrics.timed("llm.generate")
+async def allm_generate(
+    prompt: str,
+    temperature: float = 0.4,
+    retry: int = 3,
+    use_cache: bool = True,
+    timeout: float = REQUEST_TIMEOUT,
+) -> str:
+    """
+    Bản async của llm_generate: không chặn event loop khi Gemini chậm/lỗi.
+    Số lời gọi đồng thời bị giới hạn bởi MAX_CONCURRENCY, mỗi lần gọi có timeout
+    riêng và retry bằng asyncio.sleep (semaphore được nhả ra trong lúc chờ).
+    Các request cùng prompt đang chờ được gộp vào một lời gọi duy nhất.
+    """
+    if use_cache:
+        cached = await _acache_read(prompt)
+        if cached:
+            _log("cache_hit", prompt, cache="hit")
+            return cached
+    else:
+        return await _agenerate(prompt, temperature, retry, timeout, "off")
+
+    loop = asyncio.get_running_loop()
+    calls = _inflight_async.get(loop)
+    if calls is None:
+        calls = _inflight_async[loop] = {}
+    key = _coalesce_key(prompt, temperature)
+    task = calls.get(key)
+    if task is None:
+        task = calls[key] = asyncio.ensure_future(_agenerate(prompt, temperature, retry, timeout, "miss"))
+        task.add_done_callback(lambda _: calls.pop(key, None))
+    else:
+        _count_coalesced()
+    # shield: một request bị hủy (client ngắt kết nối) không hủy lời gọi mà request khác đang chờ
+    return await asyncio.shield(task)
+
+async def _agenerate(prompt: str, temperature: float, retry: int, timeout: float, cache_status: str) -> str:
+    await _aload_genai()
+    contents, config = _build_request(prompt, temperature)
+    semaphore = _get_semaphore()
+
+    for attempt in range(retry):
+        start = time.perf_counter()
+        try:
+            async with semaphore:
+                metrics.inc("llm_upstream_calls")
+                with metrics.span("llm.upstream"):
+                    response = await asyncio.wait_for(
+                        get_client().aio.models.generate_content(
+                            model=MODEL,
+                            contents=contents,
+                            config=config
+                        ),
+                        timeout=timeout,
+                    )
+            text = _response_text(response)
+            await _acache_write(prompt, text)
+            _log("success", prompt, attempt=attempt + 1, latency_ms=_elapsed_ms(start), cache=cache_status, response=text[:500])
             return text
         except Exception as e:
-            _log(f"[ERROR attempt {attempt+1}] {str(e)}")
-            time.sleep(1.5)
+            metrics.inc("llm_upstream_errors", error=type(e).__name__)
+            _log("error", prompt, attempt=attempt + 1, latency_ms=_elapsed_ms(start), cache=cache_status, error=f"{type(e).__name__}: {e}")
+            if attempt + 1 < retry:
+                await asyncio.sleep(_backoff_delay(attempt))
+
+    metrics.inc("llm_fallbacks")
+    _log("fallback", prompt, attempt=retry, cache=cache_status)
+    return FALLBACK_REPLY
+
+def _chunk_text(chunk) -> str:
+    # Chunk cuối của stream có thể không có phần text (chỉ có finish_reason)
+    try:
+        return chunk.text or ""
+    except (AttributeError, ValueError):
+        return ""
+
+def llm_generate_stream(prompt: str, temperature: float = 0.4, retry: int = 3, use_cache: bool = True) -> Iterator[str]:
+    """
+    Bản streaming của llm_generate: yield từng đoạn text ngay khi Gemini trả về.
+    Chỉ retry khi lỗi xảy ra trước đoạn đầu tiên (đoạn đã gửi đi thì không rút lại được);
+    câu trả lời ghép đủ được ghi vào cache một lần khi stream kết thúc. Cache hit
+    trả về nguyên câu trong một đoạn. Không gộp lời gọi như llm_generate.
+    """
+    if use_cache:
+        cached = _cache_read(prompt)
+        if cached:
+            _log("cache_hit", prompt, cache="hit")
+            yield cached
+            return
+    cache_status = "miss" if use_cache else "off"
+    contents, config = _build_request(prompt, temperature)
+
+    for attempt in range(retry):
+        start = time.perf_counter()
+        parts = []
+        try:
+            metrics.inc("llm_upstream_calls")
+            for chunk in get_client().models.generate_content_stream(model=MODEL, contents=contents, config=config):
+                text = _chunk_text(chunk)
+                if not text:
+                    continue
+                if not parts:
+                    metrics.observe("llm.stream_first_chunk", time.perf_counter() - start)
+                    text = text.lstrip()
+                parts.append(text)
+                yield text
+            if not parts:
+                raise ValueError("Empty response")
+        except Exception as e:
+            metrics.inc("llm_upstream_errors", error=type(e).__name__)
+            _log("error", prompt, attempt=attempt + 1, latency_ms=_elapsed_ms(start), cache=cache_status, stream=True, error=f"{type(e).__name__}: {e}")
+            if parts:
+                # Đã gửi một phần câu trả lời: dừng ở đây, không cache câu dở dang
+                return
+            if attempt + 1 < retry:
+                time.sleep(_backoff_delay(attempt))
+            continue
+        metrics.observe("llm.stream", time.perf_counter() - start)
+        text = "".join(parts).strip()
+        if use_cache:
+            _cache_write(prompt, text)
+        _log("success", prompt, attempt=attempt + 1, latency_ms=_elapsed_ms(start), cache=cache_status, stream=True, response=text[:500])
+        return
+
+    metrics.inc("llm_fallbacks")
+    _log("fallback", prompt, attempt=retry, cache=cache_status, stream=True)
+    yield FALLBACK_REPLY
+
+async def _pump_stream(contents, config, timeout: float, semaphore: asyncio.Semaphore, queue: asyncio.Queue):
+    """Đọc stream Gemini vào queue trong semaphore; kết thúc bằng None hoặc exception."""
+    try:
+        async with semaphore:
+            metrics.inc("llm_upstream_calls")
+            stream = await asyncio.wait_for(
+                get_client().aio.models.generate_content_stream(model=MODEL, contents=contents, config=config),
+                timeout=timeout,
+            )
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout=timeout)
+                except StopAsyncIteration:
+                    break
+                text = _chunk_text(chunk)
+                if text:
+                    queue.put_nowait(text)
+    except Exception as e:
+        queue.put_nowait(e)
+        return
+    queue.put_nowait(None)
+
+async def allm_generate_stream(
+    prompt: str,
+    temperature: float = 0.4,
+    retry: int = 3,
+    use_cache: bool = True,
+    timeout: float = REQUEST_TIMEOUT,
+) -> AsyncIterator[str]:
+    """
+    Bản async của llm_generate_stream (dùng cho /chat/stream). `timeout` áp dụng cho
+    thời gian chờ mỗi đoạn. Semaphore MAX_CONCURRENCY chỉ được giữ trong lúc đọc
+    upstream (xem _pump_stream): client đọc chậm không chiếm chỗ của lời gọi khác.
+    """
+    if use_cache:
+        cached = await _acache_read(prompt)
+        if cached:
+            _log("cache_hit", prompt, cache="hit")
+            yield cached
+            return
+    cache_status = "miss" if use_cache else "off"
+    await _aload_genai()
+    contents, config = _build_request(prompt, temperature)
+    semaphore = _get_semaphore()
+
+    for attempt in range(retry):
+        start = time.perf_counter()
+        parts = []
+        try:
+            queue = asyncio.Queue()
+            pump = asyncio.ensure_future(_pump_stream(contents, config, timeout, semaphore, queue))
+            try:
+                while (text := await queue.get()) is not None:
+                    if isinstance(text, Exception):
+                        raise text
+                    if not parts:
+                        metrics.observe("llm.stream_first_chunk", time.perf_counter() - start)
+                        text = text.lstrip()
+                    parts.append(text)
+                    yield text
+            finally:
+                # Client ngắt kết nối giữa chừng: dừng đọc upstream
+                pump.cancel()
+            if not parts:
+                raise ValueError("Empty response")
+        except Exception as e:
+            metrics.inc("llm_upstream_errors", error=type(e).__name__)
+            _log("error", prompt, attempt=attempt + 1, latency_ms=_elapsed_ms(start), cache=cache_status, stream=True, error=f"{type(e).__name__}: {e}")
+            if parts:
+                return
+            if attempt + 1 < retry:
+                await asyncio.sleep(_backoff_delay(attempt))
+            continue
+        metrics.observe("llm.stream", time.perf_counter() - start)
+        text = "".join(parts).strip()
+        if use_cache:
+            await _acache_write(prompt, text)
+        _log("success", prompt, attempt=attempt + 1, latency_ms=_elapsed_ms(start), cache=cache_status, stream=True, response=text[:500])
+        return
 
-    fallback = "Xin lỗi, hiện tại hệ thống đang bận. Vui lòng thử lại sau 🕐."
-    _log(f"[FALLBACK USED] {prompt[:120]}...")
-    return fallback
+    metrics.inc("llm_fallbacks")
+    _log("fallback", prompt, attempt=retry, cache=cache_status, stream=True)
+    yield FALLBACK_REPLY
 
 if __name__ == "__main__":
     test_prompt = "Xin chào, bạn khỏe không?"
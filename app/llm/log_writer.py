@@ -0,0 +1,135 @@
+"""
+Ghi log dạng JSON lines bằng một thread nền.
+
+Caller chỉ đưa bản ghi (dict) vào một hàng đợi có giới hạn, không bao giờ chờ
+I/O: khi hàng đợi đầy, bản ghi bị bỏ và được đếm trong `dropped`. Thread nền
+gom nhiều bản ghi thành một lần ghi, xoay file khi vượt `max_bytes`
+(llm_log.jsonl -> llm_log.jsonl.1 -> ... -> .{backups}).
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+from pathlib import Path
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUPS = 3
+DEFAULT_QUEUE_SIZE = 10_000
+# Số bản ghi tối đa gom lại trong một lần ghi file
+BATCH_SIZE = 512
+# Thời gian tối đa một bản ghi nằm trong hàng đợi trước khi được ghi (giây)
+FLUSH_INTERVAL = 0.5
+
+_STOP = object()
+
+
+class LogWriter:
+    def __init__(
+        self,
+        path,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backups: int = DEFAULT_BACKUPS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        self.written = self.dropped = self.rotations = self.errors = 0
+
+    def write(self, record: dict):
+        """Đưa một bản ghi vào hàng đợi; không chặn, bỏ bản ghi nếu hàng đợi đầy."""
+        if self._closed:
+            self.dropped += 1
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="llm-log-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                batch = [self._queue.get(timeout=FLUSH_INTERVAL)]
+            except queue.Empty:
+                continue
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stop = True
+                batch = [r for r in batch if r is not _STOP]
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(json.dumps(record, ensure_ascii=False, default=str))
+            except (TypeError, ValueError):
+                self.errors += 1
+        data = ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self._size() + len(data) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "ab") as f:
+                f.write(data)
+            self.written += len(lines)
+        except OSError:
+            self.errors += 1
+            self.dropped += len(lines)
+
+    def _size(self) -> int:
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def _rotate(self):
+        if self._size() == 0:
+            return
+        if self.backups <= 0:
+            self.path.unlink()
+        else:
+            for i in range(self.backups - 1, 0, -1):
+                src = self.path.with_name(f"{self.path.name}.{i}")
+                if src.exists():
+                    os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        self.rotations += 1
+
+    def close(self, timeout: float = 5.0):
+        """Ghi nốt các bản ghi còn trong hàng đợi rồi dừng thread nền."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "written": self.written,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize(),
+            "rotations": self.rotations,
+            "errors": self.errors,
+        }
@@ -0,0 +1,80 @@
+"""
+Câu hỏi lại cho các trường đơn hàng còn thiếu.
+
+Chỉ có 2^5 - 1 tổ hợp trường thiếu nên toàn bộ câu hỏi được dựng sẵn lúc import;
+mỗi lượt thiếu thông tin chỉ còn là một lần tra dict thay vì một lời gọi LLM.
+
+Biến môi trường:
+  - ORDER_FOLLOWUP_MODE: "template" (mặc định) hoặc "llm" (hành vi cũ: hỏi Gemini)
+  - ORDER_FOLLOWUP_VARIANTS: số cách diễn đạt được xoay vòng cho mỗi tổ hợp (1-3)
+"""
+import os
+import random
+from itertools import combinations
+
+REQUIRED_FIELDS = ["customer_name", "book_title", "quantity", "address", "phone"]
+
+FRIENDLY_FIELDS = {
+    "customer_name": "tên của bạn",
+    "book_title": "tên sách muốn mua",
+    "quantity": "số lượng",
+    "address": "địa chỉ giao hàng",
+    "phone": "số điện thoại liên lạc",
+}
+
+QUESTIONS = {
+    "customer_name": "Tên người nhận hàng là gì ạ?",
+    "book_title": "Bạn muốn mua cuốn sách nào?",
+    "quantity": "Bạn muốn đặt bao nhiêu cuốn?",
+    "address": "Địa chỉ giao hàng cụ thể của bạn ở đâu? (số nhà, đường, phường/xã, quận/huyện, tỉnh/thành)",
+    "phone": "Số điện thoại để shipper liên lạc với bạn là gì ạ?",
+}
+
+OPENINGS = [
+    "Cảm ơn bạn! Để hoàn tất đơn hàng, bạn vui lòng cung cấp thêm giúp mình nhé:",
+    "Gần xong rồi ạ 😊 Mình chỉ cần thêm vài thông tin sau:",
+    "Để sách đến tay bạn nhanh nhất, bạn cho mình xin thêm:",
+]
+
+SINGLE_FIELD = [
+    "Cảm ơn bạn! Chỉ còn thiếu {field} thôi ạ. {question}",
+    "Gần xong rồi 😊 Bạn cho mình xin {field} nhé. {question}",
+    "Mình đã ghi nhận thông tin của bạn. {question}",
+]
+
+CLOSING = "Cảm ơn bạn nhiều nha! 😊"
+
+MODE = os.getenv("ORDER_FOLLOWUP_MODE", "template")
+VARIANTS = max(1, min(len(OPENINGS), int(os.getenv("ORDER_FOLLOWUP_VARIANTS", "3"))))
+
+
+def _render(missing, variant: int) -> str:
+    if len(missing) == 1:
+        field = missing[0]
+        return SINGLE_FIELD[variant].format(field=FRIENDLY_FIELDS[field], question=QUESTIONS[field])
+    lines = [OPENINGS[variant], ""]
+    lines += [f"*   **{QUESTIONS[f]}**" for f in missing]
+    lines += ["", CLOSING]
+    return "\n".join(lines)
+
+
+def _build_table():
+    table = {}
+    for k in range(1, len(REQUIRED_FIELDS) + 1):
+        for missing in combinations(REQUIRED_FIELDS, k):
+            table[missing] = [_render(missing, v) for v in range(VARIANTS)]
+    return table
+
+
+FOLLOWUPS = _build_table()
+
+
+def followup_question(missing) -> str:
+    """Câu hỏi lại dựng sẵn cho danh sách trường thiếu (theo thứ tự REQUIRED_FIELDS)."""
+    return random.choice(FOLLOWUPS[tuple(missing)])
+
+
+def followup_prompt(missing) -> str:
+    """Prompt gửi LLM khi ORDER_FOLLOWUP_MODE=llm."""
+    missing_names = [FRIENDLY_FIELDS[f] for f in missing]
+    return f"Người dùng còn thiếu {', '.join(missing_names)}. Hãy hỏi người dùng cung cấp những thông tin này, với giọng thân thiện, tự nhiên."
@@ -0,0 +1,107 @@
+"""
+Nhận diện ý định từ câu người dùng gõ ở menu chính, không gọi LLM.
+
+Câu được chuẩn hóa (thường, bỏ dấu, "đ" -> "d") rồi cộng điểm theo cụm từ khóa
+và vài regex (số điện thoại, "<số> cuốn"). Ý định có điểm cao nhất thắng nếu đạt
+MIN_SCORE và hơn hẳn ý định đứng sau; ngược lại trả về None để hiện lại menu.
+
+    classify("Tôi muốn mua 2 cuốn Truyện Kiều")   -> "order"
+    classify("tìm sách của Nguyễn Du")            -> "browse"
+    classify("kiểm tra đơn hàng của Nam")          -> "track"
+    track_query("tra cứu mã đơn 12")               -> "#12"
+"""
+import re
+from typing import Dict, Optional
+
+from app import metrics
+from app.logic.utils import _extract_name, _extract_phone, fold_for_search
+
+ORDER = "order"
+BROWSE = "browse"
+TRACK = "track"
+
+# Điểm tối thiểu để chuyển thẳng vào flow
+MIN_SCORE = 2
+
+# (cụm từ đã chuẩn hóa, điểm); cụm được so theo ranh giới từ
+KEYWORDS = {
+    ORDER: (
+        ("mua", 2), ("dat mua", 1), ("dat sach", 2), ("dat hang", 1), ("dat", 1),
+        ("order", 2), ("lay", 1), ("giao cho", 1), ("giao ve", 1), ("giao toi", 1),
+        ("dia chi", 1), ("sdt", 1),
+    ),
+    BROWSE: (
+        ("xem sach", 3), ("danh sach", 2), ("xem", 1), ("tim", 2), ("tim sach", 1),
+        ("co sach", 2), ("sach gi", 2), ("sach nao", 2), ("the loai", 2), ("tac gia", 2),
+        ("goi y", 2), ("liet ke", 2), ("con sach", 1), ("co ban", 1),
+    ),
+    TRACK: (
+        ("tra cuu", 3), ("kiem tra", 2), ("ma don", 3), ("don hang", 1), ("don cua", 2),
+        ("don dat", 3), ("don hang cua", 1),
+        ("trang thai", 2), ("theo doi", 2), ("giao chua", 2), ("den dau", 2), ("da dat", 1),
+    ),
+}
+
+
+# Mỗi cụm từ khóa -> regex theo ranh giới từ, giữ điểm của cụm
+_KEYWORD_RES = {
+    intent: tuple((re.compile(rf"\b{re.escape(p)}\b"), w) for p, w in phrases)
+    for intent, phrases in KEYWORDS.items()
+}
+
+# "2 cuốn", "3 quyển", "1 tập"
+_QTY_UNIT_RE = re.compile(r"\b\d+\s*(?:cuon|quyen|tap)\b")
+
+# "mã đơn 12", "đơn hàng số 12", "đơn #12" (trên câu đã chuẩn hóa, "#" đã thành khoảng trắng)
+_ORDER_ID_RE = re.compile(r"\b(?:ma don|don hang|don)\s*(?:so\s*)?(\d{1,9})\b")
+
+# Từ đệm bỏ đi khi lấy từ khóa tìm kiếm từ một câu "xem/tìm sách ..."
+_BROWSE_FILLER = frozenset(
+    "toi minh em anh chi ban muon can cho xem tim kiem sach cuon quyen nao gi co khong ko "
+    "danh liet ke cac nhung the loai tac gia cua ve voi giup hay duoc di a nhe va goi y".split()
+)
+
+
+def scores(text: str) -> Dict[str, int]:
+    """Điểm của từng ý định cho một câu (dùng để debug/benchmark)."""
+    folded = fold_for_search(text)
+    result = {
+        intent: sum(w for p, w in patterns if p.search(folded))
+        for intent, patterns in _KEYWORD_RES.items()
+    }
+    if _QTY_UNIT_RE.search(folded):
+        result[ORDER] += 2
+    if _extract_phone(text):
+        result[ORDER] += 2
+    return result
+
+
+@metrics.timed("nlu.classify_intent")
+def classify(text: str) -> Optional[str]:
+    """Trả về "order" / "browse" / "track", hoặc None nếu không đủ chắc chắn."""
+    if not text or not text.strip():
+        return None
+    ranked = sorted(scores(text).items(), key=lambda kv: kv[1], reverse=True)
+    (best, top), (_, second) = ranked[0], ranked[1]
+    if top < MIN_SCORE or top == second:
+        return None
+    return best
+
+
+def browse_query(text: str) -> str:
+    """Phần còn lại của câu xem/tìm sách sau khi bỏ từ đệm ("tìm sách của Nguyễn Du" -> "nguyen du")."""
+    return " ".join(w for w in fold_for_search(text).split() if w not in _BROWSE_FILLER)
+
+
+def track_query(text: str) -> Optional[str]:
+    """
+    Thứ cần tra cứu trong câu: số điện thoại, mã đơn ("#12") hoặc tên người đặt
+    ("đơn hàng của Nam" -> "Nam"), nếu có.
+    """
+    phone = _extract_phone(text)
+    if phone:
+        return phone
+    m = _ORDER_ID_RE.search(fold_for_search(text))
+    if m:
+        return "#" + m.group(1)
+    return _extract_name(text)
@@ -1,8 +1,23 @@
-from app.db.database import get_all_books, add_order
-from app.llm.llm_client import llm_generate
-from app.logic.utils import extract_order_entities
+from app import metrics
+from app.db import catalog_cache
+from app.db.database import InsufficientStockError, place_order
+from app.logic import followups
+from app.logic.utils import extract_order_entities, normalize_for_match
 
-def handle(user_input: str, session: dict):
+# Khung quanh câu hỏi lại do LLM sinh (tách riêng để /chat/stream gửi trước/sau các đoạn stream)
+FOLLOWUP_PREFIX = "🧩 "
+FOLLOWUP_SUFFIX = "\n\n👉 (Nhấn '0' để quay lại menu chính)"
+
+def format_followup(text: str) -> str:
+    return f"{FOLLOWUP_PREFIX}{text}{FOLLOWUP_SUFFIX}"
+
+@metrics.timed("flow.order")
+def prepare(user_input: str, session: dict):
+    """
+    Xử lý một lượt của luồng đặt sách, trừ bước gọi LLM.
+    Trả về (reply, done, prompt): nếu prompt khác None thì caller cần sinh câu trả lời
+    bằng LLM rồi định dạng qua format_followup().
+    """
     if user_input.strip() == "0":
         session.clear()
         reply = (
@@ -14,56 +29,72 @@ def handle(user_input: str, session: dict):
             "- Bấm '0' để Thoát / quay lại menu chính"
         )
         session["state"] = "menu"
-        return reply, True
+        return reply, True, None
 
     # Khởi tạo order_info nếu chưa có
     if "order_info" not in session:
         session["order_info"] = {}
 
-    # Cập nhật thông tin người dùng vừa nhập
-    entities = extract_order_entities(user_input)
+    # Cập nhật thông tin người dùng vừa nhập. Từ lượt thứ hai chỉ trích các trường
+    # còn thiếu (trường đã có không bị ghi đè) và hiểu câu trả lời ngắn theo câu hỏi vừa hỏi
+    filled = [f for f in followups.REQUIRED_FIELDS if session["order_info"].get(f)]
+    pending = [f for f in followups.REQUIRED_FIELDS if f not in filled]
+    entities = extract_order_entities(
+        user_input,
+        known_titles=catalog_cache.title_index(),
+        fields=pending if filled else None,
+        expected=pending if filled else None,
+    )
     session["order_info"].update({k: v for k, v in entities.items() if v})
     print("Extracted entities:", entities)
 
-    required_fields = ["customer_name", "book_title", "quantity", "address", "phone"]
-    missing = [f for f in required_fields if not session["order_info"].get(f)]
+    missing = [f for f in followups.REQUIRED_FIELDS if not session["order_info"].get(f)]
 
     if missing:
-        # Chỉ hỏi lại những thông tin còn thiếu
-        friendly_fields = {
-            "customer_name": "tên của bạn",
-            "book_title": "tên sách muốn mua",
-            "quantity": "số lượng",
-            "address": "địa chỉ giao hàng",
-            "phone": "số điện thoại liên lạc",
-        }
-        missing_names = [friendly_fields[f] for f in missing]
-        prompt = f"Người dùng còn thiếu {', '.join(missing_names)}. Hãy hỏi người dùng cung cấp những thông tin này, với giọng thân thiện, tự nhiên."
-        response = llm_generate(prompt)
+        # Chỉ hỏi lại những thông tin còn thiếu: mặc định dùng câu hỏi dựng sẵn, LLM chỉ khi được bật
+        if followups.MODE != "llm":
+            return format_followup(followups.followup_question(missing)), False, None
+        prompt = followups.followup_prompt(missing)
         print(" Prompt gửi LLM:", prompt)
-        reply = f"🧩 {response}\n\n👉 (Nhấn '0' để quay lại menu chính)"
-        return reply, False
+        return None, False, prompt
 
     # Tìm sách trong kho
-    book = next(
-        (b for b in get_all_books() if b["title"].lower() == session["order_info"]["book_title"].lower()),
-        None
-    )
+    book = catalog_cache.find_by_title(session["order_info"]["book_title"])
+    if not book:
+        # Tên sách trích được có thể dính thêm chữ thừa ("Đắc Nhân Tâm, tên Huy")
+        matched = catalog_cache.title_index().match(normalize_for_match(session["order_info"]["book_title"]))
+        book = catalog_cache.find_by_title(matched)
     if not book:
         reply = (
             "❌ Xin lỗi, sách bạn chọn không có trong kho.\n"
             "Vui lòng chọn sách khác.\n\n👉 (Nhấn '0' để quay lại menu chính)"
         )
-        return reply, False
+        return reply, False, None
 
-    # Lưu đơn hàng
-    order = add_order(
-        name=session["order_info"]["customer_name"],
-        phone=session["order_info"]["phone"],
-        address=session["order_info"]["address"],
-        book_id=book["book_id"],
-        quantity=session["order_info"]["quantity"],
-    )
+    # Trừ kho và lưu đơn hàng trong cùng một transaction
+    try:
+        order = place_order(
+            name=session["order_info"]["customer_name"],
+            phone=session["order_info"]["phone"],
+            address=session["order_info"]["address"],
+            book_id=book["book_id"],
+            quantity=session["order_info"]["quantity"],
+        )
+    except InsufficientStockError as e:
+        if not e.available:
+            # Hết hàng: giữ thông tin khách, hỏi lại tên sách
+            session["order_info"].pop("book_title", None)
+            reply = (
+                f"❌ Xin lỗi, sách '{book['title']}' đã hết hàng.\n"
+                "Vui lòng chọn sách khác.\n\n👉 (Nhấn '0' để quay lại menu chính)"
+            )
+        else:
+            session["order_info"].pop("quantity", None)
+            reply = (
+                f"❌ Xin lỗi, sách '{book['title']}' chỉ còn {e.available} quyển.\n"
+                "Vui lòng nhập lại số lượng.\n\n👉 (Nhấn '0' để quay lại menu chính)"
+            )
+        return reply, False, None
 
     session.clear()
     reply = (
@@ -80,4 +111,4 @@ def handle(user_input: str, session: dict):
         "- Bấm '3' để Tra cứu đơn hàng"
     )
     session["state"] = "menu"
-    return reply, True
+    return reply, True, None
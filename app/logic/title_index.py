@@ -0,0 +1,168 @@
+from collections import Counter, defaultdict
+from difflib import get_close_matches
+from itertools import chain
+from typing import Dict, Iterable, List, Optional
+
+from app.logic.utils import normalize_for_match
+
+GRAM = 3
+# So khớp mờ chỉ xếp hạng tên sách theo các trigram hiếm nhất của câu, rồi chấm
+# điểm bằng difflib cho vài ứng viên đứng đầu
+FUZZY_GRAMS = 16
+FUZZY_CANDIDATES = 8
+# Tên sách khớp theo từ khi tỉ lệ từ của nó xuất hiện trong câu đạt ngưỡng này
+WORD_OVERLAP = 0.6
+
+
+def _grams(s: str) -> set:
+    return {s[i:i + GRAM] for i in range(len(s) - GRAM + 1)}
+
+
+def _min_overlap(word_count: int) -> int:
+    """Số từ chung ít nhất để một tên sách có word_count từ đạt WORD_OVERLAP."""
+    return next(c for c in range(word_count + 1) if c / word_count >= WORD_OVERLAP)
+
+
+class TitleIndex:
+    """
+    Chỉ mục tên sách trong danh mục, dựng một lần.
+
+    `match()` thử lần lượt: chuỗi con, so khớp mờ (difflib), trùng từ, và chỉ xét
+    các tên có chung từ / trigram với câu nên chi phí theo độ dài câu chứ không
+    theo cỡ danh mục. Bước chuỗi con và bước trùng từ cho đúng kết quả như quét
+    toàn bộ danh mục. Bước so khớp mờ là xấp xỉ: chỉ chấm điểm FUZZY_CANDIDATES
+    tên có nhiều trigram chung nhất trong FUZZY_GRAMS trigram hiếm nhất của câu,
+    nên có thể bỏ sót một tên mà quét toàn bộ sẽ tìm thấy.
+    """
+
+    def __init__(self, titles: Iterable[str]):
+        # tên đã chuẩn hóa -> tên gốc (trùng thì giữ tên sau cùng, như dict comprehension)
+        norm_to_orig: Dict[str, str] = {}
+        for t in titles:
+            if t:
+                norm_to_orig[normalize_for_match(t)] = t
+        self._norms: List[str] = list(norm_to_orig)
+        self._origs: List[str] = [norm_to_orig[n] for n in self._norms]
+        self._words: List[frozenset] = [frozenset(n.split()) for n in self._norms]
+
+        word_df = defaultdict(int)
+        gram_postings = defaultdict(list)
+        for i, norm in enumerate(self._norms):
+            for w in self._words[i]:
+                word_df[w] += 1
+            for g in _grams(norm):
+                gram_postings[g].append(i)
+        self._gram_postings = dict(gram_postings)
+
+        # Trùng từ dùng lọc tiền tố: tên có k từ cần m từ xuất hiện trong câu, nên ít
+        # nhất một trong (k - m + 1) từ hiếm nhất của nó phải có mặt. Chỉ xếp tên vào
+        # posting của các từ đó giúp posting của từ phổ biến luôn ngắn.
+        word_postings = defaultdict(list)
+        for i, twords in enumerate(self._words):
+            if not twords:
+                continue
+            rarest = sorted(twords, key=lambda w: (word_df[w], w))
+            for w in rarest[:len(twords) - _min_overlap(len(twords)) + 1]:
+                word_postings[w].append(i)
+        self._word_postings = dict(word_postings)
+
+        # Tìm chuỗi con: mỗi tên được xếp theo trigram hiếm nhất của nó. Tên nằm
+        # trong câu thì trigram đó chắc chắn cũng có trong câu.
+        by_key_gram = defaultdict(list)
+        self._short: List[int] = []
+        for i, norm in enumerate(self._norms):
+            grams = _grams(norm)
+            if not grams:
+                self._short.append(i)
+                continue
+            key = min(grams, key=lambda g: (len(self._gram_postings[g]), g))
+            by_key_gram[key].append(i)
+        self._by_key_gram = dict(by_key_gram)
+
+    @classmethod
+    def from_parts(cls, norms, origs, words, gram_postings, word_postings, by_key_gram, short) -> "TitleIndex":
+        """
+        Chỉ mục từ các phần đã dựng sẵn (xem parts()). Dùng được mọi dãy / mapping
+        có .get(), ví dụ các view chỉ đọc trên snapshot danh mục mmap
+        (app/db/catalog_snapshot.py); posting list chỉ cần len() và duyệt được.
+        """
+        index = cls.__new__(cls)
+        index._norms, index._origs, index._words = norms, origs, words
+        index._gram_postings, index._word_postings = gram_postings, word_postings
+        index._by_key_gram, index._short = by_key_gram, short
+        return index
+
+    def parts(self) -> dict:
+        """Các cấu trúc match() đọc tới, dùng để ghi chỉ mục ra file."""
+        return {
+            "norms": self._norms,
+            "origs": self._origs,
+            "gram_postings": self._gram_postings,
+            "word_postings": self._word_postings,
+            "by_key_gram": self._by_key_gram,
+            "short": self._short,
+        }
+
+    def __len__(self) -> int:
+        return len(self._norms)
+
+    def titles(self) -> List[str]:
+        return list(self._origs)
+
+    def _substring_match(self, text_norm: str, text_grams: set) -> Optional[str]:
+        best = None
+        candidates = list(self._short)
+        for g in text_grams:
+            candidates.extend(self._by_key_gram.get(g, ()))
+        for i in candidates:
+            norm = self._norms[i]
+            if norm in text_norm:
+                key = (len(norm), self._origs[i])
+                if best is None or key > best:
+                    best = key
+        return best[1] if best else None
+
+    def _fuzzy_match(self, text_norm: str, text_grams: set) -> Optional[str]:
+        n = len(text_norm)
+        postings = [p for p in map(self._gram_postings.get, text_grams) if p]
+        postings.sort(key=len)
+        if not text_grams:
+            postings = [self._short]
+        scores = Counter(chain.from_iterable(postings[:FUZZY_GRAMS]))
+        # ratio của difflib = 2*M/(a+b) chỉ đạt 0.7 khi độ dài hai chuỗi đủ gần nhau
+        lo, hi = n * 0.7 / 1.3, n * 1.3 / 0.7
+        norms = self._norms
+        ranked = {}
+        for i, _ in scores.most_common(4 * FUZZY_CANDIDATES):
+            norm = norms[i]
+            if lo <= len(norm) <= hi:
+                ranked[norm] = i
+                if len(ranked) == FUZZY_CANDIDATES:
+                    break
+        best = get_close_matches(text_norm, list(ranked), n=1, cutoff=0.7)
+        if best:
+            return self._origs[ranked[best[0]]]
+        return None
+
+    def _word_overlap_match(self, text_norm: str) -> Optional[str]:
+        words = set(text_norm.split())
+        best = None
+        for w in words:
+            for i in self._word_postings.get(w, ()):
+                if best is not None and i >= best:
+                    continue
+                twords = self._words[i]
+                if len(twords & words) / len(twords) >= WORD_OVERLAP:
+                    best = i
+        return self._origs[best] if best is not None else None
+
+    def match(self, text_norm: str) -> Optional[str]:
+        """Tên sách khớp nhất với câu đã chuẩn hóa, hoặc None."""
+        if not self._norms:
+            return None
+        text_grams = _grams(text_norm)
+        return (
+            self._substring_match(text_norm, text_grams)
+            or self._fuzzy_match(text_norm, text_grams)
+            or self._word_overlap_match(text_norm)
+        )
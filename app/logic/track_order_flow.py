@@ -1,5 +1,92 @@
-from app.db.database import get_orders_by_customer
+import re
 
+from app import metrics
+from app.db.database import count_orders, get_order, get_order_history
+from app.logic.utils import _extract_phone
+
+# Số đơn hiện mỗi lượt; khách có nhiều đơn gõ "thêm" để xem các đơn cũ hơn
+TRACK_PAGE_SIZE = 5
+MORE_COMMANDS = ("thêm", "them", "xem thêm", "xem them", "+")
+# "#123" hoặc "123": mã đơn (số điện thoại có từ 9 chữ số và được nhận trước)
+_ORDER_ID_RE = re.compile(r"^#?\s*(\d{1,9})$")
+
+MENU_FOOTER = (
+    "🏠 Quay lại menu chính:\n"
+    "- Bấm '1' để Đặt sách\n"
+    "- Bấm '2' để Xem sách khả dụng\n"
+    "- Bấm '3' để Tra cứu đơn hàng\n"
+    "- Bấm '0' để Quay lại menu chính"
+)
+
+
+def _lookup_key(text: str) -> dict:
+    """{"phone": ...}, {"order_id": ...} hoặc {"customer_name": ...} từ câu người dùng nhập."""
+    phone = _extract_phone(text)
+    if phone:
+        return {"phone": phone}
+    m = _ORDER_ID_RE.match(text)
+    if m:
+        return {"order_id": int(m.group(1))}
+    return {"customer_name": text}
+
+
+def _format_order(o: dict) -> str:
+    text = (
+        f"🧾 Mã đơn: {o['order_id']}\n"
+        f"📗 Sách: {o['book_title']}\n"
+        f"📦 Số lượng: {o['quantity']}\n"
+        f"🚚 Trạng thái: {o['status']}"
+    )
+    if o.get("created_at"):
+        text += f"\n🕒 Ngày đặt: {o['created_at']}"
+    return text
+
+
+def _not_found(what: str, session: dict):
+    session.clear()
+    reply = (
+        f"❌ Không tìm thấy {what}.\n"
+        "👉 Thử lại hoặc nhấn '0' để quay lại menu chính."
+    )
+    session["state"] = "menu"
+    return reply, False
+
+
+def _show_page(query: dict, session: dict):
+    """Một trang lịch sử đơn (mới nhất trước); query được giữ trong session để gõ "thêm"."""
+    orders, next_cursor = get_order_history(
+        query.get("customer_name"), query.get("phone"), before_id=query["cursor"], limit=TRACK_PAGE_SIZE
+    )
+    if not orders and not query["cursor"]:
+        return _not_found(f"đơn hàng nào của '{query['label']}'", session)
+
+    if not query["cursor"]:
+        summary = count_orders(query.get("customer_name"), query.get("phone"))
+        query["total"] = summary["total"]
+        by_status = ", ".join(f"{n} {status}" for status, n in summary["by_status"].items())
+        header = f"📋 Kết quả tra cứu đơn hàng cho '{query['label']}' ({summary['total']} đơn: {by_status}):"
+    else:
+        header = f"📋 Các đơn cũ hơn của '{query['label']}':"
+    query["shown"] = query.get("shown", 0) + len(orders)
+    orders_text = "\n\n".join(_format_order(o) for o in orders)
+
+    if next_cursor is not None:
+        session["track_query"] = dict(query, cursor=next_cursor)
+        remaining = query["total"] - query["shown"]
+        reply = (
+            f"{header}\n\n{orders_text}\n\n"
+            f"📄 Còn {remaining} đơn cũ hơn: gõ 'thêm' để xem tiếp, "
+            "hoặc nhấn '0' để quay lại menu chính."
+        )
+        return reply, False
+
+    session.clear()
+    reply = f"{header}\n\n{orders_text}\n\n{MENU_FOOTER}"
+    session["state"] = "menu"
+    return reply, True
+
+
+@metrics.timed("flow.track")
 def handle(user_input: str, session: dict):
     if user_input.strip() == "0":
         session.clear()
@@ -17,39 +104,24 @@ def handle(user_input: str, session: dict):
     if "awaiting_name" not in session:
         session["awaiting_name"] = True
         reply = (
-            "🔎 Vui lòng nhập **tên người đặt hàng** để tra cứu đơn.\n"
+            "🔎 Vui lòng nhập **tên người đặt hàng**, số điện thoại hoặc mã đơn để tra cứu.\n"
             "👉 (Nhấn '0' để quay lại menu chính)"
         )
         return reply, False
 
-    customer_name = user_input.strip()
-    orders = get_orders_by_customer(customer_name)
+    text = user_input.strip()
+    if session.get("track_query") and text.lower() in MORE_COMMANDS:
+        return _show_page(session["track_query"], session)
 
-    if not orders:
+    key = _lookup_key(text)
+    if "order_id" in key:
+        order = get_order(key["order_id"])
+        if order is None:
+            return _not_found(f"đơn hàng #{key['order_id']}", session)
         session.clear()
-        reply = (
-            f"❌ Không tìm thấy đơn hàng nào của '{customer_name}'.\n"
-            "👉 Thử lại hoặc nhấn '0' để quay lại menu chính."
-        )
+        reply = f"📋 Kết quả tra cứu đơn hàng #{order['order_id']}:\n\n{_format_order(order)}\n\n{MENU_FOOTER}"
         session["state"] = "menu"
-        return reply, False
-
-    orders_text = "\n\n".join([
-        f"🧾 Mã đơn: {o['order_id']}\n"
-        f"📗 Sách: {o['book_title']}\n"
-        f"📦 Số lượng: {o['quantity']}\n"
-        f"🚚 Trạng thái: {o['status']}"
-        for o in orders
-    ])
+        return reply, True
 
-    session.clear()
-    reply = (
-        f"📋 Kết quả tra cứu đơn hàng cho '{customer_name}':\n\n{orders_text}\n\n"
-        "🏠 Quay lại menu chính:\n"
-        "- Bấm '1' để Đặt sách\n"
-        "- Bấm '2' để Xem sách khả dụng\n"
-        "- Bấm '3' để Tra cứu đơn hàng\n"
-        "- Bấm '0' để Quay lại menu chính"
-    )
-    session["state"] = "menu"
-    return reply, True
+    label = f"SĐT {key['phone']}" if "phone" in key else key["customer_name"]
+    return _show_page(dict(key, label=label, cursor=0), session)
@@ -1,7 +1,9 @@
 import re
 import unicodedata
-from difflib import get_close_matches
-from typing import List, Optional, Dict, Any
+from functools import lru_cache
+from typing import Iterable, List, Optional, Dict, Any
+
+from app import metrics
 
 VN_NUM_WORDS = {
     "một": 1, "mot": 1,
@@ -19,44 +21,177 @@ VN_NUM_WORDS = {
     "hai mươi": 20, "hai muoi": 20
 }
 
+ORDER_FIELDS = ("customer_name", "book_title", "quantity", "address", "phone")
+
+# --- Precompiled patterns -------------------------------------------------
+# Everything below is compiled once at import time; the extractors run on every
+# order message so they must not rebuild patterns per call.
+
+_WS_RE = re.compile(r"\s+")
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+_DIGIT_RE = re.compile(r"\d")
+
+_PHONE_RES = [
+    re.compile(r'(\+84|84|0)[\s\.\-]?\d{1,3}[\s\.\-]?\d{3}[\s\.\-]?\d{3,4}'),
+    re.compile(r'\b0\d{9,10}\b'),
+    re.compile(r'\b\d{3}[\s\.\-]\d{3}[\s\.\-]\d{3,4}\b'),
+]
+_PHONE_STRIP_RE = re.compile(r"[^\d\+]")
+
+_QTY_DIGITS_RE = re.compile(r'(\d+)\s*(?:cuốn|cuon|quyển|quyen|quyển|quyen|q|quyen)?\b', re.IGNORECASE)
+# One alternation over all number words, one group per word in VN_NUM_WORDS order.
+# It is wrapped in a lookahead so finditer reports every (possibly overlapping)
+# occurrence; the word that wins is the one listed first in VN_NUM_WORDS, exactly
+# like a per-word search loop.
+_NUM_WORD_VALUES = list(VN_NUM_WORDS.values())
+_NUM_WORDS_RE = re.compile(
+    r'(?=\b(?:' + '|'.join(f'({re.escape(w)})' for w in VN_NUM_WORDS) + r')\b)',
+    re.IGNORECASE,
+)
+
+_ADDR_KEYWORDS = [
+    r'giao về', r'giao cho', r'giao tới', r'địa chỉ', r'tại', r'đ/c', r'đ dia chi',
+    r'số nhà', r'số', r'ngõ', r'ngách', r'đường', r'phố', r'phường', r'xã', r'quận', r'huyện', r'tp', r'tp\.'
+]
+# Keywords may match inside words and each one takes priority over the ones after
+# it, so a single alternation would have to test every position of the message with
+# a lookahead; on our corpus that measured about 3x slower than one precompiled
+# pattern per keyword.
+_ADDR_RES = [
+    re.compile(kw + r'\s*[:\-]?\s*(?P<addr>[^,;\n]+)', re.IGNORECASE)
+    for kw in _ADDR_KEYWORDS
+]
+_ADDR_HOUSE_NO_RE = re.compile(r'\b(số\s*\d+[^,;\n]*)', re.IGNORECASE)
+
+_NAME_RES = [
+    re.compile(r'(?:cho|cho anh|cho chị|cho ông|cho bà|giao cho|gửi cho|giao về)\s+([A-ZĐ][\w\-\.]{1,80}(?:\s+[A-ZĐ][\w\-\.]{1,80})*)'),
+    re.compile(r'(?:tên|tên là|tên:)\s*([A-ZĐ][\w\-\.]{1,80}(?:\s+[A-ZĐ][\w\-\.]{1,80})*)'),
+    re.compile(r'(?:của)\s+([A-ZĐ][\w\-\.]{1,80}(?:\s+[A-ZĐ][\w\-\.]{1,80})*)'),
+]
+_NAME_LABEL_RE = re.compile(r'(?:tên[:\s]+)([^,;\n]+)', re.IGNORECASE)
+_COMMA_NL_RE = re.compile(r'[,\n]')
+
+_QUOTED_TITLE_RE = re.compile(r'["“”\'«»](?P<title>.+?)["“”\'»]')
+_TITLE_STOP_WORDS = r'(?:giao|cho|tại|địa chỉ|sđt|sdt|số|nhà|ngõ|,|;|\.)'
+_TITLE_RES = [
+    # mua/đặt ... [qty] cuốn [title] (stop before 'giao/cho/tại')
+    re.compile(rf'(?:mua|muốn mua|muon mua|đặt|dat|muốn đặt|muon dat)\s*(?:khoảng\s*)?(?:\d+\s*)?(?:cuốn|cuon|quyển|quyen|tập|quyen|quyen)?\s*(?:sách)?\s*(?P<title>.+?)(?=\s+{_TITLE_STOP_WORDS}|$)', re.IGNORECASE),
+    # cuốn/ quyển TITLE ...
+    re.compile(rf'(?:cuốn|cuon|quyển|quyen|tập)\s+(?P<title>.+?)(?=\s+{_TITLE_STOP_WORDS}|$)', re.IGNORECASE),
+    # TITLE <number> cuốn (title before qty)
+    re.compile(r'(?P<title>[A-ZĐ][\w\W]{1,80}?)\s*,?\s*(?:\d+)\s*(?:cuốn|cuon|quyển|quyen)\b', re.IGNORECASE),
+]
+_TITLE_TRAILING_KW_RE = re.compile(r'\b(?:giao|cho|tại|địa chỉ|sđt|sdt|số|nhà|ngõ)\b', re.IGNORECASE)
+_TITLE_EDGE_PUNCT_RE = re.compile(r'^[\-:\s]+|[\-:\s]+$')
+_CAP_RUN_RE = re.compile(r'([A-ZĐ][\w\'\-\.]{1,}\s+[A-ZĐ][\w\'\-\.]{1,}(?:\s+[A-ZĐ][\w\'\-\.]{1,})*)')
+_CAP_EXPAND_RE = re.compile(r'([A-ZĐ][\w\'\-\.]+\s+[A-ZĐ][\w\'\-\.]+\s*[A-ZĐ]?[^\n,;]*)')
+_TITLE_QTY_RE = re.compile(r'\b\d+\s*(?:cuốn|cuon|quyển|quyen|tập)\b', re.IGNORECASE)
+_TITLE_TAIL_RE = re.compile(r'\b(số|sdt|địa chỉ|đ/c)\b.*$', re.IGNORECASE)
+
+# Replies that are nothing but a number (phone or quantity), e.g. "0912 345 678", "3 cuốn"
+_BARE_NUMBER_RE = re.compile(r'^[\d\s\.\-\+]+(?:cuốn|cuon|quyển|quyen)?[\s\.]*$', re.IGNORECASE)
+_NON_DIGIT_RE = re.compile(r'\D')
+# A bare reply longer than this is not treated as just a name
+_BARE_NAME_MAX_WORDS = 5
+_CAPITALIZED_WORDS_RE = re.compile(r'^(?:[A-ZĐ]\w*\.?\s*)+$')
+_ADDR_INTRO_RE = re.compile(r'^(?:giao về|giao tới|giao đến|giao cho|địa chỉ|đ/c|tại|ở)\s*[:\-]?\s*', re.IGNORECASE)
+
 
 def clean_text(text: str) -> str:
     if not text:
         return ""
-    return re.sub(r"\s+", " ", text).strip()
+    return _WS_RE.sub(" ", text).strip()
+
+
+# --- Accent folding ---------------------------------------------------------
+# Titles, messages and the DB *_norm / FTS columns all go through these. Text made
+# only of ASCII, Latin-1, Latin Extended-A/B, IPA, combining diacritics and Latin
+# Extended Additional (every precomposed Vietnamese letter) is folded with one
+# str.translate call over a precomputed table; anything else takes the generic
+# NFD path, so the output is the same either way. Results are memoized because
+# the same titles and messages are normalized many times per request.
+
+_TABLE_RANGES = ((0x0000, 0x0370), (0x1E00, 0x1F00))
+_TABLE_CHARS = frozenset(chr(c) for lo, hi in _TABLE_RANGES for c in range(lo, hi))
+NORMALIZE_CACHE_SIZE = 4096
+
 
+def _strip_accents_nfd(s: str) -> str:
+    s = unicodedata.normalize("NFD", s)
+    return "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
+
+
+@lru_cache(maxsize=1)
+def _translate_tables():
+    """(accents, match, fold) tables for str.translate, built on first use.
+
+    Every code point in _TABLE_RANGES gets an entry, identity included: a missing
+    key makes str.translate raise and catch KeyError internally, which is slower
+    than the lookup itself.
+    """
+    accents, match, fold = {}, {}, {}
+    for lo, hi in _TABLE_RANGES:
+        for code in range(lo, hi):
+            stripped = _strip_accents_nfd(chr(code))
+            matched = _NON_WORD_RE.sub(" ", stripped)
+            for table, value in ((accents, stripped), (match, matched), (fold, matched.replace("đ", "d"))):
+                table[code] = ord(value) if len(value) == 1 else (value or None)
+    return accents, match, fold
+
+
+def _translate(s: str, table: dict) -> Optional[str]:
+    """s.translate(table), or None if s has characters the tables do not cover."""
+    out = s.translate(table)
+    # Uncovered characters pass through unchanged and are never ASCII or đ/Đ, so the
+    # set lookup is only needed for the rare outputs like "ø" or "ß"
+    if out.isascii() or out.replace("đ", "").replace("Đ", "").isascii() or _TABLE_CHARS.issuperset(s):
+        return out
+    return None
 
-def _strip_accents(s: str) -> str:
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def strip_accents(s: str) -> str:
+    """Remove combining marks: "Đắc Nhân Tâm" -> "Đac Nhan Tam" (case and "đ" are kept)."""
     if not s:
         return ""
-    s = unicodedata.normalize("NFD", s)
-    s = "".join(ch for ch in s if unicodedata.category(ch) != "Mn")
-    return s
+    out = _translate(s, _translate_tables()[0])
+    return _strip_accents_nfd(s) if out is None else out
 
 
-def _normalize_for_match(s: str) -> str:
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_for_match(s: str) -> str:
+    """Lowercase, strip accents, punctuation -> space, collapse whitespace: "Đắc Nhân Tâm!" -> "đac nhan tam"."""
     if not s:
         return ""
     s = s.lower()
-    s = _strip_accents(s)
-    s = re.sub(r"[^\w\s]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
+    out = _translate(s, _translate_tables()[1])
+    if out is not None:
+        return " ".join(out.split())
+    s = _strip_accents_nfd(s)
+    s = _NON_WORD_RE.sub(" ", s)
+    s = _WS_RE.sub(" ", s).strip()
     return s
 
 
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def fold_for_search(s: str) -> str:
+    """Like normalize_for_match, but also folds "đ" (not a combining mark) so "dac" finds "Đắc"."""
+    if not s:
+        return ""
+    out = _translate(s.lower(), _translate_tables()[2])
+    if out is not None:
+        return " ".join(out.split())
+    return normalize_for_match(s).replace("đ", "d")
+
+
 def _extract_phone(text: str) -> Optional[str]:
     if not text:
         return None
     # handle +84 and 0... with separators
-    patterns = [
-        r'(\+84|84|0)[\s\.\-]?\d{1,3}[\s\.\-]?\d{3}[\s\.\-]?\d{3,4}',
-        r'\b0\d{9,10}\b',
-        r'\b\d{3}[\s\.\-]\d{3}[\s\.\-]\d{3,4}\b'
-    ]
-    for p in patterns:
-        m = re.search(p, text)
+    for p in _PHONE_RES:
+        m = p.search(text)
         if m:
-            val = re.sub(r"[^\d\+]", "", m.group(0))
+            val = _PHONE_STRIP_RE.sub("", m.group(0))
             # normalize +84 -> 0 if needed
             if val.startswith("+84"):
                 val = "0" + val[3:]
@@ -71,16 +206,22 @@ def _extract_quantity(text: str) -> Optional[int]:
     if not text:
         return None
     # digits first
-    m = re.search(r'(\d+)\s*(?:cuốn|cuon|quyển|quyen|quyển|quyen|q|quyen)?\b', text, flags=re.IGNORECASE)
+    m = _QTY_DIGITS_RE.search(text)
     if m:
         try:
             return int(m.group(1))
         except Exception:
             pass
-    # words (simple)
-    for word, num in VN_NUM_WORDS.items():
-        if re.search(r'\b' + re.escape(word) + r'\b', text, flags=re.IGNORECASE):
-            return num
+    # words (simple): earliest entry of VN_NUM_WORDS found anywhere in the text
+    best = None
+    for m in _NUM_WORDS_RE.finditer(text):
+        idx = m.lastindex - 1
+        if best is None or idx < best:
+            best = idx
+            if best == 0:
+                break
+    if best is not None:
+        return _NUM_WORD_VALUES[best]
     return None
 
 
@@ -88,16 +229,12 @@ def _extract_address(text: str) -> Optional[str]:
     if not text:
         return None
     # common address introducers
-    addr_keywords = [
-        r'giao về', r'giao cho', r'giao tới', r'địa chỉ', r'tại', r'đ/c', r'đ dia chi',
-        r'số nhà', r'số', r'ngõ', r'ngách', r'đường', r'phố', r'phường', r'xã', r'quận', r'huyện', r'tp', r'tp\.' 
-    ]
-    for kw in addr_keywords:
-        m = re.search(kw + r'\s*[:\-]?\s*(?P<addr>[^,;\n]+)', text, flags=re.IGNORECASE)
+    for p in _ADDR_RES:
+        m = p.search(text)
         if m and m.group('addr'):
             return clean_text(m.group('addr'))
     # fallback: look for sequences containing house number patterns
-    m2 = re.search(r'\b(số\s*\d+[^,;\n]*)', text, flags=re.IGNORECASE)
+    m2 = _ADDR_HOUSE_NO_RE.search(text)
     if m2:
         return clean_text(m2.group(1))
     return None
@@ -108,106 +245,161 @@ def _extract_name(text: str) -> Optional[str]:
         return None
     # patterns: "cho <Name>", "của <Name>", "tên <Name>", "gửi cho <Name>"
     # stop tokens: tại/địa chỉ/số/sdt/phone/giao/,\.
-    patterns = [
-        r'(?:cho|cho anh|cho chị|cho ông|cho bà|giao cho|gửi cho|giao về)\s+([A-ZĐ][\w\-\.]{1,80}(?:\s+[A-ZĐ][\w\-\.]{1,80})*)',
-        r'(?:tên|tên là|tên:)\s*([A-ZĐ][\w\-\.]{1,80}(?:\s+[A-ZĐ][\w\-\.]{1,80})*)',
-        r'(?:của)\s+([A-ZĐ][\w\-\.]{1,80}(?:\s+[A-ZĐ][\w\-\.]{1,80})*)'
-    ]
-    for p in patterns:
-        m = re.search(p, text)
+    for p in _NAME_RES:
+        m = p.search(text)
         if m:
             name = m.group(1).strip().strip(',:.-')
             # avoid capturing words that look like addresses/phones
-            if not re.search(r'\d', name):
+            if not _DIGIT_RE.search(name):
                 return name
     # fallback: look for "Tên: X" variants with lower-case too
-    m2 = re.search(r'(?:tên[:\s]+)([^,;\n]+)', text, flags=re.IGNORECASE)
+    m2 = _NAME_LABEL_RE.search(text)
     if m2:
         cand = clean_text(m2.group(1))
-        cand = re.split(r'[,\n]', cand)[0].strip()
+        cand = _COMMA_NL_RE.split(cand)[0].strip()
         return cand
     return None
 
 
-def _match_known_titles(text_norm: str, known_titles: List[str]) -> Optional[str]:
+def _match_known_titles(text_norm: str, known_titles) -> Optional[str]:
+    """
+    known_titles is either a prebuilt TitleIndex (preferred, see
+    app/logic/title_index.py) or a plain list of titles.
+    """
     if not known_titles:
         return None
-    # normalize known titles
-    normalized_map = { _normalize_for_match(t): t for t in known_titles if t }
-    candidates = []
-    for norm_title, orig in normalized_map.items():
-        if norm_title in text_norm:
-            candidates.append((len(norm_title), orig))
-    if candidates:
-        # return the longest match (prefer longer title)
-        candidates.sort(reverse=True)
-        return candidates[0][1]
-    # fuzzy match - use difflib on words
-    all_titles_norm = list(normalized_map.keys())
-    best = get_close_matches(text_norm, all_titles_norm, n=1, cutoff=0.7)
-    if best:
-        return normalized_map[best[0]]
-    # also attempt word-level matching: check if >50% words of a title present
-    words = set(text_norm.split())
-    for norm_title, orig in normalized_map.items():
-        twords = set(norm_title.split())
-        if not twords:
-            continue
-        overlap = len(twords & words) / len(twords)
-        if overlap >= 0.6:
-            return orig
-    return None
+    return _title_index_for(known_titles).match(text_norm)
+
+
+_last_title_index = {"key": None, "index": None}
+
+
+def _title_index_for(known_titles):
+    from app.logic.title_index import TitleIndex
+
+    if isinstance(known_titles, TitleIndex):
+        return known_titles
+    # plain lists: reuse the index while callers keep passing the same titles
+    key = tuple(known_titles)
+    if _last_title_index["key"] != key:
+        _last_title_index.update(key=key, index=TitleIndex(key))
+    return _last_title_index["index"]
 
 
 def _extract_title_by_patterns(text: str, text_norm: str) -> Optional[str]:
-    q = re.search(r'["“”\'«»](?P<title>.+?)["“”\'»]', text)
+    q = _QUOTED_TITLE_RE.search(text)
     if q:
         return clean_text(q.group('title'))
 
-    stop_words = r'(?:giao|cho|tại|địa chỉ|sđt|sdt|số|nhà|ngõ|,|;|\.)'
-    patterns = [
-        # mua/đặt ... [qty] cuốn [title] (stop before 'giao/cho/tại')
-        rf'(?:mua|muốn mua|muon mua|đặt|dat|muốn đặt|muon dat)\s*(?:khoảng\s*)?(?:\d+\s*)?(?:cuốn|cuon|quyển|quyen|tập|quyen|quyen)?\s*(?:sách)?\s*(?P<title>.+?)(?=\s+{stop_words}|$)',
-        # cuốn/ quyển TITLE ...
-        rf'(?:cuốn|cuon|quyển|quyen|tập)\s+(?P<title>.+?)(?=\s+{stop_words}|$)',
-        # TITLE <number> cuốn (title before qty)
-        r'(?P<title>[A-ZĐ][\w\W]{1,80}?)\s*,?\s*(?:\d+)\s*(?:cuốn|cuon|quyển|quyen)\b',
-    ]
-    for p in patterns:
-        m = re.search(p, text, flags=re.IGNORECASE)
+    for p in _TITLE_RES:
+        m = p.search(text)
         if m:
             title = m.group('title').strip()
             # remove trailing keywords accidentally captured
-            title = re.split(r'\b(?:giao|cho|tại|địa chỉ|sđt|sdt|số|nhà|ngõ)\b', title, flags=re.IGNORECASE)[0].strip()
-            title = re.sub(r'^[\-:\s]+|[\-:\s]+$', '', title)
+            title = _TITLE_TRAILING_KW_RE.split(title)[0].strip()
+            title = _TITLE_EDGE_PUNCT_RE.sub('', title)
             if title:
                 return title
     # last resort: pick capitalized run of words (2+ words)
-    cap_run = re.search(r'([A-ZĐ][\w\'\-\.]{1,}\s+[A-ZĐ][\w\'\-\.]{1,}(?:\s+[A-ZĐ][\w\'\-\.]{1,})*)', text)
+    cap_run = _CAP_RUN_RE.search(text)
     if cap_run:
         return clean_text(cap_run.group(1))
     return None
 
 
-def extract_order_entities(text: str, known_titles: Optional[List[str]] = None) -> Dict[str, Any]:
+def _extract_bare_reply(raw: str, expected: List[str], known_titles) -> Optional[Dict[str, Any]]:
+    """
+    Interpret a short follow-up reply using the fields the bot just asked for:
+    a bare 10-digit number is a phone, "3" is a quantity, and when a single field
+    is expected a plain phrase is that field. Returns None when the reply is not bare.
+    """
+    if not raw or not expected:
+        return None
+
+    if _BARE_NUMBER_RE.match(raw):
+        digits = _NON_DIGIT_RE.sub("", raw)
+        if "phone" in expected and len(digits) >= 9:
+            return {"phone": _extract_phone(raw) or digits}
+        if "quantity" in expected and 0 < len(digits) <= 3:
+            return {"quantity": int(digits)}
+        return None
+
+    if "quantity" in expected:
+        word = raw.lower().strip(" .!")
+        if word in VN_NUM_WORDS:
+            return {"quantity": VN_NUM_WORDS[word]}
+
+    looks_like_name = not _DIGIT_RE.search(raw) and len(raw.split()) <= _BARE_NAME_MAX_WORDS
+    # The name is asked first, so a short capitalized reply ("Trần Văn Bình") answers it
+    if expected[0] == "customer_name" and looks_like_name and _CAPITALIZED_WORDS_RE.match(raw):
+        return {"customer_name": raw.strip(" .,!")}
+
+    if len(expected) != 1:
+        return None
+    field = expected[0]
+    if field == "customer_name":
+        if not looks_like_name:
+            return None
+        return {"customer_name": _extract_name(raw) or raw.strip(" .,!")}
+    if field == "address":
+        return {"address": _ADDR_INTRO_RE.sub("", raw).strip(" .,!") or None}
+    if field == "book_title":
+        title = _match_known_titles(normalize_for_match(raw), known_titles) if known_titles else None
+        if not title and not _DIGIT_RE.search(raw):
+            title = _extract_title_by_patterns(raw, normalize_for_match(raw)) or raw.strip(" .,!")
+        return {"book_title": title} if title else None
+    return None
+
+
+@metrics.timed("nlu.extract_order_entities")
+def extract_order_entities(
+    text: str,
+    known_titles: Optional[List[str]] = None,
+    fields: Optional[Iterable[str]] = None,
+    expected: Optional[Iterable[str]] = None,
+) -> Dict[str, Any]:
     """
     Robust extractor for order entities.
 
     Parameters:
       - text: raw user input
-      - known_titles: optional list of book titles from DB (used for reliable matching)
+      - known_titles: optional list of book titles from DB, or a TitleIndex built
+        from them (used for reliable matching)
+      - fields: only run the extractors for these fields (default: all of
+        ORDER_FIELDS); the others are returned as None, so slots that are
+        already filled cannot be overwritten by a stray match
+      - expected: fields the bot just asked for; short bare replies ("0912345678",
+        "3", "Nam") are read as those fields
 
     Returns dict with keys:
       - customer_name, book_title, quantity, address, phone
     """
     raw = clean_text(text or "")
     raw_orig = raw
-    text_norm = _normalize_for_match(raw)
-
-    phone = _extract_phone(raw)
-    quantity = _extract_quantity(raw)
-    address = _extract_address(raw)
-    name = _extract_name(raw)
+    wanted = set(ORDER_FIELDS if fields is None else fields)
+    result = {field: None for field in ORDER_FIELDS}
+    result["raw"] = raw_orig
+
+    bare = _extract_bare_reply(raw, list(expected or ()), known_titles)
+    if bare:
+        result.update((k, v) for k, v in bare.items() if k in wanted)
+        return result
+
+    if "phone" in wanted:
+        result["phone"] = _extract_phone(raw)
+    if "quantity" in wanted:
+        result["quantity"] = _extract_quantity(raw)
+    if "address" in wanted:
+        result["address"] = _extract_address(raw)
+    if "customer_name" in wanted:
+        result["customer_name"] = _extract_name(raw)
+    if "book_title" in wanted:
+        result["book_title"] = _extract_title(raw, known_titles)
+    return result
+
+
+def _extract_title(raw: str, known_titles) -> Optional[str]:
+    text_norm = normalize_for_match(raw)
 
     # Try to get title via patterns
     title = _extract_title_by_patterns(raw, text_norm)
@@ -223,12 +415,12 @@ def extract_order_entities(text: str, known_titles: Optional[List[str]] = None)
         title = title.strip().strip('.,;:-"\'')
         # sometimes title captured only one word; attempt to expand around that word by extracting up to 4 words
         if len(title.split()) == 1:
-            tword = _normalize_for_match(title)
+            tword = normalize_for_match(title)
             # attempt to find a longer sequence in raw containing this word
-            m = re.search(r'([A-ZĐ][\w\'\-\.]+\s+[A-ZĐ][\w\'\-\.]+\s*[A-ZĐ]?[^\n,;]*)', raw)
+            m = _CAP_EXPAND_RE.search(raw)
             if m:
                 cand = clean_text(m.group(0))
-                if tword in _normalize_for_match(cand):
+                if tword in normalize_for_match(cand):
                     title = cand
 
     # Final fallback: known_titles fuzzy match on whole text
@@ -239,19 +431,11 @@ def extract_order_entities(text: str, known_titles: Optional[List[str]] = None)
 
     # Final cleanups: remove quantity words erroneously included
     if title:
-        title = re.sub(r'\b\d+\s*(?:cuốn|cuon|quyển|quyen|tập)\b', '', title, flags=re.IGNORECASE).strip()
-        title = re.sub(r'\b(số|sdt|địa chỉ|đ/c)\b.*$', '', title, flags=re.IGNORECASE).strip()
+        title = _TITLE_QTY_RE.sub('', title).strip()
+        title = _TITLE_TAIL_RE.sub('', title).strip()
         if title == "":
             title = None
-
-    return {
-        "customer_name": name,
-        "book_title": title,
-        "quantity": quantity,
-        "address": address,
-        "phone": phone,
-        "raw": raw_orig
-    }
+    return title
 
 if __name__ == "__main__":
     tests = [
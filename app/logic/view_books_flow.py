@@ -1,8 +1,28 @@
-from app.db.database import get_all_books
+from app import metrics
+from app.db.database import get_books_page, search_books
 
+# Số sách mỗi trang khi xem danh sách
+PAGE_SIZE = 10
+# Số kết quả tối đa cho mỗi lần tìm kiếm
+SEARCH_LIMIT = 10
+NEXT_PAGE_INPUTS = ("n", "tiếp", "tiep")
+
+SEARCH_HINT = (
+    "🔍 Nhập tên sách, tác giả hoặc thể loại (có dấu hay không dấu đều được) để tìm kiếm.\n"
+    "🏠 Bấm '0' để quay lại menu chính"
+)
+
+
+def _format_book(b):
+    return f"- {b['title']} (Tác giả: {b['author']}, Giá: {b['price']}₫, Còn: {b['stock']} quyển)"
+
+
+@metrics.timed("flow.view_books")
 def handle(user_input: str, session: dict):
     """
     Xử lý luồng xem danh sách sách khả dụng.
+    Lần đầu hiển thị trang đầu danh sách và chuyển sang chế độ "browse":
+    các lượt sau nhập 'n' để xem trang tiếp, còn lại coi là từ khóa tìm kiếm.
     Trả về tuple (reply, done) để đồng bộ với các flow khác.
     """
 
@@ -20,28 +40,45 @@ def handle(user_input: str, session: dict):
         session["state"] = "menu"
         return reply, True
 
+    if session.get("state") == "browse":
+        if user_input.strip().lower() in NEXT_PAGE_INPUTS:
+            if session.get("books_cursor"):
+                return _page(session["books_cursor"], session)
+            return f"✅ Đã hiển thị hết danh sách sách.\n\n{SEARCH_HINT}", False
+        return _search(user_input.strip(), session)
+
     # Nếu chưa có state hoặc user chọn xem danh sách
-    books = get_all_books()
-    if not books:
+    return _page(0, session)
+
+
+def _page(after_id: int, session: dict):
+    books, next_cursor = get_books_page(after_id, PAGE_SIZE)
+    if not books and not after_id:
         reply = (
             "😔 Hiện chưa có sách nào trong kho.\n"
             "👉 Nhấn '0' để quay lại menu chính."
         )
         return reply, False
 
-    # Hiển thị danh sách sách
-    book_list = "\n".join([
-        f"- {b['title']} (Tác giả: {b['author']}, Giá: {b['price']}₫, Còn: {b['stock']} quyển)"
-        for b in books
-    ])
-
-    reply = (
-        f"📚 Danh sách sách khả dụng:\n\n{book_list}\n\n"
-        "🏠 Quay lại menu chính:\n"
-        "- Bấm '0' để quay lại menu chính"
-    )
-
-    # Flow xem sách chỉ hiển thị 1 lần → có thể coi là kết thúc
-    session.clear()
-    session["state"] = "menu"
-    return reply, True
+    # Hiển thị một trang sách
+    book_list = "\n".join(_format_book(b) for b in books)
+    more = "➡️ Nhập 'n' để xem trang tiếp theo.\n" if next_cursor else ""
+    title = "📚 Danh sách sách khả dụng" if not after_id else "📚 Danh sách sách (tiếp)"
+
+    reply = f"{title}:\n\n{book_list}\n\n{more}{SEARCH_HINT}"
+
+    # Ở lại flow để nhận từ khóa tìm kiếm / lệnh xem trang tiếp
+    session["state"] = "browse"
+    session["books_cursor"] = next_cursor
+    return reply, False
+
+
+def _search(query: str, session: dict):
+    books = search_books(query, SEARCH_LIMIT)
+    if not books:
+        reply = f"😔 Không tìm thấy sách nào khớp với '{query}'.\n\n{SEARCH_HINT}"
+        return reply, False
+
+    book_list = "\n".join(_format_book(b) for b in books)
+    reply = f"🔍 Kết quả tìm kiếm cho '{query}':\n\n{book_list}\n\n{SEARCH_HINT}"
+    return reply, False
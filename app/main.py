@@ -1,17 +1,38 @@
+from dotenv import load_dotenv
+
+# Nạp .env trước khi import các module đọc biến môi trường lúc import (METRICS_ENABLED, LLM_*...)
+load_dotenv()
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from app import metrics
 from app.api.chat_router import router as chat_router
-from app.db.database import init_db
+from app.api.books_router import router as books_router
+from app.api.orders_router import router as orders_router
+from app.api.session_store import get_store
+from app.db.database import close_all_conns
 
 app = FastAPI(title="Bookstore Chatbot", version="1.0")
 
-# Khởi tạo DB
-@app.on_event("startup")
-def startup():
-    init_db()
+# DB (bảng, migration) được khởi tạo ở connection đầu tiên và danh mục sách được nạp
+# vào cache ở lần tra cứu đầu tiên, nên process nhận request ngay sau khi import xong
+
+@app.on_event("shutdown")
+def shutdown():
+    close_all_conns()
 
 # Router chính
 app.include_router(chat_router, prefix="/chat", tags=["Chatbot"])
+app.include_router(books_router, prefix="/books", tags=["Books"])
+app.include_router(orders_router, prefix="/orders", tags=["Orders"])
 
 @app.get("/")
 def root():
     return {"message": "Bookstore Chatbot API đang hoạt động 🚀"}
+
+# Số liệu cho Prometheus (bật thu thập bằng METRICS_ENABLED=1)
+metrics.register_gauges("sessions", lambda: get_store().stats())
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,212 @@
+"""
+Đo thời gian xử lý và bộ đếm cho từng tầng (flow, NLU, DB, LLM), xuất ra dạng
+text của Prometheus qua route /metrics.
+
+Bật bằng biến môi trường METRICS_ENABLED=1. Khi tắt, `timed` và `span` chỉ
+còn một phép kiểm tra cờ trước khi gọi thẳng hàm gốc, `inc` trả về ngay.
+
+    @metrics.timed("db.search_books")
+    def search_books(...): ...
+
+    with metrics.span("llm.upstream"):
+        ...
+
+    metrics.inc("llm_cache_lookups", result="hit")
+"""
+import functools
+import inspect
+import os
+import threading
+import time
+from bisect import bisect_left
+
+PREFIX = "bookstore"
+# Mốc histogram (giây), tương tự mốc mặc định của client Prometheus nhưng chi tiết hơn ở dải < 10ms
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = os.getenv("METRICS_ENABLED", "0").lower() in ("1", "true", "yes", "on")
+_lock = threading.Lock()
+# stage -> [số đếm theo bucket (không cộng dồn), tổng thời gian, số lần]
+_histograms = {}
+# (tên, nhãn đã sắp xếp) -> giá trị
+_counters = {}
+# tên nhóm -> hàm trả về dict {tên: giá trị số}
+_gauges = {}
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(value: bool):
+    global _enabled
+    _enabled = bool(value)
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def observe(stage: str, seconds: float):
+    if not _enabled:
+        return
+    i = bisect_left(BUCKETS, seconds)
+    with _lock:
+        h = _histograms.get(stage)
+        if h is None:
+            h = _histograms[stage] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        h[0][i] += 1
+        h[1] += seconds
+        h[2] += 1
+
+
+def inc(name: str, value: float = 1, **labels):
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, time.perf_counter() - self.start)
+        if exc_type is not None:
+            inc("stage_errors", stage=self.stage)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(stage: str):
+    """Context manager đo thời gian một khối lệnh."""
+    return _Span(stage) if _enabled else _NOOP_SPAN
+
+
+def timed(stage: str):
+    """Decorator đo thời gian mỗi lần gọi hàm (hỗ trợ cả hàm async)."""
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not _enabled:
+                    return await fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                except BaseException:
+                    inc("stage_errors", stage=stage)
+                    raise
+                finally:
+                    observe(stage, time.perf_counter() - start)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                inc("stage_errors", stage=stage)
+                raise
+            finally:
+                observe(stage, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def register_gauges(group: str, collect):
+    """Đăng ký hàm trả về dict số liệu tức thời (ví dụ thống kê cache), đọc lại mỗi lần render."""
+    _gauges[group] = collect
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _flatten(prefix: str, stats: dict, out: dict):
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            _flatten(name, value, out)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[name] = value
+
+
+def render() -> str:
+    """Xuất toàn bộ số liệu theo định dạng text của Prometheus (version 0.0.4)."""
+    with _lock:
+        histograms = {k: (list(v[0]), v[1], v[2]) for k, v in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = [
+        f"# HELP {PREFIX}_metrics_enabled 1 nếu đang thu thập số liệu (METRICS_ENABLED).",
+        f"# TYPE {PREFIX}_metrics_enabled gauge",
+        f"{PREFIX}_metrics_enabled {int(_enabled)}",
+    ]
+
+    name = f"{PREFIX}_stage_seconds"
+    lines += [f"# HELP {name} Thời gian xử lý theo tầng.", f"# TYPE {name} histogram"]
+    for stage in sorted(histograms):
+        buckets, total, count = histograms[stage]
+        cumulative = 0
+        for bound, n in zip(BUCKETS + (float("inf"),), buckets):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_labels((('stage', stage), ('le', le)))} {cumulative}")
+        lines.append(f"{name}_sum{_labels((('stage', stage),))} {total}")
+        lines.append(f"{name}_count{_labels((('stage', stage),))} {count}")
+
+    seen = set()
+    for (counter, labels), value in sorted(counters.items()):
+        full = f"{PREFIX}_{counter}_total"
+        if full not in seen:
+            seen.add(full)
+            lines.append(f"# TYPE {full} counter")
+        lines.append(f"{full}{_labels(labels)} {value}")
+
+    for group, collect in sorted(_gauges.items()):
+        values = {}
+        try:
+            _flatten(f"{PREFIX}_{group}", collect() or {}, values)
+        except Exception:
+            continue
+        for gauge, value in sorted(values.items()):
+            lines.append(f"# TYPE {gauge} gauge")
+            lines.append(f"{gauge} {value}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,82 @@
+"""Tiện ích dùng chung cho các script benchmark (chạy từ thư mục gốc repo)."""
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from app.db import database
+
+SAMPLE_BOOKS = [
+    ("Truyện Kiều", "Nguyễn Du", 45000, 20, "Văn học cổ điển"),
+    ("Dế Mèn Phiêu Lưu Ký", "Tô Hoài", 38000, 15, "Thiếu nhi"),
+    ("Harry Potter và Hòn đá Phù thủy", "J.K. Rowling", 95000, 10, "Fantasy"),
+    ("Đắc Nhân Tâm", "Dale Carnegie", 80000, 25, "Kỹ năng sống"),
+    ("Lập Trình Python Cơ Bản", "Nguyễn Văn A", 120000, 8, "Công nghệ thông tin"),
+]
+
+
+def use_temp_db(books=SAMPLE_BOOKS) -> Path:
+    """Trỏ app.db.database sang một file SQLite tạm đã init và seed sẵn."""
+    tmp_dir = Path(tempfile.mkdtemp(prefix="bookstore_bench_"))
+    database.close_all_conns()
+    database.DB_PATH = tmp_dir / "bookstore.db"
+    database.init_db()
+    conn = database.get_conn()
+    with conn:
+        conn.executemany(
+            "INSERT INTO Books (title, author, price, stock, category) VALUES (?, ?, ?, ?, ?)",
+            books,
+        )
+    # Ghi thẳng như công cụ ngoài: title_norm và chỉ mục FTS do app điền sau
+    database.repair_normalized()
+    return database.DB_PATH
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def time_per_call(fn, args_list, repeat: int = 5) -> float:
+    """Thời gian trung bình (giây) cho một lần gọi fn, lấy lần chạy nhanh nhất trong `repeat` lần."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for args in args_list:
+            fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best / max(1, len(args_list))
+
+
+def raw_connect() -> sqlite3.Connection:
+    """Connection kiểu cũ: mở mới mỗi lần gọi, không pragma."""
+    return sqlite3.connect(database.DB_PATH)
+
+
+def load_module_from_git(rev: str, path: str, name: str):
+    """Nạp một module ở revision `rev` (ví dụ bản trước khi tối ưu) để so sánh."""
+    import subprocess
+    import types
+
+    source = subprocess.run(
+        ["git", "show", f"{rev}:{path}"], check=True, capture_output=True, text=True
+    ).stdout
+    module = types.ModuleType(name)
+    module.__file__ = f"{rev}:{path}"
+    exec(compile(source, module.__file__, "exec"), module.__dict__)
+    return module
+
+
+def isolate_llm_files():
+    """Ghi cache/log của llm_client vào thư mục tạm thay vì app/cache, app/logs."""
+    from app.llm import llm_client
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix="bookstore_llm_"))
+    llm_client.CACHE_DIR = tmp_dir / "cache"
+    llm_client.CACHE_DIR.mkdir()
+    llm_client.LOG_FILE = tmp_dir / "llm_log.jsonl"
+    llm_client.set_cache(None)
+    return tmp_dir
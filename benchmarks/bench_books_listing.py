@@ -0,0 +1,63 @@
+"""
+So sánh cách liệt kê danh mục cũ (đọc hết Books, nối thành một chuỗi) với
+trang keyset và luồng NDJSON của GET /books/.
+
+    python -m benchmarks.bench_books_listing --books 100000
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from app.db import database
+from app.logic import view_books_flow
+from benchmarks._common import use_temp_db
+from benchmarks.bench_search import make_books
+
+
+def legacy_listing():
+    books = database.get_all_books()
+    return "\n".join(view_books_flow._format_book(b) for b in books)
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=100_000)
+    args = parser.parse_args()
+
+    use_temp_db(make_books(args.books))
+
+    reply, elapsed, peak = measure(legacy_listing)
+    print(f"  cũ (toàn bộ): {elapsed * 1e3:8.1f} ms  reply {len(reply.encode()) / 1e6:6.2f} MB  peak {peak / 1e6:6.1f} MB")
+
+    reply, elapsed, peak = measure(lambda: view_books_flow.handle("2", {})[0])
+    print(f"  trang đầu:    {elapsed * 1e3:8.1f} ms  reply {len(reply.encode()) / 1e3:6.2f} KB  peak {peak / 1e6:6.3f} MB")
+
+    def stream():
+        lines = (json.dumps(b, ensure_ascii=False) + "\n" for b in database.iter_books())
+        start = time.perf_counter()
+        next(lines)
+        first = time.perf_counter() - start
+        total = sum(1 for _ in lines) + 1
+        return first, total
+
+    (first, total), elapsed, peak = measure(stream)
+    print(
+        f"  NDJSON:       dòng đầu sau {first * 1e3:.2f} ms, {total} sách trong {elapsed * 1e3:.1f} ms"
+        f"  peak {peak / 1e6:6.3f} MB"
+    )
+    database.close_all_conns()
+
+
+if __name__ == "__main__":
+    main()
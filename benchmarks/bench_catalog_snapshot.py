@@ -0,0 +1,94 @@
+"""
+Chi phí khởi động danh mục của một worker: nạp bảng Books vào bộ nhớ rồi dựng
+TitleIndex (CATALOG_SNAPSHOT=0) so với mở snapshot mmap đã dựng sẵn. Đo thời gian
+tới lúc TitleIndex sẵn sàng, bộ nhớ Python giữ lại (tracemalloc) và thời gian
+mỗi lần match/find_by_title. Kết quả của hai cách phải trùng khớp.
+
+    python -m benchmarks.bench_catalog_snapshot --sizes 1000 10000 100000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from app.db import catalog_cache, catalog_snapshot
+from benchmarks._common import time_per_call, use_temp_db
+from benchmarks.bench_title_index import make_messages, make_titles
+
+
+def _reset(snapshot: bool):
+    catalog_snapshot.ENABLED = snapshot
+    catalog_cache._catalog = dict(catalog_cache._catalog, version=None, books=[], by_title={}, title_index=None, snapshot=None)
+    gc.collect()
+
+
+def _ready():
+    catalog_cache.refresh(force=True)
+    catalog_cache.title_index()
+
+
+def warm_up(snapshot: bool):
+    """(giây, byte giữ lại) để có danh mục và TitleIndex của nó trong process này."""
+    _reset(snapshot)
+    start = time.perf_counter()
+    _ready()
+    elapsed = time.perf_counter() - start
+    # Lượt thứ hai để đo bộ nhớ: tracemalloc làm chậm đáng kể nên không tính giờ
+    _reset(snapshot)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    _ready()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return elapsed, retained
+
+
+def lookups(messages, titles):
+    index = catalog_cache.title_index()
+    return (
+        [index.match(m) for m in messages],
+        [catalog_cache.find_by_title(t) for t in titles],
+    )
+
+
+def per_call(messages, titles) -> dict:
+    index = catalog_cache.title_index()
+    return {
+        "match": time_per_call(index.match, [(m,) for m in messages]),
+        "find_by_title": time_per_call(catalog_cache.find_by_title, [(t,) for t in titles]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--lookups", type=int, default=500, help="số lần match/find_by_title mỗi cỡ")
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        titles = make_titles(n)
+        use_temp_db([(t, f"Tác giả {i % 97}", 50000 + i, i % 30, "Thể loại") for i, t in enumerate(titles)])
+        start = time.perf_counter()
+        target = catalog_snapshot.build()
+        build = time.perf_counter() - start
+
+        messages = make_messages(titles, args.lookups)
+        sample = titles[::max(1, n // args.lookups)]
+
+        results = {}
+        for label, snapshot in (("nạp vào bộ nhớ", False), ("snapshot mmap", True)):
+            elapsed, retained = warm_up(snapshot)
+            assert (catalog_cache._catalog["snapshot"] is not None) == snapshot
+            results[label] = lookups(messages, sample)
+            calls = per_call(messages, sample)
+            print(
+                f"{n:>7} sách | {label:>14}: sẵn sàng {elapsed * 1e3:8.1f} ms, giữ {retained / 2**20:7.2f} MiB"
+                f" | match {calls['match'] * 1e6:6.1f} µs, find_by_title {calls['find_by_title'] * 1e6:5.1f} µs"
+            )
+        assert results["nạp vào bộ nhớ"] == results["snapshot mmap"], "snapshot trả kết quả khác cách nạp cũ"
+        print(f"{n:>7} sách | dựng snapshot {build * 1e3:.0f} ms, file {target.stat().st_size / 2**20:.2f} MiB")
+    print("✔ match/find_by_title trùng khớp giữa hai cách")
+
+
+if __name__ == "__main__":
+    main()
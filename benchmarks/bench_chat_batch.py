@@ -0,0 +1,93 @@
+"""
+So sánh gửi một đợt tin nhắn từ webhook relay theo hai cách: mỗi tin nhắn một
+POST /chat/ (các session gửi đồng thời, trong session gửi tuần tự) và một
+POST /chat/batch duy nhất. Chạy trong process qua httpx + ASGITransport.
+
+    python -m benchmarks.bench_chat_batch --sessions 100 --turns 3
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from benchmarks._common import SAMPLE_BOOKS, isolate_llm_files, use_temp_db
+from benchmarks.fake_genai import FakeGenaiClient
+from benchmarks.order_corpus import ADDRESSES
+
+
+def burst(sessions: int, turns: int, rnd: random.Random):
+    """Danh sách (session_id, tin nhắn) theo thứ tự đến; các session xen kẽ nhau."""
+    scripts = []
+    for s in range(sessions):
+        title = rnd.choice(SAMPLE_BOOKS)[0]
+        script = [
+            f"tìm sách {rnd.choice(['harry', 'kieu', 'python', 'thieu nhi'])}",
+            "0",
+            f"Tôi muốn mua 1 cuốn {title} giao cho Nam tại {rnd.choice(ADDRESSES)}, SĐT 09{rnd.randrange(10 ** 8):08d}",
+        ]
+        scripts.append([(f"s{s}", script[t % len(script)]) for t in range(turns)])
+    return [msg for turn in zip(*scripts) for msg in turn]
+
+
+async def send_single(client, messages):
+    by_session = {}
+    for session_id, text in messages:
+        by_session.setdefault(session_id, []).append(text)
+
+    async def run_session(session_id, texts):
+        for text in texts:
+            r = await client.post("/chat/", json={"session_id": session_id, "user_input": text})
+            r.raise_for_status()
+
+    await asyncio.gather(*(run_session(s, t) for s, t in by_session.items()))
+
+
+async def send_batch(client, messages):
+    payload = {"messages": [{"session_id": s, "user_input": t} for s, t in messages]}
+    r = await client.post("/chat/batch", json=payload)
+    r.raise_for_status()
+    assert len(r.json()["replies"]) == len(messages)
+
+
+async def run(args):
+    from app.api import session_store
+    from app.db import catalog_cache
+    from app.llm import llm_client
+    from app.main import app
+
+    use_temp_db([(t, a, p, 10 ** 9, c) for t, a, p, _, c in SAMPLE_BOOKS])
+    catalog_cache.refresh(force=True)
+    isolate_llm_files()
+    llm_client.client = FakeGenaiClient(args.latency)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for label, send in (("POST /chat/ từng tin", send_single), ("POST /chat/batch", send_batch)):
+            best = float("inf")
+            for r in range(args.repeat):
+                session_store.set_store(None)
+                messages = burst(args.sessions, args.turns, random.Random(r))
+                start = time.perf_counter()
+                await send(client, messages)
+                best = min(best, time.perf_counter() - start)
+            n = args.sessions * args.turns
+            print(
+                f"{label:>22}: {best * 1e3:8.1f} ms cho {n} tin nhắn "
+                f"({n / best:7.0f} tin/s)"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=60)
+    parser.add_argument("--turns", type=int, default=3, help="số tin nhắn mỗi session trong đợt (tối đa 200 tin/batch)")
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
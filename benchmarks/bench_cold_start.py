@@ -0,0 +1,138 @@
+"""
+Đo thời gian khởi động nguội của API: (1) `python -X importtime -c "import app.main"`
+tách theo module, (2) thời gian từ lúc spawn `uvicorn app.main:app` tới khi request
+đầu tiên (GET /books/, rồi POST /chat/ "1") trả 200. Mỗi lần chạy dùng một thư mục
+làm việc tạm nên DB được tạo mới, giống một container vừa scale lên.
+
+    python -m benchmarks.bench_cold_start --runs 5
+    python -m benchmarks.bench_cold_start --baseline HEAD~1   # so với một commit cũ
+
+Biến GEMINI_API_KEY được đặt giá trị giả nếu chưa có (bản cũ đòi key ngay lúc import);
+không có lời gọi Gemini nào trong phép đo.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks._common import percentile
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _env(source: Path) -> dict:
+    env = dict(os.environ, PYTHONPATH=str(source))
+    env.setdefault("GEMINI_API_KEY", "bench-cold-start")
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_breakdown(source: Path, top: int):
+    """(tổng µs, [(µs tích lũy, module)]) của `import app.main`, chạy trong process mới."""
+    workdir = tempfile.mkdtemp(prefix="bookstore_cold_")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=workdir, env=_env(source), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    # importtime in module con trước module cha, thụt lề sâu hơn cha 2 ký tự
+    main_at = next(i for i, (_, name) in enumerate(rows) if name.strip() == "app.main")
+    main_indent = _indent(rows[main_at][1])
+    children = []
+    for cumulative, name in reversed(rows[:main_at]):
+        if _indent(name) <= main_indent:
+            break
+        if _indent(name) == main_indent + 2:
+            children.append((cumulative, name.strip()))
+    return rows[main_at][0], sorted(children, reverse=True)[:top]
+
+
+def _indent(name: str) -> int:
+    return len(name) - len(name.lstrip())
+
+
+def first_response(source: Path, timeout: float) -> tuple:
+    """(giây tới GET /books/ đầu tiên, giây tới POST /chat/ đầu tiên) tính từ lúc spawn uvicorn."""
+    workdir = Path(tempfile.mkdtemp(prefix="bookstore_cold_"))
+    (workdir / "app" / "db").mkdir(parents=True)
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=_env(source), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        with httpx.Client(timeout=5) as client:
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"uvicorn thoát sớm với mã {proc.returncode}")
+                if time.perf_counter() - start > timeout:
+                    raise TimeoutError("không nhận được phản hồi đầu tiên")
+                try:
+                    client.get(f"{base}/books/", params={"limit": 1}).raise_for_status()
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.005)
+            books = time.perf_counter() - start
+            client.post(f"{base}/chat/", json={"user_input": "1"}).raise_for_status()
+            chat = time.perf_counter() - start
+        return books, chat
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def checkout(rev: str) -> Path:
+    """Giải nén cây mã nguồn của `rev` ra một thư mục tạm (git archive, không đụng working tree)."""
+    target = Path(tempfile.mkdtemp(prefix="bookstore_rev_"))
+    archive = subprocess.run(["git", "archive", rev], cwd=REPO_ROOT, capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", str(target)], input=archive, check=True)
+    return target
+
+
+def measure(label: str, source: Path, args):
+    total, modules = import_breakdown(source, args.top)
+    print(f"[{label}] import app.main: {total / 1e3:.1f} ms")
+    for cumulative, name in modules:
+        print(f"    {cumulative / 1e3:8.1f} ms  {name}")
+    runs = [first_response(source, args.timeout) for _ in range(args.runs)]
+    books = [b for b, _ in runs]
+    chats = [c for _, c in runs]
+    print(
+        f"[{label}] spawn -> GET /books/ 200: p50 {percentile(books, 50) * 1e3:.0f} ms, "
+        f"max {max(books) * 1e3:.0f} ms | -> POST /chat/ 200: p50 {percentile(chats, 50) * 1e3:.0f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="số lần spawn uvicorn")
+    parser.add_argument("--top", type=int, default=8, help="số module nặng nhất in ra")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--baseline", help="commit/branch để so sánh (git archive ra thư mục tạm)")
+    args = parser.parse_args()
+
+    if args.baseline:
+        measure(args.baseline, checkout(args.baseline), args)
+    measure("working tree", REPO_ROOT, args)
+
+
+if __name__ == "__main__":
+    main()
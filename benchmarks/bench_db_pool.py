@@ -0,0 +1,108 @@
+"""
+So sánh throughput (requests/sec) giữa lớp DB cũ (connect/close mỗi lần gọi,
+rollback journal) và pool connection theo thread với WAL.
+
+    python -m benchmarks.bench_db_pool --threads 8 --seconds 5 --write-ratio 0.2
+"""
+import argparse
+import random
+import sqlite3
+import threading
+import time
+
+from app.db import database
+from benchmarks._common import SAMPLE_BOOKS, raw_connect, use_temp_db
+
+
+# --- Hành vi cũ: mỗi hàm tự mở và đóng connection ---------------------------
+
+def legacy_find_book_by_title(title):
+    conn = raw_connect()
+    row = conn.execute("SELECT * FROM Books WHERE lower(title)=lower(?)", (title,)).fetchone()
+    conn.close()
+    return row
+
+
+def legacy_get_all_books():
+    conn = raw_connect()
+    rows = conn.execute("SELECT * FROM Books").fetchall()
+    conn.close()
+    return rows
+
+
+def legacy_add_order(name, phone, address, book_id, quantity):
+    conn = raw_connect()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO Orders (customer_name, phone, address, book_id, quantity, status) VALUES (?, ?, ?, ?, ?, ?)",
+        (name, phone, address, book_id, quantity, "Đang xử lý"),
+    )
+    conn.commit()
+    cur.execute("SELECT * FROM Orders WHERE order_id = ?", (cur.lastrowid,))
+    row = cur.fetchone()
+    conn.close()
+    return row
+
+
+LEGACY = (legacy_get_all_books, legacy_find_book_by_title, legacy_add_order)
+POOLED = (database.get_all_books, database.find_book_by_title, database.add_order)
+
+
+def run(impl, threads: int, seconds: float, write_ratio: float):
+    get_all, find_title, add_order = impl
+    titles = [b[0] for b in SAMPLE_BOOKS]
+    counts = [0] * threads
+    errors = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def worker(i):
+        rnd = random.Random(i)
+        while time.perf_counter() < deadline:
+            try:
+                r = rnd.random()
+                if r < write_ratio:
+                    add_order(f"Khách {i}", "0912345678", "Hà Nội", rnd.randint(1, len(titles)), 1)
+                elif r < write_ratio + (1 - write_ratio) / 2:
+                    find_title(rnd.choice(titles))
+                else:
+                    get_all()
+                counts[i] += 1
+            except sqlite3.OperationalError:
+                errors[i] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return sum(counts) / elapsed, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = {}
+    for name, impl, wal in (("legacy", LEGACY, False), ("pooled", POOLED, True)):
+        path = use_temp_db()
+        if not wal:
+            # DB cũ chưa bật WAL: đưa file tạm về rollback journal mặc định
+            database.close_all_conns()
+            conn = sqlite3.connect(path)
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.close()
+        rps, errors = run(impl, args.threads, args.seconds, args.write_ratio)
+        database.close_all_conns()
+        results[name] = rps
+        print(f"{name:>7}: {rps:10.1f} req/s  ({errors} lỗi 'database is locked')")
+
+    print(f"speedup: x{results['pooled'] / max(results['legacy'], 1e-9):.2f}")
+
+
+if __name__ == "__main__":
+    main()
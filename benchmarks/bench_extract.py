@@ -0,0 +1,83 @@
+"""
+Micro-benchmark cho extract_order_entities trên tập câu đặt hàng tiếng Việt.
+
+Kiểm tra kết quả của các câu trong khối __main__ của app/logic/utils.py không
+đổi, và (nếu truyền --baseline) so sánh kết quả + độ trễ với một revision cũ:
+
+    python -m benchmarks.bench_extract --baseline <git-rev>
+
+Phần cuối đo các lượt bổ sung thông tin: trích toàn bộ trường (cách cũ) so với
+chỉ trích các trường còn thiếu (fields/expected), kèm số trường đã có bị ghi đè.
+"""
+import argparse
+
+from app.logic import utils
+from benchmarks._common import load_module_from_git, time_per_call
+from benchmarks.order_corpus import MAIN_CASES, MAIN_KNOWN_TITLES, build_corpus, build_followup_corpus
+
+# Kết quả mong đợi cho MAIN_CASES (giữ nguyên hành vi hiện tại của extractor)
+EXPECTED_MAIN = [
+    {'customer_name': 'Quang', 'book_title': 'Truyện Kiều', 'quantity': 2, 'address': 'Quang tại Hà Nội', 'phone': '0123456789'},
+    {'customer_name': 'Huy', 'book_title': 'Đắc Nhân Tâm, tên Huy', 'quantity': 5, 'address': 'số 1 Yên Hòa - Cầu Giấy', 'phone': '0987654321'},
+    {'customer_name': 'Lan', 'book_title': 'Harry Potter và Hòn đá Phù thủy', 'quantity': 1, 'address': '23 ngõ 5 đường ABC', 'phone': '0901234567'},
+    {'customer_name': None, 'book_title': 'XYZ. SĐT', 'quantity': 3, 'address': '7 phố XYZ. SĐT 0912345678', 'phone': '0912345678'},
+    {'customer_name': 'Hà Nội', 'book_title': 'Dế Mèn phiêu lưu ký, tên: An, 01234567890', 'quantity': 2, 'address': 'Hà Nội', 'phone': '01234567890'},
+    {'customer_name': 'Huy', 'book_title': 'quyền Đắc Nhân Tâm. Tên Huy', 'quantity': 5, 'address': 'số 1 Yên Hoà', 'phone': '0123456789'},
+]
+
+
+def check_main_cases(extract):
+    for text, expected in zip(MAIN_CASES, EXPECTED_MAIN):
+        got = extract(text, known_titles=MAIN_KNOWN_TITLES)
+        got = {k: got[k] for k in expected}
+        assert got == expected, f"{text!r}: {got} != {expected}"
+
+
+def bench_followups(size: int):
+    corpus = build_followup_corpus(size)
+    full = time_per_call(
+        utils.extract_order_entities, [(t, MAIN_KNOWN_TITLES) for t, _ in corpus]
+    )
+    slot = time_per_call(
+        lambda t, missing: utils.extract_order_entities(t, MAIN_KNOWN_TITLES, fields=missing, expected=missing),
+        corpus,
+    )
+    # Trường không nằm trong danh sách còn thiếu = đã điền; trích toàn bộ sẽ ghi đè nếu bắt được giá trị
+    overwrites = sum(
+        1
+        for t, missing in corpus
+        for field, value in utils.extract_order_entities(t, MAIN_KNOWN_TITLES).items()
+        if field in utils.ORDER_FIELDS and field not in missing and value
+    )
+    print(f"lượt bổ sung, trích toàn bộ : {full * 1e6:8.1f} µs/câu, {overwrites} lần ghi đè trường đã có")
+    print(f"lượt bổ sung, chỉ trường thiếu: {slot * 1e6:8.1f} µs/câu (x{full / slot:.2f}), 0 lần ghi đè")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", help="git revision để so sánh (ví dụ HEAD~1)")
+    parser.add_argument("--size", type=int, default=2000)
+    args = parser.parse_args()
+
+    check_main_cases(utils.extract_order_entities)
+    print(f"✔ {len(MAIN_CASES)} câu __main__ cho kết quả không đổi")
+
+    corpus = build_corpus(args.size)
+    calls = [(t, MAIN_KNOWN_TITLES) for t in corpus]
+    current = time_per_call(utils.extract_order_entities, calls)
+    print(f"current : {current * 1e6:8.1f} µs/câu")
+
+    bench_followups(args.size)
+
+    if args.baseline:
+        legacy = load_module_from_git(args.baseline, "app/logic/utils.py", "legacy_utils")
+        mismatches = [t for t in corpus if legacy.extract_order_entities(t, MAIN_KNOWN_TITLES) != utils.extract_order_entities(t, MAIN_KNOWN_TITLES)]
+        print(f"✔ corpus {len(corpus)} câu: {len(mismatches)} kết quả khác baseline")
+        for t in mismatches[:5]:
+            print("  ≠", t)
+        baseline = time_per_call(legacy.extract_order_entities, calls)
+        print(f"baseline: {baseline * 1e6:8.1f} µs/câu  (x{baseline / current:.2f})")
+
+
+if __name__ == "__main__":
+    main()
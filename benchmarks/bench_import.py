@@ -0,0 +1,77 @@
+"""
+Benchmark nhập danh mục lớn: importer (lô executemany, một transaction,
+index/trigger/FTS dựng lại ở cuối) so với chèn từng dòng rồi commit như
+seed_data cũ (đo trên một mẫu nhỏ rồi ngoại suy).
+
+    python -m benchmarks.bench_import --rows 1000000 --legacy-sample 2000
+"""
+import argparse
+import csv
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from app.db import database, importer
+from benchmarks._common import use_temp_db
+from benchmarks.bench_search import AUTHORS, CATEGORIES
+from benchmarks.bench_title_index import SYLLABLES
+
+
+def write_feed(path: Path, rows: int, seed: int = 1):
+    rnd = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["sku", "title", "author", "price", "stock", "category"])
+        for i in range(rows):
+            title = " ".join(rnd.sample(SYLLABLES, rnd.randint(2, 5))).title()
+            writer.writerow([
+                f"SKU{i:08d}", title, rnd.choice(AUTHORS), rnd.randrange(20, 300) * 1000,
+                rnd.randint(0, 50), rnd.choice(CATEGORIES),
+            ])
+
+
+def legacy_insert(path: Path, limit: int) -> float:
+    # Cách cũ: mỗi dòng một INSERT + commit, mọi trigger chạy theo từng dòng
+    use_temp_db(books=[])
+    conn = database.get_conn()
+    start = time.perf_counter()
+    for line_no, row in importer.read_feed(path):
+        if line_no - 1 > limit:
+            break
+        conn.execute(
+            "INSERT INTO Books (title, author, price, stock, category) VALUES (?, ?, ?, ?, ?)",
+            (row["title"], row["author"], int(row["price"]), int(row["stock"]), row["category"]),
+        )
+        conn.commit()
+    return (time.perf_counter() - start) / limit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--legacy-sample", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=importer.DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    feed = Path(tempfile.mkdtemp(prefix="bookstore_feed_")) / "feed.csv"
+    start = time.perf_counter()
+    write_feed(feed, args.rows)
+    print(f"tạo feed {args.rows} dòng ({feed.stat().st_size / 1e6:.0f} MB): {time.perf_counter() - start:.1f}s")
+
+    per_row = legacy_insert(feed, min(args.legacy_sample, args.rows))
+    print(f"từng dòng: {per_row * 1e3:.3f} ms/dòng → ước tính {per_row * args.rows:.0f}s cho {args.rows} dòng")
+
+    use_temp_db(books=[])
+    report = importer.import_file(feed, chunk_size=args.chunk_size, log=None)
+    print(importer.format_report(report))
+
+    # Nhập lại cùng feed: toàn bộ đi nhánh UPDATE của upsert
+    report = importer.import_file(feed, chunk_size=args.chunk_size, log=None)
+    print("nhập lại (upsert):")
+    print(importer.format_report(report))
+    database.close_all_conns()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+So sánh llm_generate (chặn thread) với allm_generate (async) khi upstream chậm.
+
+`--users` người dùng cùng lúc gửi prompt chưa có trong cache tới một Gemini giả có
+độ trễ `--latency`, trong khi `--quick` request khác (xem sách, tra đơn: chỉ cần
+~1ms trên threadpool) tới cùng lúc. Bản sync chiếm thread của threadpool trong
+suốt lời gọi LLM nên request nhanh phải xếp hàng; bản async thì không.
+
+    python -m benchmarks.bench_llm_async --users 200 --latency 0.5 --error-rate 0.1
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.llm import llm_client
+from benchmarks._common import isolate_llm_files, percentile
+from benchmarks.fake_genai import FakeGenaiClient
+
+
+def quick_task(submitted: float) -> float:
+    time.sleep(0.001)
+    return time.perf_counter() - submitted
+
+
+async def scenario(use_async: bool, args):
+    loop = asyncio.get_running_loop()
+    pool = ThreadPoolExecutor(max_workers=args.threads)
+    prompts = [f"Câu hỏi số {i}" for i in range(args.users)]
+
+    start = time.perf_counter()
+    if use_async:
+        llm_calls = [llm_client.allm_generate(p, use_cache=False) for p in prompts]
+    else:
+        llm_calls = [
+            loop.run_in_executor(pool, lambda p=p: llm_client.llm_generate(p, use_cache=False))
+            for p in prompts
+        ]
+    llm_task = asyncio.gather(*llm_calls)
+    await asyncio.sleep(0.01)
+    quick = await asyncio.gather(*(
+        loop.run_in_executor(pool, quick_task, time.perf_counter()) for _ in range(args.quick)
+    ))
+    await llm_task
+    elapsed = time.perf_counter() - start
+    pool.shutdown()
+    return elapsed, quick
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--quick", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--threads", type=int, default=40, help="cỡ threadpool của FastAPI/anyio")
+    args = parser.parse_args()
+
+    isolate_llm_files()
+    llm_client.BACKOFF_BASE = 0.05
+    for name, use_async in (("sync ", False), ("async", True)):
+        llm_client.client = FakeGenaiClient(args.latency, error_rate=args.error_rate)
+        elapsed, quick = asyncio.run(scenario(use_async, args))
+        print(
+            f"{name}: LLM xong sau {elapsed:6.2f}s | request nhanh p50 {percentile(quick, 50) * 1e3:8.1f} ms"
+            f" p95 {percentile(quick, 95) * 1e3:8.1f} ms"
+        )
+    print(f"(async giới hạn {llm_client.MAX_CONCURRENCY} lời gọi Gemini đồng thời, LLM_MAX_CONCURRENCY)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Gộp lời gọi LLM trùng prompt (single-flight): `--users` người dùng cùng lúc hỏi
+một trong `--prompts` prompt chưa có trong cache (như câu hỏi lại thiếu thông tin
+của order_flow). Đếm số lời gọi tới Gemini giả khi có và không có gộp.
+
+    python -m benchmarks.bench_llm_coalesce --users 200 --prompts 5 --latency 0.3
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.llm import llm_client
+from benchmarks._common import isolate_llm_files
+from benchmarks.fake_genai import FakeGenaiClient
+
+
+async def no_coalesce(prompt: str) -> str:
+    # Hành vi trước đây: mỗi request trượt cache tự gọi Gemini
+    cached = llm_client._cache_read(prompt)
+    if cached:
+        return cached
+    return await llm_client._agenerate(prompt, 0.4, 3, llm_client.REQUEST_TIMEOUT, "miss")
+
+
+async def run_async(generate, prompts, users):
+    start = time.perf_counter()
+    await asyncio.gather(*(generate(prompts[i % len(prompts)]) for i in range(users)))
+    return time.perf_counter() - start
+
+
+def run_threads(prompts, users, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda i: llm_client.llm_generate(prompts[i % len(prompts)]), range(users)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--prompts", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--threads", type=int, default=40)
+    args = parser.parse_args()
+
+    scenarios = (
+        ("async, không gộp", lambda p: asyncio.run(run_async(no_coalesce, p, args.users))),
+        ("async, gộp", lambda p: asyncio.run(run_async(llm_client.allm_generate, p, args.users))),
+        ("sync threads, gộp", lambda p: run_threads(p, args.users, args.threads)),
+    )
+    for n, (label, run) in enumerate(scenarios):
+        isolate_llm_files()
+        fake = llm_client.client = FakeGenaiClient(latency=args.latency)
+        before = llm_client._coalesced
+        prompts = [f"Người dùng (lượt {n}) còn thiếu trường số {i}. Hãy hỏi lại." for i in range(args.prompts)]
+        elapsed = run(prompts)
+        print(
+            f"{label:>18}: {fake.calls:4d} lời gọi Gemini cho {args.users} request, "
+            f"gộp {llm_client._coalesced - before:4d}, {elapsed:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
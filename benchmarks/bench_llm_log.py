@@ -0,0 +1,83 @@
+"""
+Độ trễ mỗi lần ghi log của llm_client: cách cũ (mở file, append, đóng trong
+luồng xử lý request) so với LogWriter (đưa vào hàng đợi, thread nền ghi theo lô).
+
+    python -m benchmarks.bench_llm_log --threads 8 --writes 5000
+"""
+import argparse
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from app.llm.log_writer import LogWriter
+from benchmarks._common import percentile
+
+PROMPT = "Người dùng còn thiếu tên của bạn, địa chỉ giao hàng. Hãy hỏi người dùng cung cấp những thông tin này."
+RESPONSE = "Bạn vui lòng cho mình xin tên và địa chỉ giao hàng nhé! " * 5
+
+
+def legacy_log(path: Path, content: str):
+    with path.open("a", encoding="utf-8") as f:
+        f.write(f"[{datetime.now().isoformat()}]\n{content}\n{'-' * 60}\n")
+
+
+def run(write, threads: int, writes: int):
+    samples = [[] for _ in range(threads)]
+
+    def worker(i):
+        out = samples[i]
+        for j in range(writes):
+            start = time.perf_counter()
+            write(i, j)
+            out.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    flat = [s for per in samples for s in per]
+    return flat, elapsed
+
+
+def report(label, samples, elapsed):
+    print(
+        f"{label:>10}: p50 {percentile(samples, 50) * 1e6:7.1f} µs  p99 {percentile(samples, 99) * 1e6:8.1f} µs  "
+        f"max {max(samples) * 1e3:6.2f} ms  tổng {elapsed:5.2f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--writes", type=int, default=5000)
+    args = parser.parse_args()
+    tmp = Path(tempfile.mkdtemp(prefix="bookstore_log_"))
+
+    legacy_path = tmp / "llm_log.txt"
+    samples, elapsed = run(
+        lambda i, j: legacy_log(legacy_path, f"[SUCCESS attempt 1] {PROMPT[:120]}...\n{RESPONSE[:500]}"),
+        args.threads, args.writes,
+    )
+    report("cũ", samples, elapsed)
+
+    writer = LogWriter(tmp / "llm_log.jsonl", queue_size=args.threads * args.writes)
+    samples, elapsed = run(
+        lambda i, j: writer.write({
+            "ts": datetime.now().isoformat(timespec="milliseconds"), "event": "success",
+            "prompt": PROMPT[:120], "attempt": 1, "latency_ms": 12.3, "cache": "miss", "response": RESPONSE[:500],
+        }),
+        args.threads, args.writes,
+    )
+    report("LogWriter", samples, elapsed)
+    start = time.perf_counter()
+    writer.close()
+    print(f"  ghi nốt hàng đợi: {time.perf_counter() - start:.2f}s, {writer.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+So sánh thời gian người dùng chờ chữ đầu tiên giữa allm_generate (chờ trọn câu)
+và allm_generate_stream (đoạn đầu đến ngay khi Gemini trả), với Gemini giả có
+độ trễ chunk đầu `--latency` và `--chunk-delay` giữa các từ. Sau khi stream xong,
+câu trả lời ghép đủ phải có trong cache.
+
+    python -m benchmarks.bench_llm_stream --requests 8 --latency 0.4 --chunk-delay 0.03
+
+Vượt quá LLM_MAX_CONCURRENCY request đồng thời thì thời gian xếp hàng chờ
+semaphore cũng tính vào thời gian chờ chữ đầu.
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks._common import isolate_llm_files, percentile
+from benchmarks.fake_genai import FakeGenaiClient
+
+
+async def measure_blocking(llm_client, prompts):
+    async def one(prompt):
+        start = time.perf_counter()
+        await llm_client.allm_generate(prompt, use_cache=False)
+        elapsed = time.perf_counter() - start
+        return elapsed, elapsed
+
+    return await asyncio.gather(*(one(p) for p in prompts))
+
+
+async def measure_stream(llm_client, prompts):
+    async def one(prompt):
+        start = time.perf_counter()
+        first = None
+        async for _ in llm_client.allm_generate_stream(prompt):
+            if first is None:
+                first = time.perf_counter() - start
+        return first, time.perf_counter() - start
+
+    return await asyncio.gather(*(one(p) for p in prompts))
+
+
+def report(label, results):
+    firsts = [f for f, _ in results]
+    totals = [t for _, t in results]
+    print(
+        f"{label:>22}: chữ đầu p50 {percentile(firsts, 50) * 1e3:7.1f} ms, p95 {percentile(firsts, 95) * 1e3:7.1f} ms"
+        f" | trọn câu p50 {percentile(totals, 50) * 1e3:7.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.4, help="độ trễ tới chunk đầu (giây)")
+    parser.add_argument("--chunk-delay", type=float, default=0.03, help="độ trễ giữa các chunk (giây)")
+    args = parser.parse_args()
+
+    from app.llm import cache_store, llm_client
+
+    isolate_llm_files()
+    llm_client.set_cache(cache_store.from_env(Path(tempfile.mkdtemp(prefix="bookstore_stream_"))))
+    llm_client.client = FakeGenaiClient(args.latency, chunk_delay=args.chunk_delay)
+    # Nạp google.genai trước để cả hai lượt đo không tính thời gian import
+    llm_client._load_genai()
+    prompts = [
+        f"Người dùng còn thiếu số điện thoại và địa chỉ giao hàng, hãy hỏi lại thật lịch sự (yêu cầu {i})"
+        for i in range(args.requests)
+    ]
+
+    # Stream trước khi cache có gì; bản chặn chạy sau với use_cache=False
+    report("allm_generate_stream", asyncio.run(measure_stream(llm_client, prompts)))
+    cached = sum(1 for p in prompts if llm_client.get_cache().get(llm_client._hash_prompt(p)))
+    report("allm_generate", asyncio.run(measure_blocking(llm_client, prompts)))
+    print(f"✔ cache có câu trả lời ghép đủ cho {cached}/{len(prompts)} prompt sau khi stream")
+
+
+if __name__ == "__main__":
+    main()
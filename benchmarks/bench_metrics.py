@@ -0,0 +1,45 @@
+"""
+Chi phí của app.metrics trên mỗi lời gọi: hàm gốc, hàm bọc @timed khi tắt và khi bật.
+
+    python -m benchmarks.bench_metrics --calls 1000000
+"""
+import argparse
+import time
+
+from app import metrics
+
+
+def work(x):
+    return x + 1
+
+
+def per_call(fn, calls: int) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for i in range(calls):
+            fn(i)
+        best = min(best, time.perf_counter() - start)
+    return best / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    wrapped = metrics.timed("bench.work")(work)
+    base = per_call(work, args.calls)
+    metrics.set_enabled(False)
+    off = per_call(wrapped, args.calls)
+    metrics.set_enabled(True)
+    on = per_call(wrapped, args.calls)
+    metrics.set_enabled(False)
+
+    print(f"hàm gốc:       {base * 1e9:7.0f} ns/lần")
+    print(f"@timed (tắt):  {off * 1e9:7.0f} ns/lần  (+{(off - base) * 1e9:.0f} ns)")
+    print(f"@timed (bật):  {on * 1e9:7.0f} ns/lần  (+{(on - base) * 1e9:.0f} ns)")
+
+
+if __name__ == "__main__":
+    main()
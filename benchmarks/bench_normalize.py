@@ -0,0 +1,83 @@
+"""
+Thông lượng (ký tự/giây) của normalize_for_match / fold_for_search / strip_accents:
+cách cũ (NFD rồi duyệt từng ký tự gọi unicodedata.category), bảng str.translate
+không memo, và bản public có memo LRU. Dữ liệu: câu đặt hàng trong order_corpus
+(hầu như không lặp) và tên sách của một danh mục được chuẩn hóa nhiều lần (lặp lại
+như khi mỗi request so khớp tên sách). Kết quả phải trùng khớp với cách cũ.
+
+    python -m benchmarks.bench_normalize --size 5000
+    python -m benchmarks.bench_normalize --baseline <git-rev>   # cách cũ lấy từ revision đó
+"""
+import argparse
+import random
+import time
+
+from app.logic import utils
+from benchmarks._common import load_module_from_git
+from benchmarks.bench_title_index import make_titles
+from benchmarks.order_corpus import build_corpus
+
+
+def nfd_normalize(s):
+    # Cách làm trước khi có bảng translate (vẫn là nhánh dự phòng trong utils)
+    if not s:
+        return ""
+    s = utils._strip_accents_nfd(s.lower())
+    s = utils._NON_WORD_RE.sub(" ", s)
+    return utils._WS_RE.sub(" ", s).strip()
+
+
+def nfd_fold(s):
+    return nfd_normalize(s).replace("đ", "d")
+
+
+def chars_per_sec(fn, texts, repeat: int = 5, setup=None) -> float:
+    chars = sum(len(t) for t in texts)
+    best = float("inf")
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for t in texts:
+            fn(t)
+        best = min(best, time.perf_counter() - start)
+    return chars / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=5000, help="số câu đặt hàng")
+    parser.add_argument("--titles", type=int, default=2000, help="số tên sách trong danh mục")
+    parser.add_argument("--lookups", type=int, default=20000, help="số lần chuẩn hóa tên sách (có lặp)")
+    parser.add_argument("--baseline", help="git revision để lấy cách cũ thay cho nhánh NFD hiện tại")
+    args = parser.parse_args()
+
+    old = {"normalize_for_match": nfd_normalize, "fold_for_search": nfd_fold, "strip_accents": utils._strip_accents_nfd}
+    if args.baseline:
+        legacy = load_module_from_git(args.baseline, "app/logic/utils.py", "legacy_utils")
+        old = {name: getattr(legacy, "_" + name) for name in old}
+
+    messages = build_corpus(args.size)
+    titles = make_titles(args.titles)
+    rnd = random.Random(3)
+    lookups = [rnd.choice(titles) for _ in range(args.lookups)]
+
+    for name, old_fn in old.items():
+        new_fn = getattr(utils, name)
+        for text in messages + titles:
+            assert new_fn(text) == old_fn(text), f"{name}({text!r}): {new_fn(text)!r} != {old_fn(text)!r}"
+        print(name)
+        for corpus_label, texts in (("câu đặt hàng", messages), ("tên sách lặp lại", lookups)):
+            base = chars_per_sec(old_fn, texts)
+            table = chars_per_sec(new_fn.__wrapped__, texts)
+            # Memo rỗng ở đầu mỗi lượt: câu đặt hàng gần như chỉ trả giá miss, tên sách thì hit nhiều
+            memo = chars_per_sec(new_fn, texts, setup=new_fn.cache_clear)
+            print(
+                f"  {corpus_label:>16}: cũ {base / 1e6:6.2f} M ký tự/s | translate {table / 1e6:6.2f} M (x{table / base:.1f})"
+                f" | + memo {memo / 1e6:6.2f} M (x{memo / base:.1f})"
+            )
+    print("✔ kết quả trùng khớp với cách cũ")
+
+
+if __name__ == "__main__":
+    main()
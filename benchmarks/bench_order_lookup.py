@@ -0,0 +1,139 @@
+"""
+So sánh tra cứu đơn hàng theo tên khách trước và sau migration cột chuẩn hóa.
+
+"Trước" là schema chưa có migration: `WHERE lower(customer_name)=lower(?)`
+phải quét toàn bộ Orders. "Sau" là cùng file đó sau khi init_db() chạy
+migration (cột `customer_name_norm`, index phủ lịch sử đơn): trang đầu
+get_order_history (như luồng tra cứu trong chat) và đi hết mọi trang keyset.
+`--wholesale` thêm một khách sỉ có rất nhiều đơn vào đầu danh sách tra cứu.
+
+    python -m benchmarks.bench_order_lookup --orders 1000000 --lookups 200 --wholesale 20000
+"""
+import argparse
+import random
+import time
+
+from app.db import database
+from benchmarks._common import SAMPLE_BOOKS, percentile, use_temp_db
+
+FAMILY = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng", "Bùi", "Đỗ", "Hồ", "Ngô"]
+MIDDLE = ["Văn", "Thị", "Minh", "Hữu", "Đức", "Thanh", "Quốc", "Ngọc", "Xuân", "Gia"]
+GIVEN = [
+    "An", "Bình", "Châu", "Dũng", "Giang", "Hà", "Hải", "Hằng", "Hiếu", "Hòa", "Hùng", "Huy", "Khoa", "Lan",
+    "Linh", "Long", "Mai", "Minh", "Nam", "Nga", "Phúc", "Phương", "Quang", "Sơn", "Tâm", "Thảo", "Trang",
+    "Trung", "Tuấn", "Vy",
+]
+ALL_NAMES = [f"{f} {m} {g}" for f in FAMILY for m in MIDDLE for g in GIVEN]
+
+LEGACY_SELECT = """
+    SELECT o.order_id, o.quantity, o.status, b.title
+    FROM Orders o
+    JOIN Books b ON o.book_id = b.book_id
+    WHERE lower(o.customer_name)=lower(?)
+"""
+
+
+WHOLESALE_NAME = "Công ty Sách Bình Minh"
+
+
+def fill_orders(n: int, seed: int = 0, wholesale: int = 0):
+    rnd = random.Random(seed)
+    # Đơn của khách sỉ rải đều trong bảng, không nằm liền nhau
+    wholesale_every = n // wholesale if wholesale else 0
+    conn = database.get_conn()
+    batch = 50_000
+    with conn:
+        for start in range(0, n, batch):
+            conn.executemany(
+                "INSERT INTO Orders (customer_name, phone, address, book_id, quantity, status) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        WHOLESALE_NAME if wholesale_every and i % wholesale_every == 0 else rnd.choice(ALL_NAMES),
+                        f"09{rnd.randrange(10**8):08d}",
+                        "Hà Nội",
+                        rnd.randint(1, len(SAMPLE_BOOKS)),
+                        rnd.randint(1, 5),
+                        "Đang xử lý",
+                    )
+                    for i in range(start, min(n, start + batch))
+                ),
+            )
+
+
+def measure(fn, names):
+    samples = []
+    rows = 0
+    for name in names:
+        start = time.perf_counter()
+        rows += len(fn(name))
+        samples.append(time.perf_counter() - start)
+    return samples, rows
+
+
+def report(label, samples, rows):
+    print(
+        f"{label:>15}: p50 {percentile(samples, 50) * 1e3:8.2f} ms  "
+        f"p95 {percentile(samples, 95) * 1e3:8.2f} ms  ({rows} dòng)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--wholesale", type=int, default=20_000, help="số đơn của một khách sỉ (0 = không có)")
+    parser.add_argument("--page-size", type=int, default=20)
+    args = parser.parse_args()
+
+    # Dựng DB theo schema cũ: tạm bỏ migration (và bước điền cột *_norm) khi init
+    migrations, repair = database.MIGRATIONS, database.repair_normalized
+    database.MIGRATIONS, database.repair_normalized = (), lambda conn=None: 0
+    try:
+        use_temp_db()
+    finally:
+        database.MIGRATIONS, database.repair_normalized = migrations, repair
+
+    start = time.perf_counter()
+    fill_orders(args.orders, wholesale=args.wholesale)
+    print(f"nạp {args.orders} đơn: {time.perf_counter() - start:.1f}s")
+
+    rnd = random.Random(1)
+    names = [rnd.choice(ALL_NAMES) for _ in range(args.lookups)]
+    if args.wholesale:
+        names[: max(1, args.lookups // 20)] = [WHOLESALE_NAME] * max(1, args.lookups // 20)
+    conn = database.get_conn()
+    before, rows_before = measure(lambda n: conn.execute(LEGACY_SELECT, (n,)).fetchall(), names)
+    report("trước", before, rows_before)
+
+    start = time.perf_counter()
+    database.init_db()
+    print(f"migration (v{database.get_schema_version()}): {time.perf_counter() - start:.1f}s")
+
+    def first_page(name):
+        return database.get_order_history(customer_name=name, limit=args.page_size)[0]
+
+    def all_pages(name):
+        orders, cursor = database.get_order_history(customer_name=name, limit=args.page_size)
+        while cursor:
+            page, cursor = database.get_order_history(customer_name=name, before_id=cursor, limit=args.page_size)
+            orders += page
+        return orders
+
+    after, rows_after = measure(first_page, names)
+    report("sau, trang đầu", after, rows_after)
+    walk, rows_walk = measure(all_pages, names)
+    report("sau, mọi trang", walk, rows_walk)
+    assert rows_walk == rows_before, (rows_walk, rows_before)
+    print(f"speedup p50 trang đầu: x{percentile(before, 50) / max(percentile(after, 50), 1e-9):.1f}")
+    wholesale = [s for n, s in zip(names, before) if n == WHOLESALE_NAME]
+    if wholesale:
+        wholesale_after = [s for n, s in zip(names, after) if n == WHOLESALE_NAME]
+        print(
+            f"khách sỉ ({args.wholesale} đơn): trước p50 {percentile(wholesale, 50) * 1e3:.2f} ms, "
+            f"trang đầu p50 {percentile(wholesale_after, 50) * 1e3:.2f} ms"
+        )
+    database.close_all_conns()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark search_books (FTS5) so với cách nạp toàn bộ Books vào Python rồi lọc
+theo chuỗi con đã chuẩn hóa.
+
+    python -m benchmarks.bench_search --sizes 1000 100000
+"""
+import argparse
+import random
+import time
+
+from app.db import database
+from app.logic.utils import fold_for_search
+from benchmarks._common import time_per_call, use_temp_db
+from benchmarks.bench_title_index import make_titles
+
+AUTHORS = ["Nguyễn Du", "Tô Hoài", "Nam Cao", "Vũ Trọng Phụng", "Nguyễn Nhật Ánh", "Dale Carnegie"]
+CATEGORIES = ["Văn học", "Thiếu nhi", "Kỹ năng sống", "Công nghệ thông tin", "Fantasy"]
+
+
+def make_books(n: int, seed: int = 3):
+    rnd = random.Random(seed)
+    return [
+        (t, rnd.choice(AUTHORS), rnd.randrange(20, 300) * 1000, rnd.randint(0, 50), rnd.choice(CATEGORIES))
+        for t in make_titles(n)
+    ]
+
+
+def make_queries(books, count: int = 200, seed: int = 5):
+    rnd = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = fold_for_search(rnd.choice(books)[0]).split()
+        # Khách thường gõ không dấu, một phần tên sách
+        queries.append(" ".join(words[: rnd.randint(1, len(words))]))
+    return queries
+
+
+def scan_search(query: str, limit: int = 10):
+    # Cách "nạp hết vào Python": đọc toàn bộ Books rồi lọc tuần tự
+    q = fold_for_search(query)
+    hits = []
+    for b in database.get_all_books():
+        if q in fold_for_search(b["title"]):
+            hits.append(b)
+            if len(hits) >= limit:
+                break
+    return hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        books = make_books(n)
+        start = time.perf_counter()
+        use_temp_db(books)
+        load_s = time.perf_counter() - start
+        queries = make_queries(books, args.queries)
+        args_list = [(q,) for q in queries]
+
+        fts = time_per_call(database.search_books, args_list, repeat=3)
+        scan = time_per_call(scan_search, args_list[:20], repeat=1)
+        print(
+            f"{n:>7} sách (nạp {load_s:.1f}s): search_books {fts * 1e3:7.3f} ms/query  "
+            f"quét Python {scan * 1e3:9.2f} ms/query  x{scan / max(fts, 1e-9):.0f}"
+        )
+        database.close_all_conns()
+
+
+if __name__ == "__main__":
+    main()
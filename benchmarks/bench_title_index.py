@@ -0,0 +1,82 @@
+"""
+Benchmark TitleIndex.match so với cách quét toàn bộ danh mục mỗi lần gọi.
+
+    python -m benchmarks.bench_title_index --baseline <git-rev> --sizes 100 10000 100000
+"""
+import argparse
+import random
+import time
+
+from app.logic.title_index import TitleIndex
+from app.logic.utils import normalize_for_match
+from benchmarks._common import load_module_from_git, time_per_call
+from benchmarks.order_corpus import TITLES
+
+WORDS = (
+    "an bình cá chim đá đêm em gió hoa hồng không kiều lá làng lửa mây mèn mưa "
+    "nắng người nhà núi phố quê rừng sao sông tâm thơ tình trăng trời tuổi vàng xanh"
+).split()
+# Âm tiết ghép từ phụ âm đầu + vần để có bộ từ vựng cỡ vài nghìn như danh mục thật
+ONSETS = "b c ch d đ g gi h k kh l m n ng nh p ph qu r s t th tr v x".split()
+RHYMES = "a ai am an ang anh ao au ay e em en eo ê i im in inh o oa oai oan oi om on ong ô ôi ôm ôn ông ơ ơi u ui um un ung uy ư ưa ưng ươi ương".split()
+SYLLABLES = WORDS + [o + r for o in ONSETS for r in RHYMES]
+
+
+def make_titles(n: int, seed: int = 7):
+    rnd = random.Random(seed)
+    titles = list(TITLES)
+    while len(titles) < n:
+        words = rnd.sample(SYLLABLES, rnd.randint(2, 5))
+        titles.append(" ".join(words).title() + f" {rnd.randint(1, 999)}")
+    return titles[:n]
+
+
+def make_messages(titles, count: int = 200, seed: int = 11):
+    rnd = random.Random(seed)
+    msgs = []
+    for _ in range(count):
+        t = rnd.choice(titles)
+        kind = rnd.random()
+        if kind < 0.5:
+            msgs.append(f"tôi muốn mua 2 cuốn {t} giao cho Nam")
+        elif kind < 0.8:
+            # bỏ bớt một từ để đi vào nhánh so khớp mờ / theo từ
+            words = t.split()
+            words.pop(rnd.randrange(len(words)))
+            msgs.append(" ".join(words))
+        else:
+            msgs.append("cho mình hỏi còn sách nào hay không")
+    return [normalize_for_match(m) for m in msgs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000])
+    parser.add_argument("--baseline", help="git revision có _match_known_titles quét tuyến tính")
+    args = parser.parse_args()
+
+    legacy = None
+    if args.baseline:
+        legacy = load_module_from_git(args.baseline, "app/logic/utils.py", "legacy_utils")
+
+    for size in args.sizes:
+        titles = make_titles(size)
+        messages = make_messages(titles)
+
+        start = time.perf_counter()
+        index = TitleIndex(titles)
+        build = time.perf_counter() - start
+        per_match = time_per_call(index.match, [(m,) for m in messages], repeat=3)
+        line = f"{size:>7} titles: build {build * 1e3:8.1f} ms | index {per_match * 1e6:9.1f} µs/match"
+
+        if legacy is not None:
+            # quét tuyến tính rất chậm ở catalog lớn: chỉ đo trên vài câu
+            sample = messages[: max(3, 2000 // max(1, size // 100))]
+            per_scan = time_per_call(legacy._match_known_titles, [(m, titles) for m in sample], repeat=1)
+            agree = sum(index.match(m) == legacy._match_known_titles(m, titles) for m in sample)
+            line += f" | scan {per_scan * 1e6:11.1f} µs/match (x{per_scan / per_match:.0f}) | giống nhau {agree}/{len(sample)}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
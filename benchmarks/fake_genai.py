@@ -0,0 +1,98 @@
+"""
+Stand-in cục bộ cho `google.genai.Client`, dùng trong benchmark thay cho Gemini thật.
+
+Chỉ cài đặt phần API mà app/llm/llm_client.py dùng tới:
+`client.models.generate_content(...)`, `client.aio.models.generate_content(...)`
+và bản streaming `generate_content_stream` của cả hai (trả từng từ một, cách
+nhau `chunk_delay` giây sau khi chờ `latency` cho chunk đầu).
+"""
+import asyncio
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+
+def _response(text: str):
+    part = SimpleNamespace(text=text)
+    return SimpleNamespace(text=text, candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+
+def _chunks(text: str):
+    words = text.split(" ")
+    return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+
+class FakeUpstreamError(RuntimeError):
+    pass
+
+
+class FakeGenaiClient:
+    def __init__(self, latency: float = 0.2, jitter: float = 0.0, error_rate: float = 0.0, seed: int = 0,
+                 chunk_delay: float = 0.0):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self.models = _Models(self)
+        self.aio = SimpleNamespace(models=_AsyncModels(self))
+
+    def _next(self, contents):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._rnd.uniform(0, self.jitter)
+            fail = self._rnd.random() < self.error_rate
+        prompt = contents[0].parts[0].text
+        return delay, fail, f"[fake] Trả lời cho: {prompt[:60]}"
+
+
+class _Models:
+    def __init__(self, owner: FakeGenaiClient):
+        self._owner = owner
+
+    def generate_content(self, model, contents, config=None):
+        delay, fail, text = self._owner._next(contents)
+        # Không stream: chờ đến khi sinh xong từ cuối cùng
+        time.sleep(delay + self._owner.chunk_delay * (len(_chunks(text)) - 1))
+        if fail:
+            raise FakeUpstreamError("503 UNAVAILABLE (fake)")
+        return _response(text)
+
+    def generate_content_stream(self, model, contents, config=None):
+        delay, fail, text = self._owner._next(contents)
+        time.sleep(delay)
+        if fail:
+            raise FakeUpstreamError("503 UNAVAILABLE (fake)")
+        for i, chunk in enumerate(_chunks(text)):
+            if i:
+                time.sleep(self._owner.chunk_delay)
+            yield _response(chunk)
+
+
+class _AsyncModels:
+    def __init__(self, owner: FakeGenaiClient):
+        self._owner = owner
+
+    async def generate_content(self, model, contents, config=None):
+        delay, fail, text = self._owner._next(contents)
+        await asyncio.sleep(delay + self._owner.chunk_delay * (len(_chunks(text)) - 1))
+        if fail:
+            raise FakeUpstreamError("503 UNAVAILABLE (fake)")
+        return _response(text)
+
+    async def generate_content_stream(self, model, contents, config=None):
+        delay, fail, text = self._owner._next(contents)
+        await asyncio.sleep(delay)
+        if fail:
+            raise FakeUpstreamError("503 UNAVAILABLE (fake)")
+
+        async def stream():
+            for i, chunk in enumerate(_chunks(text)):
+                if i:
+                    await asyncio.sleep(self._owner.chunk_delay)
+                yield _response(chunk)
+
+        return stream()
@@ -0,0 +1,165 @@
+"""
+Load test cho đường chat: chạy app.main:app trong process (httpx + ASGITransport,
+không qua mạng) trên một DB SQLite tạm và Gemini giả, mô phỏng nhiều người dùng
+cùng lúc đi hết các kịch bản nhiều lượt: xem/tìm sách → đặt hàng (có lượt thiếu
+thông tin) → tra cứu đơn. In p50/p95/p99 theo từng bước và requests/sec.
+
+    python -m benchmarks.load_test --users 50 --conversations 5 --latency 0.3
+    python -m benchmarks.load_test --followup-mode llm --no-llm-cache --error-rate 0.1
+    python -m benchmarks.load_test --free-text   # gõ thẳng câu tự do ở menu thay vì bấm 1/2/3
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks._common import SAMPLE_BOOKS, isolate_llm_files, percentile, use_temp_db
+from benchmarks.fake_genai import FakeGenaiClient
+from benchmarks.order_corpus import ADDRESSES
+
+NAMES = ["Nam", "Huy", "Lan", "Quang", "An", "Minh", "Hoa", "Tuấn"]
+ORDER_OK = "✅ Đơn hàng"
+TRACK_OK = "📋 Kết quả tra cứu"
+ASK_NAME_AGAIN = "tên người đặt hàng"
+
+
+def conversation(rnd: random.Random, free_text: bool = False):
+    """Một kịch bản: danh sách (nhãn bước, tin nhắn). Tin nhắn None = lặp lại tên nếu bot hỏi lại."""
+    title = rnd.choice(SAMPLE_BOOKS)[0]
+    name = rnd.choice(NAMES)
+    qty = rnd.randint(1, 3)
+    phone = f"09{rnd.randrange(10 ** 8):08d}"
+    if free_text:
+        # Bộ nhận diện ý định ở menu chuyển thẳng câu tự do vào flow tương ứng
+        return [
+            ("search", f"tìm sách {rnd.choice(['harry', 'dac nhan tam', 'kieu', 'python', 'thieu nhi'])}"),
+            ("menu", "0"),
+            ("order_full", f"Tôi muốn mua {qty} cuốn {title} giao cho {name} tại {rnd.choice(ADDRESSES)}, SĐT {phone}"),
+            ("track_name", f"kiểm tra đơn hàng của {name}"),
+        ]
+    return [
+        ("menu", "0"),
+        ("browse", "2"),
+        ("search", rnd.choice(["harry", "dac nhan tam", "kieu", "python", "thieu nhi"])),
+        ("menu", "0"),
+        ("order_start", "1"),
+        ("order_partial", f"Tôi muốn mua {qty} cuốn {title}"),
+        ("order_full", f"Tôi muốn mua {qty} cuốn {title} giao cho {name} tại {rnd.choice(ADDRESSES)}, SĐT {phone}"),
+        ("track_start", "3"),
+        ("track_name", name),
+        ("track_name", None),
+    ]
+
+
+async def user(client: httpx.AsyncClient, uid: int, args, samples, counters):
+    rnd = random.Random(uid)
+    session_id = None
+    last_name = None
+    for _ in range(args.conversations):
+        for step, message in conversation(rnd, args.free_text):
+            if message is None:
+                # Luồng tra cứu hiện hỏi tên hai lần: chỉ gửi lại khi bot thật sự hỏi
+                if ASK_NAME_AGAIN not in counters["_last_reply"].get(uid, ""):
+                    continue
+                message = last_name
+            if step == "track_name":
+                last_name = message
+            payload = {"user_input": message}
+            if session_id:
+                payload["session_id"] = session_id
+            start = time.perf_counter()
+            try:
+                resp = await client.post("/chat/", json=payload)
+            except Exception:
+                counters["errors"] += 1
+                continue
+            samples[step].append(time.perf_counter() - start)
+            if resp.status_code != 200:
+                counters["errors"] += 1
+                continue
+            body = resp.json()
+            session_id = body.get("session_id") or session_id
+            reply = body["reply"]
+            counters["_last_reply"][uid] = reply
+            counters["requests"] += 1
+            if step == "order_full" and ORDER_OK in reply:
+                counters["orders"] += 1
+            if step == "track_name" and TRACK_OK in reply:
+                counters["tracked"] += 1
+
+
+async def run(args):
+    from app.api import session_store
+    from app.db import catalog_cache
+    from app.llm import cache_store, llm_client
+    from app.logic import followups
+    from app.main import app
+
+    # DB tạm đã init + seed; nạp sẵn cache danh mục để request đầu tiên không tính thời gian nạp
+    use_temp_db([(t, a, p, 10 ** 9, c) for t, a, p, _, c in SAMPLE_BOOKS])
+    catalog_cache.refresh(force=True)
+    session_store.set_store(None)
+    isolate_llm_files()
+    if args.no_llm_cache:
+        llm_client.set_cache(cache_store.NullCache())
+    fake = llm_client.client = FakeGenaiClient(args.latency, args.jitter, args.error_rate)
+    llm_client.BACKOFF_BASE = args.backoff
+    followups.MODE = args.followup_mode
+
+    samples = defaultdict(list)
+    counters = defaultdict(int)
+    counters["_last_reply"] = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            user(client, uid, args, samples, counters) for uid in range(args.users)
+        ))
+        elapsed = time.perf_counter() - start
+    return samples, counters, elapsed, fake.calls
+
+
+def report(samples, counters, elapsed, upstream_calls, args):
+    every = [s for values in samples.values() for s in values]
+    print(
+        f"{args.users} người dùng x {args.conversations} hội thoại, Gemini giả {args.latency * 1e3:.0f}ms"
+        f" (lỗi {args.error_rate:.0%}), follow-up={args.followup_mode}, câu tự do={args.free_text}"
+    )
+    print(f"{'bước':>14} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for step in list(dict.fromkeys(s for s, _ in conversation(random.Random(0), args.free_text))) + ["TỔNG"]:
+        values = every if step == "TỔNG" else samples.get(step, [])
+        if not values:
+            continue
+        print(
+            f"{step:>14} {len(values):6d} {percentile(values, 50) * 1e3:9.1f} "
+            f"{percentile(values, 95) * 1e3:9.1f} {percentile(values, 99) * 1e3:9.1f}"
+        )
+    print(
+        f"{counters['requests'] / elapsed:.0f} req/s trong {elapsed:.1f}s | lỗi HTTP {counters['errors']} | "
+        f"đơn thành công {counters['orders']}/{args.users * args.conversations} | "
+        f"tra cứu có kết quả {counters['tracked']} | lời gọi Gemini {upstream_calls}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="số người dùng đồng thời")
+    parser.add_argument("--conversations", type=int, default=5, help="số kịch bản mỗi người dùng chạy tuần tự")
+    parser.add_argument("--latency", type=float, default=0.3, help="độ trễ Gemini giả (giây)")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--backoff", type=float, default=0.05, help="BACKOFF_BASE khi retry (giây)")
+    parser.add_argument("--followup-mode", choices=("template", "llm"), default="template")
+    parser.add_argument("--no-llm-cache", action="store_true", help="tắt cache LLM để mọi lượt thiếu thông tin gọi Gemini")
+    parser.add_argument("--free-text", action="store_true", help="kịch bản gõ câu tự do ở menu (ít lượt hơn)")
+    args = parser.parse_args()
+
+    samples, counters, elapsed, upstream_calls = asyncio.run(run(args))
+    report(samples, counters, elapsed, upstream_calls, args)
+
+
+if __name__ == "__main__":
+    main()
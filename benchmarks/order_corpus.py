@@ -0,0 +1,83 @@
+"""Tập câu đặt hàng tiếng Việt dùng chung cho các benchmark extractor."""
+import random
+
+TITLES = [
+    "Truyện Kiều", "Đắc Nhân Tâm", "Dế Mèn Phiêu Lưu Ký", "Harry Potter và Hòn đá Phù thủy",
+    "Nhà giả kim", "Lập Trình Python Cơ Bản", "Tuổi Trẻ Đáng Giá Bao Nhiêu", "Số Đỏ",
+]
+NAMES = ["Nam", "Huy", "Lan", "Quang", "Minh Anh", "Trần Văn Bình", "An"]
+ADDRESSES = [
+    "Hà Nội", "số 1 Yên Hòa - Cầu Giấy", "23 ngõ 5 đường ABC", "phố Huế, quận Hai Bà Trưng",
+    "phường 7, quận 3, TP. HCM", "xã Tân Lập, huyện Đan Phượng",
+]
+PHONES = ["0123456789", "0987 654 321", "+84 912 345 678", "090-123-4567", "84912345678"]
+QUANTITIES = ["1", "2", "5", "một", "hai", "ba", "mười", "mười một", "hai mươi", "Năm"]
+
+TEMPLATES = [
+    "Tôi muốn mua {q} cuốn {t} giao cho {n} tại {a}, SĐT {p}",
+    "Đặt {q} quyển {t}, tên {n}, giao về {a}, sđt: {p}",
+    "Mua {q} sách '{t}' cho {n}, địa chỉ: {a}, phone {p}",
+    "Cho tôi {q} cuốn {t} - giao đến {a}. SĐT {p}",
+    "Mình đặt {q} quyển {t}, tên: {n}, {p}, giao về {a}",
+    "{t} {q} cuốn, gửi cho {n}, đ/c {a}",
+    "mua {t}",
+    "sđt của mình là {p}",
+    "giao tới {a} nhé",
+    "tên là {n}",
+    "lấy {q} cuốn",
+]
+
+# Các câu trong khối __main__ của app/logic/utils.py
+MAIN_CASES = [
+    "Tôi muốn mua 2 cuốn Truyện Kiều giao cho Quang tại Hà Nội, SĐT 0123456789",
+    "Đặt 5 quyển Đắc Nhân Tâm, tên Huy, giao về số 1 Yên Hòa - Cầu Giấy, sđt: 0987654321",
+    "Mua 1 sách 'Harry Potter và Hòn đá Phù thủy' cho Lan, địa chỉ: 23 ngõ 5 đường ABC, phone 090-123-4567",
+    "Cho tôi 3 cuốn Nhà giả kim - giao đến số 7 phố XYZ. SĐT 0912345678",
+    "Mình đặt 2 quyển Dế Mèn phiêu lưu ký, tên: An, 01234567890, giao về Hà Nội",
+    "Tôi muốn mua 5 quyền Đắc Nhân Tâm. Tên Huy, Địa chỉ: số 1 Yên Hoà, Cầu Giấy. SĐT 0123456789",
+]
+MAIN_KNOWN_TITLES = [
+    "Truyện Kiều", "Đắc Nhân Tâm", "Dế Mèn Phiêu Lưu Ký",
+    "Harry Potter và Hòn đá Phù thủy", "Nhà giả kim",
+]
+
+
+def build_corpus(size: int = 2000, seed: int = 42):
+    rnd = random.Random(seed)
+    corpus = list(MAIN_CASES)
+    while len(corpus) < size:
+        corpus.append(rnd.choice(TEMPLATES).format(
+            q=rnd.choice(QUANTITIES), t=rnd.choice(TITLES), n=rnd.choice(NAMES),
+            a=rnd.choice(ADDRESSES), p=rnd.choice(PHONES),
+        ))
+    return corpus
+
+
+# Câu trả lời cho câu hỏi lại ở lượt sau: (mẫu, các trường còn thiếu lúc hỏi)
+FOLLOWUP_TEMPLATES = [
+    ("{p}", ["phone"]),
+    ("{p}", ["address", "phone"]),
+    ("sđt của mình là {p}", ["phone"]),
+    ("{q}", ["quantity", "address", "phone"]),
+    ("{n}", ["customer_name", "address", "phone"]),
+    ("{n}", ["customer_name"]),
+    ("tên là {n}", ["customer_name", "phone"]),
+    ("{a}", ["address"]),
+    ("giao tới {a} nhé", ["address", "phone"]),
+    ("{t}", ["book_title"]),
+    ("Mình tên {n}, giao về {a}, SĐT {p}", ["customer_name", "address", "phone"]),
+]
+
+
+def build_followup_corpus(size: int = 2000, seed: int = 42):
+    """Danh sách (câu trả lời, trường còn thiếu) cho các lượt bổ sung thông tin."""
+    rnd = random.Random(seed)
+    corpus = []
+    while len(corpus) < size:
+        template, missing = rnd.choice(FOLLOWUP_TEMPLATES)
+        text = template.format(
+            q=rnd.choice(QUANTITIES), t=rnd.choice(TITLES), n=rnd.choice(NAMES),
+            a=rnd.choice(ADDRESSES), p=rnd.choice(PHONES),
+        )
+        corpus.append((text, missing))
+    return corpus
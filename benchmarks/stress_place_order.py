@@ -0,0 +1,107 @@
+"""
+Stress test đặt hàng đồng thời: nhiều thread cùng tranh những quyển cuối cùng.
+
+Kiểm tra không bán quá số tồn kho (tổng số lượng trong Orders == số đã trừ khỏi
+Books.stock, stock không âm) và đo số đơn/giây. Chạy thêm --naive để thấy cách
+"đọc stock rồi mới trừ" (không có BEGIN IMMEDIATE) bán quá tồn kho.
+
+    python -m benchmarks.stress_place_order --threads 32 --stock 200
+"""
+import argparse
+import random
+import sqlite3
+import threading
+import time
+
+from app.db import database
+from benchmarks._common import use_temp_db
+
+BOOK_ID = 1
+
+
+def naive_place_order(name, phone, address, book_id, quantity):
+    # Kiểm tra rồi mới trừ trong hai câu lệnh riêng: có khoảng hở giữa đọc và ghi
+    conn = database.get_conn()
+    stock = conn.execute(database.SELECT_BOOK_STOCK, (book_id,)).fetchone()[0]
+    if stock < quantity:
+        raise database.InsufficientStockError(book_id, quantity, stock)
+    time.sleep(0)  # nhường GIL để các thread xen kẽ như dưới tải thật
+    with conn:
+        conn.execute("UPDATE Books SET stock = ? WHERE book_id = ?", (stock - quantity, book_id))
+    return database.add_order(name, phone, address, book_id, quantity)
+
+
+def run(place, threads: int, stock: int, max_qty: int):
+    conn = database.get_conn()
+    with conn:
+        conn.execute("UPDATE Books SET stock = ? WHERE book_id = ?", (stock, BOOK_ID))
+        conn.execute("DELETE FROM Orders")
+
+    placed = [0] * threads
+    errors = [0] * threads
+    barrier = threading.Barrier(threads)
+
+    def worker(i):
+        rnd = random.Random(i)
+        barrier.wait()
+        while True:
+            try:
+                place(f"Khách {i}", "0912345678", "Hà Nội", BOOK_ID, rnd.randint(1, max_qty))
+                placed[i] += 1
+            except database.InsufficientStockError as e:
+                if e.available == 0:
+                    return
+            except sqlite3.OperationalError:
+                errors[i] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    final_stock = conn.execute(database.SELECT_BOOK_STOCK, (BOOK_ID,)).fetchone()[0]
+    ordered = conn.execute("SELECT COALESCE(SUM(quantity), 0) FROM Orders WHERE book_id = ?", (BOOK_ID,)).fetchone()[0]
+    return {
+        "orders": sum(placed),
+        "errors": sum(errors),
+        "ordered_qty": ordered,
+        "final_stock": final_stock,
+        "oversold": max(0, ordered - stock),
+        "orders_per_s": sum(placed) / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--stock", type=int, default=200)
+    parser.add_argument("--max-qty", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--naive", action="store_true", help="chạy thêm cách kiểm tra-rồi-trừ để so sánh")
+    args = parser.parse_args()
+
+    use_temp_db()
+    impls = [("place_order", database.place_order)]
+    if args.naive:
+        impls.append(("naive", naive_place_order))
+
+    failed = False
+    for name, place in impls:
+        for r in range(args.rounds):
+            res = run(place, args.threads, args.stock, args.max_qty)
+            ok = res["oversold"] == 0 and res["final_stock"] >= 0 and res["ordered_qty"] + res["final_stock"] == args.stock
+            failed |= not ok and place is database.place_order
+            print(
+                f"{name:>11} #{r}: {res['orders']:5d} đơn, đã bán {res['ordered_qty']}/{args.stock}, "
+                f"còn {res['final_stock']}, bán quá {res['oversold']}, lỗi khóa {res['errors']}, "
+                f"{res['orders_per_s']:8.0f} đơn/s  {'OK' if ok else 'SAI'}"
+            )
+    database.close_all_conns()
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,57 @@
+import json
+
 import streamlit as st
 import requests
 
 API_URL = "http://localhost:8000/chat"
+# Server-sent events: câu trả lời hiện dần thay vì chờ LLM sinh xong
+STREAM_URL = f"{API_URL}/stream"
 
 st.title("📚 Bookstore Chatbot")
 
 if "history" not in st.session_state:
     st.session_state.history = []
+if "session_id" not in st.session_state:
+    st.session_state.session_id = None
 
-user_input = st.chat_input("Nhập tin nhắn của bạn...")
 
-if user_input:
-    st.session_state.history.append(("user", user_input))
-    resp = requests.post(API_URL, json={"user_input": user_input})
-    bot_reply = resp.json().get("reply", "Lỗi phản hồi.")
-    st.session_state.history.append(("bot", bot_reply))
+def stream_reply(user_input: str, placeholder) -> str:
+    """Gửi tin nhắn tới /chat/stream, vẽ lại câu trả lời sau mỗi đoạn nhận được."""
+    payload = {"user_input": user_input, "session_id": st.session_state.session_id}
+    reply = ""
+    event = None
+    with requests.post(STREAM_URL, json=payload, stream=True, timeout=60) as resp:
+        resp.raise_for_status()
+        for line in resp.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data = json.loads(line[len("data:"):])
+                if event == "delta":
+                    reply += data["text"]
+                    placeholder.markdown(reply + "▌")
+                elif event == "done":
+                    reply = data["reply"]
+                    st.session_state.session_id = data.get("session_id") or st.session_state.session_id
+    placeholder.markdown(reply)
+    return reply
+
 
 for role, msg in st.session_state.history:
     with st.chat_message("user" if role == "user" else "assistant"):
         st.markdown(msg)
+
+user_input = st.chat_input("Nhập tin nhắn của bạn...")
+
+if user_input:
+    st.session_state.history.append(("user", user_input))
+    with st.chat_message("user"):
+        st.markdown(user_input)
+    with st.chat_message("assistant"):
+        placeholder = st.empty()
+        try:
+            bot_reply = stream_reply(user_input, placeholder) or "Lỗi phản hồi."
+        except (requests.RequestException, ValueError):
+            bot_reply = "Lỗi phản hồi."
+            placeholder.markdown(bot_reply)
+    st.session_state.history.append(("bot", bot_reply))